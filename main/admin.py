@@ -1,6 +1,17 @@
 from django.contrib import admin
-from main.models import Employee, Penalty, PenaltyType
+from main.models import Employee, Penalty, PenaltyType, Job, Roster, RosterMember
 
 admin.site.register(Employee)
 admin.site.register(Penalty)
-admin.site.register(PenaltyType)
\ No newline at end of file
+admin.site.register(PenaltyType)
+admin.site.register(Job)
+
+
+class RosterMemberInline(admin.TabularInline):
+    model = RosterMember
+
+
+@admin.register(Roster)
+class RosterAdmin(admin.ModelAdmin):
+    list_display = ['name', 'penalty', 'weekdays', 'start_time', 'starts_on', 'rotation_weeks']
+    inlines = [RosterMemberInline]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        # Connects the signals that invalidate the reference data cache, the employee index and the cached reports.
+        from main import employee_index, reference_data, reports  # noqa: F401
@@ -0,0 +1,195 @@
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from main.models import Employee, Penalty, PenaltyType, Timesheet, TimesheetClaim
+
+# Arguments passed to seed_load for each dataset size.
+SIZES = {
+    'small': {'teams': 2, 'employees': 20, 'years': 0.25},
+    'medium': {'teams': 5, 'employees': 100, 'years': 1},
+    'large': {'teams': 10, 'employees': 300, 'years': 2},
+}
+
+
+def load_benchmark_data() -> dict:
+    """
+    Picks the objects the benchmarks run against from a seeded database.
+
+    The busiest non manager employee is used so the per employee paths do the most work.
+
+    :return: Dictionary{name: Model instance}
+    """
+    employee = Employee.objects.filter(team__isnull=False, team_manager__isnull=True) \
+        .annotate(timesheet_count=Count('timesheet')).order_by('-timesheet_count').first()
+    pay_periods = TimesheetClaim.objects.order_by('pay_date')
+    return {
+        'employee': employee,
+        'manager': employee.team.manager,
+        'team': employee.team,
+        'penalty': Penalty.objects.first(),
+        'penalty_type': PenaltyType.objects.first(),
+        'timesheet': Timesheet.objects.filter(employee=employee).order_by('start_date_time').last(),
+        'pay_period': pay_periods[pay_periods.count() // 2],
+    }
+
+
+def route_kwargs(data: dict) -> dict:
+    """
+    URL keyword arguments for each named route in timesheets/urls.py.
+
+    :param data: Dictionary from load_benchmark_data
+    :return: Dictionary{route name: Dictionary{kwarg: value}}
+    """
+    return {
+        'home': {},
+        'employee-detail': {'slug': data['employee'].slug},
+        'employee-ledger': {'slug': data['employee'].slug, 'penalty_type_id': data['penalty_type'].pk},
+        'employee-update': {'slug': data['employee'].slug},
+        'employee-search': {},
+        'employee-autocomplete': {},
+        'logout': {},
+        'login': {},
+        'register-employee': {},
+        'timesheet-create': {},
+        'timesheet-detail': {'pk': data['timesheet'].pk},
+        'penalty-claim': {},
+        'penalty-create': {},
+        'penalty-delete': {'pk': data['penalty'].pk},
+        'penalty-type-create': {},
+        'penalty-type-delete': {'pk': data['penalty_type'].pk},
+        'team-create': {},
+        'team-delete': {'slug': data['team'].slug},
+        'team-list': {},
+        'team-join-staff': {'team_id': data['team'].pk},
+        'team-leave-staff': {'team_id': data['team'].pk},
+        'team-join-manager': {'team_id': data['team'].pk},
+        'team-leave-manager': {'team_id': data['team'].pk},
+        'team-view-members-list': {'team_id': data['team'].pk},
+        'team-overtime-trend': {'team_id': data['team'].pk},
+        'manager-team-member-list': {},
+        'timesheet-claim': {},
+        'pay-period-document': {'pk': data['pay_period'].pk, 'extension': 'html'},
+        'approval-queue': {},
+        'metrics': {},
+        'pay-period-report': {},
+        'pay-period-report-csv': {},
+        'rules-simulator': {},
+    }
+
+
+def model_benchmarks(data: dict) -> dict:
+    employee = data['employee']
+
+    def timesheet_save():
+        # Starts in the evening so the timesheet spans midnight and creates several rows.
+        Timesheet(employee=employee,
+                  start_date_time=datetime.combine(data['timesheet'].start_date_time.date(),
+                                                   datetime.min.time()) + timedelta(hours=20),
+                  _duration=10 * 3600,
+                  penalty=data['penalty']).save()
+
+    return {
+        'Timesheet.save': timesheet_save,
+        'PenaltyType.calculate_available_employee_time':
+            lambda: data['penalty_type'].calculate_available_employee_time(employee),
+        'Employee.duration_per_penalty': lambda: employee.duration_per_penalty,
+        'Team.duration_per_penalty': lambda: data['team'].duration_per_penalty,
+        'TimesheetClaim.add_time_sheets': lambda: data['pay_period'].add_time_sheets(),
+    }
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that counts queries, unlike connection.queries it has no upper limit.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """
+    Runs func repeat times, each inside a transaction that is rolled back so the dataset doesn't change.
+
+    :param func: Callable to time
+    :param repeat: Number of runs, the median wall time is reported
+    :param setup: Optional callable run before each timed run
+    :return: Dictionary{wall_ms: Float, queries: Int}
+    """
+    timings = []
+    query_count = 0
+    for _ in range(repeat):
+        with transaction.atomic():
+            if setup:
+                setup()
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+            query_count = counter.count
+            transaction.set_rollback(True)
+    return {'wall_ms': round(statistics.median(timings) * 1000, 3), 'queries': query_count}
+
+
+def run_size(size: str, repeat: int) -> dict:
+    """
+    Seeds the current database with the dataset for size and times each model path and URL.
+
+    :return: Dictionary{benchmark name: Dictionary{wall_ms: Float, queries: Int}}
+    """
+    call_command('seed_load', '--end-date=2022-06-30', seed=0, stdout=StringIO(), **SIZES[size])
+    data = load_benchmark_data()
+    results = {}
+    for name, func in model_benchmarks(data).items():
+        results[name] = measure(func, repeat)
+
+    client = Client(raise_request_exception=False)
+    for name, kwargs in route_kwargs(data).items():
+        url = reverse(name, kwargs=kwargs)
+        results[f'GET {name}'] = measure(lambda: client.get(url, HTTP_REFERER='/'),
+                                         repeat,
+                                         setup=lambda: client.force_login(data['manager']))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Lists the benchmarks that are slower, or run more queries, than the baseline, or that are missing from it.
+
+    :param results: Dictionary{size: Dictionary{benchmark name: measurement}}
+    :param baseline: Same shape as results
+    :param tolerance: Allowed relative increase in wall time, 0.25 allows 25% slower
+    :return: List[String] describing each regression
+    """
+    regressions = []
+    for size, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            expected = baseline.get(size, {}).get(name)
+            if expected is None:
+                regressions.append(f'{size} {name}: not in the baseline, save a new one with --save-baseline')
+                continue
+            if result['queries'] > expected['queries']:
+                regressions.append(f'{size} {name}: {result["queries"]} queries, baseline {expected["queries"]}')
+            if result['wall_ms'] > expected['wall_ms'] * (1 + tolerance):
+                regressions.append(f'{size} {name}: {result["wall_ms"]}ms, baseline {expected["wall_ms"]}ms')
+    return regressions
+
+
+def write_json(path, results: dict):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
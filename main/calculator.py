@@ -0,0 +1,54 @@
+"""
+Payout and cost code allocation of many day segments at once with NumPy, for the paths that create or replay the
+rows of many timesheets. Gives the same seconds as Timesheet._calculate_payout_amount_in_seconds and
+Timesheet._calculate_cost_codes, which stay the reference for single timesheets.
+"""
+import numpy as np
+
+# How the seconds of a segment are allocated, the branches of Timesheet._calculate_cost_codes.
+PUBLIC_HOLIDAY = 0  # All public holiday.
+SUNDAY = 1  # All overtime.
+FIRST_BELOW = 2  # First day of the timesheet under the threshold, all base.
+FIRST_OVER = 3  # First day over the threshold, base up to it and overtime after.
+CARRIED_OVER = 4  # The previous day reached the threshold, all overtime.
+CARRIED_BELOW = 5  # The previous day didn't, base for the rest of the threshold and overtime for the remainder.
+
+
+def calculate(weekdays, holidays, seconds, priors, thresholds, multipliers: tuple) -> dict:
+    """
+    Allocates day segments, each of the arguments has one entry per segment.
+
+    :param weekdays: Day of the week of the segment, Monday 0
+    :param holidays: True where the day is a public holiday
+    :param seconds: Seconds worked on the day
+    :param priors: Seconds worked on the previous day of the same timesheet, 0 on its first day
+    :param thresholds: Base threshold of the timesheet's penalty
+    :param multipliers: Tuple(weekday, Sunday, public holiday) payout multipliers
+    :return: Dictionary{payout, base, overtime, public_holiday, cases} of int64 arrays, seconds per segment
+    """
+    weekdays = np.asarray(weekdays, dtype=np.int8)
+    holidays = np.asarray(holidays, dtype=bool)
+    seconds = np.asarray(seconds, dtype=np.int64)
+    priors = np.asarray(priors, dtype=np.int64)
+    thresholds = np.asarray(thresholds, dtype=np.int64)
+
+    sundays = (weekdays == 6) & ~holidays
+    weekday_multiplier, sunday_multiplier, public_holiday_multiplier = multipliers
+    payout = seconds * np.where(holidays, public_holiday_multiplier,
+                                np.where(sundays, sunday_multiplier, weekday_multiplier))
+    # np.rint rounds halves to even like round().
+    payout = np.rint(payout).astype(np.int64)
+
+    first = priors == 0
+    cases = np.select([holidays, sundays, first & (seconds < thresholds), first, priors >= thresholds],
+                      [PUBLIC_HOLIDAY, SUNDAY, FIRST_BELOW, FIRST_OVER, CARRIED_OVER], CARRIED_BELOW).astype(np.int8)
+    rest_of_threshold = np.abs(priors - thresholds)
+    base = np.select([cases == FIRST_BELOW, cases == FIRST_OVER, cases == CARRIED_BELOW],
+                     [seconds, thresholds, rest_of_threshold], 0)
+    overtime = np.select([cases == SUNDAY, cases == FIRST_OVER, cases == CARRIED_OVER, cases == CARRIED_BELOW],
+                         [seconds, np.abs(thresholds - seconds), seconds, np.abs(seconds - rest_of_threshold)], 0)
+    return {'payout': payout,
+            'base': base.astype(np.int64),
+            'overtime': overtime.astype(np.int64),
+            'public_holiday': np.where(holidays, seconds, 0).astype(np.int64),
+            'cases': cases}
@@ -0,0 +1,75 @@
+"""
+The claim document of a pay period, as a page with every timesheet and as CSV of the cost code units.
+
+Open pay periods are rendered on each request. Closed ones are frozen by manage.py freeze_pay_periods, rendered once,
+stored gzip compressed in PayPeriodSnapshot and served as stored from then on.
+"""
+import csv
+import gzip
+import hashlib
+import io
+
+from django.db import IntegrityError, transaction
+from django.template.loader import render_to_string
+
+from main.models import PayPeriodSnapshot, Timesheet, TimesheetClaim
+
+
+def timesheets(pay_period: TimesheetClaim) -> list:
+    """
+    :return: List[Timesheet] of the pay period with their rows and costs prefetched
+    """
+    return Timesheet.prefetch_rows(pay_period.timesheet_set.select_related('employee__team__manager')
+                                   .order_by('employee__username', 'start_date_time'))
+
+
+def render_html(pay_period: TimesheetClaim, pay_period_timesheets: list) -> str:
+    return render_to_string('main/timesheetclaim_document.html',
+                            {'timesheetclaim': pay_period, 'timesheets': pay_period_timesheets})
+
+
+def render_csv(pay_period: TimesheetClaim, pay_period_timesheets: list) -> str:
+    file = io.StringIO()
+    writer = csv.writer(file)
+    writer.writerow(['Pay date', 'Timesheet', 'Username', 'Employee', 'Team', 'Cost code', 'Name', 'Units'])
+    for timesheet in pay_period_timesheets:
+        employee = timesheet.employee
+        for cost in timesheet.costs:
+            writer.writerow([pay_period.pay_date, timesheet.pk, employee.username, employee.get_full_name(),
+                             employee.team.name if employee.team else '', cost.cost_code.code, cost.cost_code.name,
+                             f'{cost.units:.2f}'])
+    return file.getvalue()
+
+
+RENDERERS = {PayPeriodSnapshot.HTML: render_html, PayPeriodSnapshot.CSV: render_csv}
+
+
+def render(pay_period: TimesheetClaim, format: str) -> str:
+    return RENDERERS[format](pay_period, timesheets(pay_period))
+
+
+def freeze(pay_period: TimesheetClaim) -> list:
+    """
+    Renders and stores every format of a closed pay period that hasn't been frozen yet.
+
+    :return: List[PayPeriodSnapshot] created, empty if it was already frozen
+    """
+    if not pay_period.closed:
+        raise ValueError(f'The pay period paid on {pay_period.pay_date} is still open.')
+    if pay_period.frozen:
+        return []
+    pay_period_timesheets = timesheets(pay_period)
+    snapshots = []
+    for format, renderer in RENDERERS.items():
+        document = renderer(pay_period, pay_period_timesheets).encode()
+        snapshots.append(PayPeriodSnapshot(pay_period=pay_period, format=format,
+                                           content=gzip.compress(document, mtime=0),
+                                           digest=hashlib.sha256(document).hexdigest()))
+    try:
+        with transaction.atomic():
+            PayPeriodSnapshot.objects.bulk_create(snapshots)
+    except IntegrityError:
+        # Frozen by another process in the meantime.
+        return []
+    pay_period.frozen = True
+    return snapshots
@@ -0,0 +1,151 @@
+"""
+Process-local prefix index of the employees for search and autocomplete, see EmployeeSearchView.
+
+Each process keeps a sorted list of the lower case username, first name, last name, full name and slug of every active
+employee, and finds the employees matching a prefix with a binary search instead of a LIKE scan. Like
+main.reference_data, the index is rebuilt when the version token in the shared cache (settings.EMPLOYEE_INDEX_CACHE)
+changes, which happens whenever an employee is saved or deleted, and again when that transaction commits.
+
+Queryset update() and bulk_create() don't send signals, call bump() after using them on Employee.
+"""
+import bisect
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+from main.models import Employee
+
+VERSION_KEY = 'employee-index-version'
+# Saves that only touch other fields, like the last_login update on each log in, leave the index alone.
+INDEXED_FIELDS = {'username', 'first_name', 'last_name', 'slug', 'is_active'}
+
+_local = {'version': None, 'index': None}
+
+
+class _Uncommitted(threading.local):
+    # Set while a change is not yet committed, other transactions must not see it and a rollback must discard it.
+    # Kept per thread like the connection whose transaction it describes.
+    pending = False
+
+
+_uncommitted = _Uncommitted()
+
+
+class Index:
+    """
+    Sorted (key, employee pk) pairs and the employees they point to.
+    """
+
+    def __init__(self, employees):
+        """
+        :param employees: Iterable[Tuple(pk, username, first name, last name, slug)]
+        """
+        self.employees = {}
+        entries = set()
+        for pk, username, first_name, last_name, slug in employees:
+            name = f'{first_name} {last_name}'.strip()
+            keys = {key.lower() for key in (username, first_name, last_name, name, slug) if key}
+            self.employees[pk] = {'pk': pk, 'username': username, 'name': name or username, 'slug': slug,
+                                  'keys': keys}
+            entries.update((key, pk) for key in keys)
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.ids = [pk for _, pk in entries]
+
+    def prefixed(self, prefix: str) -> range:
+        """
+        :return: range of the positions of the keys starting with prefix
+        """
+        return range(bisect.bisect_left(self.keys, prefix), bisect.bisect_left(self.keys, prefix + '\uffff'))
+
+    def search(self, query: str, limit: int) -> list:
+        """
+        Employees with a key starting with each word of the query, "ann sm" finds Anne Smith.
+
+        :return: List[Dictionary{pk: Int, username: String, name: String, slug: String}] ordered by the key matched
+        """
+        words = query.lower().split()
+        if not words:
+            return []
+        found = []
+        seen = set()
+        # Scans the keys of the word matching the fewest, the other words only filter them.
+        for position in min((self.prefixed(word) for word in words), key=len):
+            pk = self.ids[position]
+            if pk in seen:
+                continue
+            seen.add(pk)
+            employee = self.employees[pk]
+            if all(any(key.startswith(word) for key in employee['keys']) for word in words):
+                found.append({field: employee[field] for field in ('pk', 'username', 'name', 'slug')})
+                if len(found) == limit:
+                    break
+        return found
+
+
+def _cache():
+    return caches[settings.EMPLOYEE_INDEX_CACHE]
+
+
+def bump():
+    """
+    Replaces the shared version token so every process rebuilds its index.
+    """
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def indexed_employees():
+    # Employees without a slug have no page to link to.
+    return Employee.objects.filter(is_active=True, slug__isnull=False) \
+        .values_list('pk', 'username', 'first_name', 'last_name', 'slug')
+
+
+def build() -> Index:
+    return Index(indexed_employees())
+
+
+def index() -> Index:
+    """
+    The index of this process, rebuilt first when the version token changed.
+    """
+    if _uncommitted.pending:
+        if connection.in_atomic_block:
+            return build()
+        # The transaction with the change has ended, committed or not, so the index can't be trusted.
+        _uncommitted.pending = False
+        _local['version'] = None
+
+    version = _cache().get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+    if version != _local['version'] or _local['index'] is None:
+        _local['index'] = build()
+        _local['version'] = version
+    return _local['index']
+
+
+def search(query: str, limit: int = 10) -> list:
+    """
+    :return: List[Dictionary{pk: Int, username: String, name: String, slug: String}] of at most limit employees
+    """
+    return index().search(query, limit)
+
+
+def _changed(sender, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_FIELDS & set(update_fields):
+        return
+    bump()
+    if connection.in_atomic_block:
+        _uncommitted.pending = True
+        transaction.on_commit(_committed)
+
+
+def _committed():
+    _uncommitted.pending = False
+    bump()
+
+
+post_save.connect(_changed, sender=Employee, dispatch_uid='employee_index_save')
+post_delete.connect(_changed, sender=Employee, dispatch_uid='employee_index_delete')
@@ -1,9 +1,43 @@
 from django import forms
 from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import AuthenticationForm
+from main import reference_data
 from main.models import Timesheet, Penalty, PenaltyType, Employee, Claim, Team
 
 
+class ReferenceDataChoiceIterator(forms.models.ModelChoiceIterator):
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield '', self.field.empty_label
+        for instance in reference_data.objects(self.queryset.model):
+            yield self.choice(instance)
+
+    def __len__(self):
+        return len(reference_data.objects(self.queryset.model)) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(reference_data.objects(self.queryset.model))
+
+
+class ReferenceDataChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField for PenaltyType, Penalty or CostCode that renders and validates its choices against
+    main.reference_data instead of querying the database.
+    """
+    iterator = ReferenceDataChoiceIterator
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        for instance in reference_data.objects(self.queryset.model):
+            if str(instance.pk) == str(value):
+                return instance
+        raise ValidationError(self.error_messages['invalid_choice'], code='invalid_choice',
+                              params={'value': value})
+
+
 class FloatingValidationModelForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -25,6 +59,7 @@ class TimeSheetModelForm(FloatingValidationModelForm):
     class Meta:
         model = Timesheet
         fields = ['start_date_time', '_duration', 'penalty']
+        field_classes = {'penalty': ReferenceDataChoiceField}
         widgets = {
             'start_date_time': forms.DateTimeInput(
                 attrs={'type': 'datetime-local',
@@ -36,6 +71,22 @@ class TimeSheetModelForm(FloatingValidationModelForm):
                        'placeholder': 'Duration'}),
         }
 
+    def __init__(self, *args, employee=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.employee = employee
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date_time = cleaned_data.get('start_date_time')
+        minutes = cleaned_data.get('_duration')
+        if self.employee and start_date_time and minutes:
+            overlapping = Timesheet(employee=self.employee, start_date_time=start_date_time,
+                                    _duration=minutes * 60).overlapping()
+            if overlapping:
+                raise ValidationError(f'Overlaps your timesheet starting '
+                                      f'{overlapping.start_date_time:%d/%m/%Y %H:%M}.', code='overlap')
+        return cleaned_data
+
     def clean__duration(self):
         data = self.cleaned_data['_duration']
         if data > 1440:
@@ -54,6 +105,7 @@ class ClaimForm(FloatingValidationModelForm):
     class Meta:
         model = Claim
         fields = ['employee', 'penalty_type', 'claimed_seconds']
+        field_classes = {'penalty_type': ReferenceDataChoiceField}
         widgets = {
             'claimed_seconds': forms.TextInput(attrs={'type': 'number', 'placeholder': 'Duration'}),
             'employee': forms.HiddenInput(),
@@ -139,4 +191,50 @@ class TeamCreateModelForm(FloatingValidationModelForm):
         fields = ['name', ]
         widgets = {
             'name': forms.TextInput(attrs={'required': True, 'maxlength': 40}),
-        }
\ No newline at end of file
+        }
+
+
+class RulesSimulatorForm(forms.Form):
+    """
+    Date range and proposed rules for main.simulator, with a threshold and valid days field for each penalty.
+    """
+    start = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    weekday_multiplier = forms.FloatField(min_value=0, initial=Timesheet.WEEKDAY_MULTIPLIER)
+    sunday_multiplier = forms.FloatField(min_value=0, initial=Timesheet.SUNDAY_MULTIPLIER)
+    public_holiday_multiplier = forms.FloatField(min_value=0, initial=Timesheet.PUBLIC_HOLIDAY_MULTIPLIER)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.penalties = reference_data.penalties()
+        for penalty in self.penalties:
+            self.fields[f'threshold_{penalty.pk}'] = forms.IntegerField(
+                min_value=0, initial=penalty.base_threshold, label=f'{penalty.name} base threshold (seconds)')
+            self.fields[f'valid_days_{penalty.pk}'] = forms.IntegerField(
+                min_value=0, initial=penalty.valid_for_day_count, label=f'{penalty.name} valid for (days)')
+        for field in self.fields.values():
+            field.widget.attrs.update({'class': 'form-control'})
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('start') and cleaned_data.get('end') and cleaned_data['end'] < cleaned_data['start']:
+            raise ValidationError('The end date is before the start date.', code='invalid')
+        return cleaned_data
+
+    @property
+    def penalty_fields(self) -> list:
+        """
+        :return: List[Tuple(Penalty, threshold BoundField, valid days BoundField)]
+        """
+        return [(penalty, self[f'threshold_{penalty.pk}'], self[f'valid_days_{penalty.pk}'])
+                for penalty in self.penalties]
+
+    def rules_arguments(self) -> dict:
+        """
+        :return: Dictionary of the keyword arguments for main.simulator.Rules
+        """
+        return {'thresholds': {penalty.pk: self.cleaned_data[f'threshold_{penalty.pk}'] for penalty in self.penalties},
+                'valid_days': {penalty.pk: self.cleaned_data[f'valid_days_{penalty.pk}'] for penalty in self.penalties},
+                'weekday_multiplier': self.cleaned_data['weekday_multiplier'],
+                'sunday_multiplier': self.cleaned_data['sunday_multiplier'],
+                'public_holiday_multiplier': self.cleaned_data['public_holiday_multiplier']}
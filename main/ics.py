@@ -0,0 +1,130 @@
+"""
+Streaming reader for the VEVENTs of iCalendar (.ics) files, see RFC 5545.
+
+Only the properties needed to import on-call shifts are read: UID, RECURRENCE-ID, DTSTART, DTEND, DURATION and
+ATTENDEE. Recurrence rules aren't expanded, paging tools export each shift as its own event.
+"""
+import re
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+
+DURATION = re.compile(r'^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$')
+
+
+class IcsError(ValueError):
+    pass
+
+
+def unfolded_lines(lines):
+    """
+    Joins folded content lines, a line starting with a space or tab continues the previous one.
+
+    :param lines: Iterable[String] e.g. an open text file, read one line at a time
+    """
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t'):
+            if current is not None:
+                current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current:
+        yield current
+
+
+def parse_line(line: str) -> tuple:
+    """
+    :return: Tuple(name, Dictionary{parameter: value}, value)
+    """
+    head, separator, value = line.partition(':')
+    # Quoted parameter values may contain colons, e.g. ATTENDEE;CN="Ant: on call":mailto:ant@example.com
+    while head.count('"') % 2 and separator:
+        extra, separator, value = value.partition(':')
+        head += ':' + extra
+    name, *parameters = head.split(';')
+    params = {}
+    for parameter in parameters:
+        key, _, parameter_value = parameter.partition('=')
+        params[key.upper()] = parameter_value.strip('"')
+    return name.upper(), params, value
+
+
+def parse_date_time(value: str, params: dict):
+    """
+    A DATE or DATE-TIME value as a naive datetime in settings.TIME_ZONE, which is how timesheets are stored.
+    Floating times are taken as they are.
+    """
+    try:
+        if params.get('VALUE') == 'DATE' or len(value) == 8:
+            return datetime.combine(date(int(value[:4]), int(value[4:6]), int(value[6:8])), datetime.min.time())
+        moment = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    except ValueError:
+        raise IcsError(f'Invalid date "{value}".')
+    if value.endswith('Z'):
+        moment = moment.replace(tzinfo=timezone.utc)
+    elif 'TZID' in params:
+        try:
+            moment = moment.replace(tzinfo=ZoneInfo(params['TZID']))
+        except (ZoneInfoNotFoundError, ValueError):
+            raise IcsError(f'Unknown time zone "{params["TZID"]}".')
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(ZoneInfo(settings.TIME_ZONE)).replace(tzinfo=None)
+    return moment
+
+
+def parse_duration(value: str) -> timedelta:
+    match = DURATION.match(value)
+    if not match or not any(match.groups()[1:]):
+        raise IcsError(f'Invalid duration "{value}".')
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                         minutes=int(minutes or 0), seconds=int(seconds or 0))
+    return -duration if sign == '-' else duration
+
+
+def read_events(lines):
+    """
+    Yields each VEVENT as soon as it has been read, so only one event is held in memory at a time.
+
+    :param lines: Iterable[String]
+    :return: Iterator[Dictionary{uid: String, start: datetime, end: datetime, attendees: List[String]}] with the
+        attendees' email addresses in lower case
+    """
+    event = None
+    count = 0
+    for line in unfolded_lines(lines):
+        name, params, value = parse_line(line)
+        if name == 'BEGIN' and value.upper() == 'VEVENT':
+            event = {'attendees': []}
+            count += 1
+        elif event is None:
+            continue
+        elif name == 'END' and value.upper() == 'VEVENT':
+            if 'uid' not in event or 'start' not in event:
+                raise IcsError(f'Event {count} of the file has no UID or DTSTART.')
+            if 'end' not in event:
+                event['end'] = event['start'] + event.pop('duration', timedelta(0))
+            event.pop('duration', None)
+            if 'recurrence_id' in event:
+                # Occurrences of a recurring event share its UID.
+                event['uid'] = f'{event["uid"]}/{event.pop("recurrence_id")}'
+            yield event
+            event = None
+        elif name == 'UID':
+            event['uid'] = value
+        elif name == 'RECURRENCE-ID':
+            event['recurrence_id'] = value
+        elif name == 'DTSTART':
+            event['start'] = parse_date_time(value, params)
+        elif name == 'DTEND':
+            event['end'] = parse_date_time(value, params)
+        elif name == 'DURATION':
+            event['duration'] = parse_duration(value)
+        elif name == 'ATTENDEE':
+            address = value[len('mailto:'):] if value.lower().startswith('mailto:') else value
+            event['attendees'].append(address.strip().lower())
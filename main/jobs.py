@@ -0,0 +1,59 @@
+"""
+Handlers for the background jobs run by manage.py run_worker, queue them with Job.enqueue(name, **arguments).
+
+Each handler runs inside a transaction with the job's status update, raising makes the job retry.
+"""
+import os
+from datetime import date
+
+from django.conf import settings
+from django.core.management import call_command
+
+HANDLERS = {}
+
+# Maintenance commands that can be queued with the "command" job.
+QUEUEABLE_COMMANDS = ['archive_rows', 'backfill_rollups', 'freeze_pay_periods', 'pack_rows', 'send_expiry_digests',
+                      'snapshot_balances']
+
+
+def handler(name: str):
+    def register(function):
+        HANDLERS[name] = function
+        return function
+    return register
+
+
+@handler('generate_timesheet_rows')
+def generate_timesheet_rows(timesheet_id: int, adding: bool, before: dict):
+    """
+    Row generation for a timesheet saved with defer_rows, does nothing if the timesheet has since been deleted.
+    """
+    from main.models import Timesheet
+    timesheet = Timesheet.objects.select_related('employee', 'penalty').filter(pk=timesheet_id).first()
+    if timesheet is not None:
+        timesheet.generate_rows(adding, before)
+
+
+@handler('export_pay_period_report')
+def export_pay_period_report(start: str, end: str):
+    """
+    Writes the pay period report for the pay periods paid between start and end to a CSV file in EXPORTS_DIR.
+    """
+    from main.models import TimesheetClaim
+    from main.reports import PayPeriodReport
+    report = PayPeriodReport(TimesheetClaim.objects.filter(pay_date__gte=date.fromisoformat(start),
+                                                           pay_date__lte=date.fromisoformat(end))
+                             .order_by('pay_date'))
+    os.makedirs(settings.EXPORTS_DIR, exist_ok=True)
+    with open(os.path.join(settings.EXPORTS_DIR, f'pay-period-report-{start}-{end}.csv'), 'w', newline='') as file:
+        report.write_csv(file)
+
+
+@handler('command')
+def command(name: str, args: list = ()):
+    """
+    Runs one of the QUEUEABLE_COMMANDS, e.g. a rebuild after a bulk import.
+    """
+    if name not in QUEUEABLE_COMMANDS:
+        raise ValueError(f'The {name} command can not be queued.')
+    call_command(name, *args)
@@ -0,0 +1,111 @@
+from datetime import date, datetime
+
+from django.db import connection
+from django.db.models import F, Value, CharField, IntegerField, Subquery, OuterRef, Sum, Case, When
+from django.db.models.functions import Coalesce, TruncDate
+
+from main.models import Timesheet, TimesheetRow, ArchivedTimesheetRow, Claim
+
+ACCRUAL = 'accrual'
+CLAIM = 'claim'
+EXPIRY = 'expiry'
+
+# Entries on the same day are ordered accruals, claims then expiries, which is also their alphabetical order.
+LEDGER_SQL = '''
+    SELECT day, kind, reference, seconds,
+           SUM(seconds) OVER (ORDER BY day, kind, reference ROWS UNBOUNDED PRECEDING) AS balance
+    FROM ({entries}) entries
+    ORDER BY day DESC, kind DESC, reference DESC
+    {page}
+'''
+PAGE_SQL = 'LIMIT %s OFFSET %s'
+COUNT_SQL = 'SELECT COUNT(*) FROM ({entries}) entries'
+
+
+def _entry(queryset, day, kind, reference, seconds):
+    # Annotated in the same order for every part, so the columns of the union line up.
+    return queryset.annotate(day=day, kind=Value(kind, output_field=CharField()), reference=reference,
+                             seconds=seconds).values_list('day', 'kind', 'reference', 'seconds')
+
+
+def _payout(model):
+    return Subquery(model.objects.filter(timesheet=OuterRef('pk')).values('timesheet')
+                    .annotate(seconds=Sum('payout_seconds')).values('seconds'), output_field=IntegerField())
+
+
+class Ledger:
+    """
+    Accruals, claims and expiries of an employee for a penalty type, newest first, with the balance after each.
+
+    The running balance is calculated by a window function over all the entries, so any page is one query and
+    nothing is summed in Python. Rejected timesheets and claims are left out, the last balance matches
+    PenaltyType.calculate_available_employee_time. Timesheets with packed rows accrue in one entry on the day they
+    start rather than one per day worked. Supports count() and slicing for Django's Paginator.
+    """
+
+    def __init__(self, employee, penalty_type):
+        self.employee = employee
+        self.penalty_type = penalty_type
+
+    def entries(self):
+        """
+        :return: QuerySet union of (day, kind, timesheet or claim pk, seconds) for every entry
+        """
+        timesheets = dict(timesheet__employee=self.employee, timesheet__penalty__penalty_type=self.penalty_type.name)
+        accrued = _entry(TimesheetRow.objects.filter(**timesheets, timesheet__archived=False)
+                         .exclude(timesheet__status=Timesheet.REJECTED),
+                         F('date_worked'), ACCRUAL, F('timesheet'), F('payout_seconds'))
+        archived = _entry(ArchivedTimesheetRow.objects.filter(**timesheets)
+                          .exclude(timesheet__status=Timesheet.REJECTED),
+                          F('date_worked'), ACCRUAL, F('timesheet'), F('payout_seconds'))
+        packed = _entry(Timesheet.objects.filter(employee=self.employee, penalty__penalty_type=self.penalty_type.name,
+                                                 archived=False, packed_rows__isnull=False)
+                        .exclude(status=Timesheet.REJECTED),
+                        TruncDate('start_date_time'), ACCRUAL, F('pk'), F('packed_payout_seconds'))
+        claimed = _entry(Claim.objects.filter(employee=self.employee, penalty_type=self.penalty_type)
+                         .exclude(status=Claim.REJECTED),
+                         F('claim_date'), CLAIM, F('pk'), -F('claimed_seconds'))
+        expired = _entry(Timesheet.objects.filter(employee=self.employee, penalty__penalty_type=self.penalty_type.name,
+                                                  expiry_date_time__lt=datetime.today())
+                         .exclude(status=Timesheet.REJECTED),
+                         TruncDate('expiry_date_time'), EXPIRY, F('pk'),
+                         # archive_rows --summarize leaves a summary row next to the archived copies, so archived
+                         # timesheets are only read from the archive, like their accruals.
+                         -Case(When(archived=True, then=Coalesce(_payout(ArchivedTimesheetRow), 0)),
+                               default=Coalesce(_payout(TimesheetRow), 0) + Coalesce(F('packed_payout_seconds'), 0)))
+        return accrued.union(archived, packed, claimed, expired, all=True)
+
+    def count(self) -> int:
+        sql, params = self.entries().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(COUNT_SQL.format(entries=sql), params)
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        """
+        :param index: slice of the entries, newest first
+        :return: List[Dictionary{date: date, kind: String, reference: Int, hours: Float, balance: Float}]
+        """
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Ledger only supports slicing without a step.')
+        start = index.start or 0
+        if index.stop is not None and index.stop <= start:
+            return []
+        sql, params = self.entries().query.sql_with_params()
+        with connection.cursor() as cursor:
+            if index.stop is None:
+                # Not every database takes an OFFSET without a LIMIT, or a negative LIMIT for none.
+                cursor.execute(LEDGER_SQL.format(entries=sql, page=''), params)
+                rows = cursor.fetchall()[start:]
+            else:
+                cursor.execute(LEDGER_SQL.format(entries=sql, page=PAGE_SQL), (*params, index.stop - start, start))
+                rows = cursor.fetchall()
+        return [{'date': day if isinstance(day, date) else date.fromisoformat(day),
+                 'kind': kind,
+                 'reference': reference,
+                 'hours': seconds / 3600,
+                 'balance': balance / 3600}
+                for day, kind, reference, seconds, balance in rows]
@@ -0,0 +1,89 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Timesheet, TimesheetRow, TimesheetClaimRow, ArchivedTimesheetRow, ArchivedTimesheetClaimRow
+
+
+class Command(BaseCommand):
+    help = 'Moves the rows of old, expired timesheets in paid pay periods to the archive tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=365,
+                            help='Only archive timesheets that started more than this many days ago.')
+        parser.add_argument('--summarize', action='store_true',
+                            help='Leave one row per timesheet and one cost row per cost code in place of the '
+                                 'archived rows, so totals over the hot tables stay the same.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Timesheets archived per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the timesheets to archive.')
+
+    def handle(self, *args, **options):
+        ids = list(self.archivable(options['days']).order_by('pk').values_list('pk', flat=True))
+        if options['dry_run']:
+            self.stdout.write(f'{len(ids)} timesheets would be archived.')
+            return
+
+        row_count = cost_count = 0
+        for start in range(0, len(ids), options['batch_size']):
+            rows, costs = self.archive(ids[start:start + options['batch_size']], options['summarize'])
+            row_count += rows
+            cost_count += costs
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {len(ids)} timesheets, {row_count} rows and {cost_count} cost rows.'))
+
+    @staticmethod
+    def archivable(days: int):
+        """
+        Timesheets older than days that have expired and belong to a pay period that has been paid.
+        """
+        now = datetime.now()
+        return Timesheet.objects.filter(expiry_date_time__lt=now,
+                                        archived=False,
+                                        start_date_time__lt=now - timedelta(days),
+                                        claim__pay_date__lt=date.today())
+
+    @staticmethod
+    @transaction.atomic
+    def archive(timesheet_ids: list, summarize: bool) -> tuple:
+        """
+        Copies the rows of the timesheets to the archive tables and removes them from the hot tables. Packed rows
+        are unpacked into the archive.
+
+        :return: Tuple(rows archived, cost rows archived)
+        """
+        rows = list(TimesheetRow.objects.filter(timesheet_id__in=timesheet_ids))
+        for timesheet in Timesheet.objects.filter(pk__in=timesheet_ids, packed_rows__isnull=False):
+            rows += timesheet.rows
+        costs = list(TimesheetClaimRow.objects.filter(time_sheet_id__in=timesheet_ids))
+        ArchivedTimesheetRow.objects.bulk_create([
+            ArchivedTimesheetRow(date_worked=row.date_worked, worked_seconds=row.worked_seconds,
+                                 payout_seconds=row.payout_seconds, timesheet_id=row.timesheet_id)
+            for row in rows])
+        ArchivedTimesheetClaimRow.objects.bulk_create([
+            ArchivedTimesheetClaimRow(time_sheet_id=cost.time_sheet_id, cost_code_id=cost.cost_code_id,
+                                      seconds=cost.seconds)
+            for cost in costs])
+        TimesheetRow.objects.filter(timesheet_id__in=timesheet_ids).delete()
+        TimesheetClaimRow.objects.filter(time_sheet_id__in=timesheet_ids).delete()
+
+        if summarize:
+            summaries = {}
+            for row in rows:
+                summary = summaries.setdefault(row.timesheet_id, TimesheetRow(
+                    timesheet_id=row.timesheet_id, date_worked=row.date_worked, worked_seconds=0, payout_seconds=0))
+                summary.date_worked = min(summary.date_worked, row.date_worked)
+                summary.worked_seconds += row.worked_seconds
+                summary.payout_seconds += row.payout_seconds
+            cost_seconds = defaultdict(int)
+            for cost in costs:
+                cost_seconds[(cost.time_sheet_id, cost.cost_code_id)] += cost.seconds
+            TimesheetRow.objects.bulk_create(summaries.values())
+            TimesheetClaimRow.objects.bulk_create([
+                TimesheetClaimRow(time_sheet_id=time_sheet_id, cost_code_id=cost_code_id, seconds=seconds)
+                for (time_sheet_id, cost_code_id), seconds in cost_seconds.items()])
+
+        Timesheet.objects.filter(pk__in=timesheet_ids).update(archived=True,
+                                                              **{field: None for field in Timesheet.PACKED_FIELDS})
+        return len(rows), len(costs)
@@ -0,0 +1,18 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from main.models import WeeklyRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the weekly rollups from the timesheet rows, e.g. after seed_load or a bulk import.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help='Only rebuild the weeks from this date (YYYY-MM-DD) on.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = WeeklyRollup.backfill(options['since'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Created {count} weekly rollups.'))
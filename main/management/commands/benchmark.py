@@ -0,0 +1,73 @@
+import json
+import logging
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main import benchmarks
+
+DEFAULT_BASELINE = settings.BASE_DIR / 'main' / 'benchmark_baseline.json'
+
+
+class Command(BaseCommand):
+    help = 'Times the model hot paths and every URL on seeded datasets and compares them with a baseline.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', choices=list(benchmarks.SIZES), default=['small', 'medium'])
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark, the median is reported.')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+        parser.add_argument('--save-baseline', action='store_true', help='Replace the baseline with these results.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed relative increase in wall time before it is reported.')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        results = {}
+        setup_test_environment()
+        # Some GET views fail for the manager, e.g. joining a team they already manage, the status is still timed.
+        request_logger = logging.getLogger('django.request')
+        request_log_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        # The benchmarks run against a test database so the real database is never touched.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for size in options['sizes']:
+                self.stdout.write(f'Running {size} benchmarks...')
+                call_command('flush', interactive=False, verbosity=0)
+                results[size] = benchmarks.run_size(size, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            request_logger.setLevel(request_log_level)
+            teardown_test_environment()
+
+        for size, size_results in results.items():
+            self.stdout.write(f'\n{size}')
+            for name, result in size_results.items():
+                self.stdout.write(f'  {name:<50} {result["wall_ms"]:>10.3f}ms {result["queries"]:>7} queries')
+
+        if options['output']:
+            benchmarks.write_json(options['output'], results)
+
+        if options['save_baseline']:
+            benchmarks.write_json(options['baseline'], results)
+            self.stdout.write(self.style.SUCCESS(f'Saved baseline to {options["baseline"]}.'))
+            return
+
+        try:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+        except FileNotFoundError:
+            self.stdout.write(self.style.WARNING(f'No baseline found at {options["baseline"]}.'))
+            return
+
+        regressions = benchmarks.compare(results, baseline, options['tolerance'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline.'))
+        elif options['fail_on_regression']:
+            raise CommandError('Regressions against the baseline:\n' + '\n'.join(regressions))
+        else:
+            self.stdout.write(self.style.WARNING('Regressions against the baseline:\n' + '\n'.join(regressions)))
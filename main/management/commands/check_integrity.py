@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+from collections import Counter, deque
+from datetime import date
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from main import packing
+from main.models import Timesheet, TimesheetRow, TimesheetClaimRow, ArchivedTimesheetRow, ArchivedTimesheetClaimRow, \
+    Penalty
+
+MISSING = 'missing'
+DUPLICATED = 'duplicated'
+MISMATCHED = 'mismatched'
+
+
+def compare(stored: list, expected: list):
+    """
+    :param stored: List[Tuple] of the saved rows
+    :param expected: List[Tuple] of the rows the timesheet builds now
+    :return: None when they match, otherwise MISSING, DUPLICATED or MISMATCHED
+    """
+    stored, expected = Counter(stored), Counter(expected)
+    if stored == expected:
+        return None
+    if not stored:
+        return MISSING
+    copies = {count // expected[row] if row in expected and count % expected[row] == 0 else 0
+              for row, count in stored.items()}
+    if set(stored) == set(expected) and len(copies) == 1 and copies.pop() > 1:
+        return DUPLICATED
+    return MISMATCHED
+
+
+def check_batch(batch: list) -> list:
+    """
+    Rebuilds the rows of a batch of timesheets and compares them with the saved ones, runs in the worker processes
+    without touching the database.
+
+    :param batch: List[Tuple(pk, start_date_time, seconds, base threshold, saved rows, saved cost rows)] with rows
+        as Tuple(date_worked, worked_seconds, payout_seconds) and cost rows as Tuple(cost code pk, seconds)
+    :return: List[Tuple(timesheet pk, 'rows' or 'cost rows', problem)]
+    """
+    timesheets = [Timesheet(pk=pk, start_date_time=start, _duration=seconds, penalty=Penalty(base_threshold=threshold))
+                  for pk, start, seconds, threshold, _, _ in batch]
+    rows_per_timesheet, cost_rows = Timesheet.build_rows_in_bulk(timesheets)
+    expected_costs = {}
+    for row in cost_rows:
+        expected_costs.setdefault(row.time_sheet.pk, []).append((row.cost_code_id, row.seconds))
+    problems = []
+    for (pk, _, _, _, rows, costs), expected_rows in zip(batch, rows_per_timesheet):
+        problem = compare(rows, [(row.date_worked, row.worked_seconds, row.payout_seconds) for row in expected_rows])
+        if problem:
+            problems.append((pk, 'rows', problem))
+        problem = compare(costs, expected_costs.get(pk, []))
+        if problem:
+            problems.append((pk, 'cost rows', problem))
+    return problems
+
+
+class Command(BaseCommand):
+    help = 'Checks that the rows and cost rows of every timesheet match what it builds now, and that no archived ' \
+           'rows belong to timesheets that are not archived. Archived timesheets are checked against the archive ' \
+           'and timesheets in closed pay periods like the others, but neither is repaired.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes checking the timesheets, 1 checks them in this process.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Timesheets read and repaired at a time.')
+        parser.add_argument('--repair', action='store_true',
+                            help='Rebuild the rows of the timesheets with problems and delete the orphaned rows.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        broken = set()
+        counts = Counter()
+        for problems in self.results(options['workers'], batch_size):
+            for pk, rows, problem in problems:
+                self.stdout.write(f'Timesheet {pk}: {rows} {problem}.')
+                broken.add(pk)
+                counts[problem] += 1
+
+        orphans = (ArchivedTimesheetRow.objects.filter(timesheet__archived=False),
+                   ArchivedTimesheetClaimRow.objects.filter(time_sheet__archived=False))
+        orphan_count = sum(queryset.count() for queryset in orphans)
+        self.stdout.write(f'{counts[MISMATCHED]} mismatched, {counts[DUPLICATED]} duplicated, '
+                          f'{counts[MISSING]} missing, {orphan_count} orphaned archived rows.')
+        if not options['repair']:
+            return
+
+        for queryset in orphans:
+            queryset.delete()
+        ids = sorted(broken)
+        repaired = 0
+        for start in range(0, len(ids), batch_size):
+            timesheets = list(Timesheet.objects.filter(pk__in=ids[start:start + batch_size], archived=False)
+                              .exclude(claim__pay_date__lt=date.today())
+                              .select_related('employee', 'penalty'))
+            Timesheet.regenerate_rows(timesheets)
+            repaired += len(timesheets)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt the rows of {repaired} timesheets and deleted {orphan_count} orphaned archived rows.'))
+        if repaired < len(ids):
+            # Payroll has been run on them, and frozen claim documents and cached reports show the current rows.
+            self.stdout.write(self.style.WARNING(
+                f'Left {len(ids) - repaired} archived timesheets or timesheets in closed pay periods as they are.'))
+
+    def results(self, workers: int, batch_size: int):
+        """
+        Checks the batches in the worker processes. Only this process reads the database and it stays a few batches
+        ahead of the workers, so memory doesn't grow with the number of timesheets.
+
+        :return: Iterator[List] of check_batch results, in the order of the batches
+        """
+        batches = self.batches(batch_size)
+        if workers <= 1:
+            yield from map(check_batch, batches)
+            return
+        # The workers don't use the database, don't share the connection with them.
+        connections.close_all()
+        with multiprocessing.Pool(workers, initializer=django.setup) as pool:
+            pending = deque()
+            for batch in batches:
+                pending.append(pool.apply_async(check_batch, (batch,)))
+                if len(pending) > 2 * workers:
+                    yield pending.popleft().get()
+            while pending:
+                yield pending.popleft().get()
+
+    @staticmethod
+    def batches(batch_size: int):
+        """
+        Streams the timesheets with their saved rows, from the archive for archived timesheets and decoded from
+        packed_rows, together with any TimesheetRow they also have, for packed ones.
+
+        :return: Iterator[List] of check_batch batches
+        """
+        batch = []
+        timesheets = Timesheet.objects.order_by('pk') \
+            .values_list('pk', 'start_date_time', '_duration', 'penalty__base_threshold', 'archived', 'packed_rows')
+        for timesheet in timesheets.iterator(chunk_size=batch_size):
+            batch.append(timesheet)
+            if len(batch) == batch_size:
+                yield Command.with_rows(batch)
+                batch = []
+        if batch:
+            yield Command.with_rows(batch)
+
+    @staticmethod
+    def with_rows(timesheets: list) -> list:
+        hot = [pk for pk, _, _, _, archived, _ in timesheets if not archived]
+        archived = [pk for pk, _, _, _, archived, _ in timesheets if archived]
+        rows, costs = {}, {}
+        for pk, _, _, _, is_archived, packed_rows in timesheets:
+            if packed_rows is not None and not is_archived:
+                rows[pk] = packing.unpack(packed_rows)
+        for model, ids in ((TimesheetRow, hot), (ArchivedTimesheetRow, archived)):
+            for pk, *row in model.objects.filter(timesheet_id__in=ids) \
+                    .values_list('timesheet', 'date_worked', 'worked_seconds', 'payout_seconds'):
+                rows.setdefault(pk, []).append(tuple(row))
+        for model, ids in ((TimesheetClaimRow, hot), (ArchivedTimesheetClaimRow, archived)):
+            for pk, *cost in model.objects.filter(time_sheet_id__in=ids).values_list('time_sheet', 'cost_code',
+                                                                                     'seconds'):
+                costs.setdefault(pk, []).append(tuple(cost))
+        return [(pk, start, seconds, threshold, rows.get(pk, []), costs.get(pk, []))
+                for pk, start, seconds, threshold, _, _ in timesheets]
@@ -0,0 +1,40 @@
+import logging
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from main import benchmarks
+from main.query_plans import plan_regressions
+
+
+class Command(BaseCommand):
+    help = 'Runs the views and model hot paths on a seeded test database, EXPLAINs every statement they run and ' \
+           'fails on any full scan of a growing table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=list(benchmarks.SIZES), default='small', help='Dataset to seed.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        # Some GET views fail for the manager, e.g. joining a team they already manage, their queries still count.
+        request_logger = logging.getLogger('django.request')
+        request_log_level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        # The statements are captured on a test database so the real database is never touched.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            call_command('seed_load', '--end-date=2022-06-30', seed=0, stdout=StringIO(),
+                         **benchmarks.SIZES[options['size']])
+            failures = plan_regressions(benchmarks.load_benchmark_data(),
+                                        self.stdout if options['verbosity'] > 1 else None)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            request_logger.setLevel(request_log_level)
+            teardown_test_environment()
+
+        if failures:
+            raise CommandError('Query plan regression:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('All query plans use an index.'))
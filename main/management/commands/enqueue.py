@@ -0,0 +1,23 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Queues a background job for manage.py run_worker, e.g. ' \
+           'enqueue command \'{"name": "backfill_rollups", "args": ["--since=2022-01-01"]}\''
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', help='Name of the job handler in main/jobs.py.')
+        parser.add_argument('arguments', nargs='?', default='{}', help='JSON object of arguments for the handler.')
+        parser.add_argument('--max-attempts', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            arguments = json.loads(options['arguments'])
+            job = Job.enqueue(options['name'], options['max_attempts'], **arguments)
+        except (ValueError, TypeError) as error:
+            raise CommandError(error)
+        self.stdout.write(self.style.SUCCESS(f'Queued job {job.pk}.'))
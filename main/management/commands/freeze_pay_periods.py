@@ -0,0 +1,26 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from main import documents
+from main.models import TimesheetClaim
+
+
+class Command(BaseCommand):
+    help = 'Renders and stores the claim documents of the pay periods whose pay date has passed, see main/documents.py.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only count the pay periods to freeze.')
+
+    def handle(self, *args, **options):
+        pay_periods = TimesheetClaim.objects.filter(pay_date__lt=date.today(), payperiodsnapshot__isnull=True) \
+            .order_by('pay_date')
+        if options['dry_run']:
+            self.stdout.write(f'{pay_periods.count()} pay periods would be frozen.')
+            return
+        frozen = 0
+        for pay_period in pay_periods:
+            if documents.freeze(pay_period):
+                frozen += 1
+                self.stdout.write(f'Froze the pay period paid on {pay_period.pay_date}.')
+        self.stdout.write(self.style.SUCCESS(f'Froze {frozen} pay periods.'))
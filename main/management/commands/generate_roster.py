@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Roster
+
+
+class Command(BaseCommand):
+    help = 'Creates the timesheets of on-call rosters over a date range, skipping shifts already entered.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('rosters', nargs='*', type=int, help='Primary keys of the rosters, all by default.')
+        parser.add_argument('--start', type=date.fromisoformat, default=date.today(),
+                            help='First day (YYYY-MM-DD) to create shifts for, today by default.')
+        parser.add_argument('--end', type=date.fromisoformat,
+                            help='Last day (YYYY-MM-DD) to create shifts for, a year after start by default.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Timesheets created per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the shifts in the range.')
+
+    def handle(self, *args, **options):
+        start = options['start']
+        end = options['end'] or start + timedelta(days=365)
+        if end < start:
+            raise CommandError('The end date is before the start date.')
+        rosters = Roster.objects.select_related('penalty').order_by('pk')
+        if options['rosters']:
+            rosters = rosters.filter(pk__in=options['rosters'])
+            missing = set(options['rosters']) - {roster.pk for roster in rosters}
+            if missing:
+                raise CommandError(f'No rosters with the ids: {", ".join(map(str, sorted(missing)))}.')
+
+        for roster in rosters:
+            if options['dry_run']:
+                self.stdout.write(f'{roster}: {len(roster.expand(start, end))} shifts.')
+                continue
+            created, skipped = roster.generate(start, end, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{roster}: created {len(created)} timesheets, skipped {len(skipped)} overlapping shifts.'))
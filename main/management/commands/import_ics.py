@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Lower
+
+from main.ics import IcsError, read_events
+from main.models import Employee, Penalty, Timesheet
+
+
+class Command(BaseCommand):
+    help = 'Imports on-call shifts from an iCalendar (.ics) file, one timesheet per attendee with a matching ' \
+           'employee email. Events already imported, by UID, are skipped so re-imports only add new shifts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='The .ics file, read one event at a time.')
+        parser.add_argument('--penalty', type=int, required=True, help='Primary key of the penalty of the shifts.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Events imported per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be imported.')
+
+    def handle(self, *args, **options):
+        self.penalty = Penalty.objects.filter(pk=options['penalty']).first()
+        if self.penalty is None:
+            raise CommandError(f'No penalty with the id {options["penalty"]}.')
+        self.dry_run = options['dry_run']
+        self.employees = {}
+        self.seen = set()
+        self.counts = {'created': 0, 'imported': 0, 'overlapping': 0, 'invalid': 0}
+        self.unknown = set()
+
+        try:
+            with open(options['path'], encoding='utf-8') as file:
+                batch = []
+                for event in read_events(file):
+                    batch.append(event)
+                    if len(batch) >= options['batch_size']:
+                        self.import_batch(batch)
+                        batch = []
+                self.import_batch(batch)
+        except (OSError, IcsError) as error:
+            raise CommandError(error)
+
+        if self.unknown:
+            self.stderr.write(f'No employee with the email: {", ".join(sorted(self.unknown)[:20])}'
+                              f'{" and more" if len(self.unknown) > 20 else ""}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Would create" if self.dry_run else "Created"} {self.counts["created"]} timesheets, skipped '
+            f'{self.counts["imported"]} already imported, {self.counts["overlapping"]} overlapping and '
+            f'{self.counts["invalid"]} without a duration.'))
+
+    def import_batch(self, events: list):
+        """
+        Matches the attendees of the events to employees and creates the new timesheets with a few bulk queries.
+        """
+        emails = {email for event in events for email in event['attendees']} - self.employees.keys()
+        if emails:
+            found = {employee.lower_email: employee for employee in
+                     Employee.objects.annotate(lower_email=Lower('email')).filter(lower_email__in=emails)}
+            self.employees.update({email: found.get(email) for email in emails})
+            self.unknown.update(email for email in emails if email not in found)
+
+        shifts = [(event, self.employees[email]) for event in events for email in event['attendees']
+                  if self.employees[email] is not None]
+        existing = set(Timesheet.objects.filter(employee__in={employee for _, employee in shifts},
+                                                import_uid__in={event['uid'] for event, _ in shifts})
+                       .values_list('employee_id', 'import_uid')) if shifts else set()
+        timesheets = []
+        for event, employee in shifts:
+            key = (employee.pk, event['uid'])
+            if key in existing or key in self.seen:
+                self.counts['imported'] += 1
+                continue
+            self.seen.add(key)
+            seconds = round((event['end'] - event['start']).total_seconds())
+            if seconds <= 0:
+                self.counts['invalid'] += 1
+                continue
+            timesheets.append(Timesheet(employee=employee, start_date_time=event['start'], _duration=seconds,
+                                        penalty=self.penalty, import_uid=event['uid']))
+
+        skipped = {id(later if later.pk is None else earlier)
+                   for earlier, later in Timesheet.batch_overlaps(timesheets)}
+        timesheets = [timesheet for timesheet in timesheets if id(timesheet) not in skipped]
+        self.counts['overlapping'] += len(skipped)
+        self.counts['created'] += len(timesheets)
+        if not self.dry_run:
+            Timesheet.bulk_create_with_rows(timesheets, len(timesheets) or 1)
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Timesheet, TimesheetRow
+
+
+class Command(BaseCommand):
+    help = 'Moves the rows of timesheets that are not archived into one packed column of the timesheet, or back ' \
+           'to TimesheetRow with --unpack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=0,
+                            help='Only pack timesheets that started more than this many days ago.')
+        parser.add_argument('--unpack', action='store_true', help='Move packed rows back to TimesheetRow.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Timesheets packed per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the timesheets to pack.')
+
+    def handle(self, *args, **options):
+        timesheets = Timesheet.objects.filter(archived=False, packed_rows__isnull=not options['unpack'],
+                                              start_date_time__lt=datetime.now() - timedelta(options['days']))
+        ids = list(timesheets.order_by('pk').values_list('pk', flat=True))
+        action = 'unpacked' if options['unpack'] else 'packed'
+        if options['dry_run']:
+            self.stdout.write(f'{len(ids)} timesheets would be {action}.')
+            return
+
+        row_count = 0
+        for start in range(0, len(ids), options['batch_size']):
+            batch = ids[start:start + options['batch_size']]
+            row_count += self.unpack(batch) if options['unpack'] else self.pack(batch)
+        self.stdout.write(self.style.SUCCESS(f'{action.capitalize()} {len(ids)} timesheets, {row_count} rows.'))
+
+    @staticmethod
+    @transaction.atomic
+    def pack(timesheet_ids: list) -> int:
+        """
+        :return: Number of rows packed
+        """
+        rows = {}
+        for row in TimesheetRow.objects.filter(timesheet_id__in=timesheet_ids).order_by('pk'):
+            rows.setdefault(row.timesheet_id, []).append(row)
+        timesheets = list(Timesheet.objects.filter(pk__in=timesheet_ids).only('pk'))
+        for timesheet in timesheets:
+            timesheet.pack(rows.get(timesheet.pk, []))
+        Timesheet.objects.bulk_update(timesheets, Timesheet.PACKED_FIELDS)
+        TimesheetRow.objects.filter(timesheet_id__in=timesheet_ids).delete()
+        return sum(len(timesheet_rows) for timesheet_rows in rows.values())
+
+    @staticmethod
+    @transaction.atomic
+    def unpack(timesheet_ids: list) -> int:
+        """
+        :return: Number of rows unpacked
+        """
+        rows = []
+        for timesheet in Timesheet.objects.filter(pk__in=timesheet_ids).only('pk', 'archived', 'packed_rows'):
+            rows += timesheet.rows
+        TimesheetRow.objects.bulk_create(rows)
+        Timesheet.objects.filter(pk__in=timesheet_ids).update(**{field: None for field in Timesheet.PACKED_FIELDS})
+        return len(rows)
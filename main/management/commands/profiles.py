@@ -0,0 +1,77 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main.middleware import list_profiles
+
+
+class Command(BaseCommand):
+    help = 'Lists the saved request profiles, or summarizes the top functions and queries of some of them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', help='Profile file names to summarize.')
+        parser.add_argument('--view', help='Summarize every saved profile of this URL name.')
+        parser.add_argument('--limit', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if options['profiles']:
+            profiles = [self.load(Path(settings.PROFILING_DIR) / name) for name in options['profiles']]
+        else:
+            profiles = [self.load(path) for path in list_profiles()]
+            if options['view']:
+                profiles = [profile for profile in profiles if profile['view'] == options['view']]
+            elif profiles:
+                self.print_list(profiles)
+                return
+        if not profiles:
+            raise CommandError(f'No profiles found in {settings.PROFILING_DIR}.')
+        self.summarize(profiles, options['limit'])
+
+    @staticmethod
+    def load(path) -> dict:
+        try:
+            with open(path) as file:
+                profile = json.load(file)
+        except FileNotFoundError:
+            raise CommandError(f'Profile {path} not found.')
+        profile['name'] = path.name
+        return profile
+
+    def print_list(self, profiles):
+        for profile in profiles:
+            self.stdout.write(f'{profile["name"]}  {datetime.fromtimestamp(profile["time"]):%Y-%m-%d %H:%M:%S}  '
+                              f'{profile["method"]} {profile["path"]} ({profile["view"]}) {profile["status"]}  '
+                              f'{profile["total_ms"]:.1f}ms  {len(profile["queries"])} queries')
+
+    def summarize(self, profiles, limit):
+        """
+        Adds up the function and query times over the profiles and prints the most expensive.
+        """
+        functions = {}
+        for profile in profiles:
+            for function in profile['functions']:
+                total = functions.setdefault(function['function'], {'calls': 0, 'total_ms': 0, 'cumulative_ms': 0})
+                for key in total:
+                    total[key] += function[key]
+        queries = {}
+        for profile in profiles:
+            for query in profile['queries']:
+                total = queries.setdefault(query['sql'], {'count': 0, 'ms': 0})
+                total['count'] += 1
+                total['ms'] += query['ms']
+
+        total_ms = sum(profile['total_ms'] for profile in profiles)
+        self.stdout.write(f'{len(profiles)} profile(s), {total_ms:.1f}ms in total\n')
+        self.stdout.write(f'Top functions by cumulative time\n{"cumulative":>12} {"own":>10} {"calls":>8}  function')
+        for name, function in sorted(functions.items(), key=lambda item: -item[1]['cumulative_ms'])[:limit]:
+            self.stdout.write(f'{function["cumulative_ms"]:>10.1f}ms {function["total_ms"]:>8.1f}ms '
+                              f'{function["calls"]:>8}  {name}')
+        self.stdout.write(f'\nTop functions by own time\n{"own":>12} {"calls":>8}  function')
+        for name, function in sorted(functions.items(), key=lambda item: -item[1]['total_ms'])[:limit]:
+            self.stdout.write(f'{function["total_ms"]:>10.1f}ms {function["calls"]:>8}  {name}')
+        self.stdout.write(f'\nTop queries by total time\n{"total":>12} {"count":>8}  sql')
+        for sql, query in sorted(queries.items(), key=lambda item: -item[1]['ms'])[:limit]:
+            self.stdout.write(f'{query["ms"]:>10.1f}ms {query["count"]:>8}  {sql}')
@@ -0,0 +1,151 @@
+import csv
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from main.models import Employee, Team
+
+COLUMNS = ['username', 'first_name', 'last_name', 'email', 'password', 'team', 'manager']
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+
+
+def unique_slugs(model, values: list) -> list:
+    """
+    Slugs for new instances of model the way its AutoSlugField would make them, checked against the existing
+    slugs in one query per 100 distinct values rather than one per instance.
+
+    :param values: List[String] the slug field is populated from, one per new instance
+    :return: List[String or None]
+    """
+    field = model._meta.get_field('slug')
+    bases = [field.slugify(value)[:field.max_length] if value else None for value in values]
+    distinct = sorted({base for base in bases if base})
+    taken = set()
+    for start in range(0, len(distinct), 100):
+        chunk = distinct[start:start + 100]
+        lookup = Q(slug__in=chunk)
+        for base in chunk:
+            lookup |= Q(slug__startswith=f'{base}{field.index_sep}')
+        taken.update(model.objects.filter(lookup).values_list('slug', flat=True))
+
+    slugs = []
+    for base in bases:
+        slug, index = base, 1
+        while slug is not None and slug in taken:
+            index += 1
+            suffix = f'{field.index_sep}{index}'
+            slug = f'{base[:field.max_length - len(suffix)]}{suffix}'
+        taken.add(slug)
+        slugs.append(slug)
+    return slugs
+
+
+def precomputed(instances: list) -> list:
+    """
+    Marks the instances so bulk_create keeps their slugs, which must be set and unique already, see unique_slugs and
+    PrecomputedSlugField.
+    """
+    for instance in instances:
+        instance.precomputed_slug = True
+    return instances
+
+
+class Command(BaseCommand):
+    help = 'Creates employees from a CSV file with the columns ' + ', '.join(COLUMNS) + '.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                            help='Processes hashing the passwords, 1 hashes them in this process.')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with open(options['csv_file'], newline='') as file:
+            rows = [{column: (row.get(column) or '').strip() for column in COLUMNS} for row in csv.DictReader(file)]
+        self.validate(rows)
+
+        passwords = [row['password'] or None for row in rows]
+        if options['workers'] > 1:
+            with ProcessPoolExecutor(options['workers']) as executor:
+                hashes = list(executor.map(make_password, passwords, chunksize=max(1, len(rows) // 100)))
+        else:
+            hashes = [make_password(password) for password in passwords]
+
+        with transaction.atomic():
+            teams, new_team_count = self.get_or_create_teams({row['team'] for row in rows if row['team']})
+            # The employee pages are found by slug, the username is used when there is no name to slug.
+            slugs = unique_slugs(Employee, [f'{row["first_name"]} {row["last_name"]}'.strip() or row['username']
+                                            for row in rows])
+            employees = [Employee(username=row['username'],
+                                  first_name=row['first_name'],
+                                  last_name=row['last_name'],
+                                  email=row['email'],
+                                  password=password,
+                                  slug=slug,
+                                  team=teams.get(row['team']))
+                         for row, password, slug in zip(rows, hashes, slugs)]
+            employees = Employee.objects.bulk_create(precomputed(employees), batch_size=options['batch_size'])
+
+            managed_teams = []
+            for row, employee in zip(rows, employees):
+                if row['manager'].lower() in TRUE_VALUES:
+                    team = teams[row['team']]
+                    team.manager = employee
+                    managed_teams.append(team)
+            Team.objects.bulk_update(managed_teams, ['manager'])
+            manager_group = Group.objects.get(name='Manager')
+            Employee.groups.through.objects.bulk_create(
+                [Employee.groups.through(employee_id=team.manager_id, group_id=manager_group.pk)
+                 for team in managed_teams])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Provisioned {len(employees)} employees, {len(managed_teams)} managers and {new_team_count} new teams.'))
+
+    @staticmethod
+    def validate(rows: list):
+        """
+        Checks every row before anything is written, so a bad file creates nothing.
+        """
+        errors = []
+        usernames = [row['username'] for row in rows]
+        if not all(usernames):
+            errors.append('Every row needs a username.')
+        duplicates = sorted(username for username, count in Counter(usernames).items() if count > 1)
+        if duplicates:
+            errors.append(f'Usernames repeated in the file: {", ".join(duplicates)}.')
+        existing = sorted(Employee.objects.filter(username__in=usernames).values_list('username', flat=True))
+        if existing:
+            errors.append(f'Usernames already taken: {", ".join(existing)}.')
+
+        managers = [row for row in rows if row['manager'].lower() in TRUE_VALUES]
+        if any(not row['team'] for row in managers):
+            errors.append('Managers need a team.')
+        manager_teams = [row['team'] for row in managers if row['team']]
+        repeated = sorted(team for team, count in Counter(manager_teams).items() if count > 1)
+        if repeated:
+            errors.append(f'Teams with more than one manager in the file: {", ".join(repeated)}.')
+        managed = sorted(Team.objects.filter(name__in=manager_teams, manager__isnull=False)
+                         .values_list('name', flat=True))
+        if managed:
+            errors.append(f'Teams that already have a manager: {", ".join(managed)}.')
+        if errors:
+            raise CommandError('\n'.join(errors))
+
+    @staticmethod
+    def get_or_create_teams(names: set) -> tuple:
+        """
+        :return: Tuple(Dictionary{name: Team}, number of teams created)
+        """
+        teams = {}
+        for team in Team.objects.filter(name__in=names).order_by('pk'):
+            teams.setdefault(team.name, team)
+        missing = sorted(names - set(teams))
+        new_teams = [Team(name=name, slug=slug) for name, slug in zip(missing, unique_slugs(Team, missing))]
+        teams.update({team.name: team for team in Team.objects.bulk_create(precomputed(new_teams))})
+        return teams, len(new_teams)
@@ -0,0 +1,40 @@
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.models import Job
+
+
+class Command(BaseCommand):
+    help = 'Runs the background jobs queued in the database, see main/jobs.py. Start as many workers as needed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--burst', action='store_true', help='Exit once no jobs are due instead of polling.')
+        parser.add_argument('--max-jobs', type=int, help='Exit after running this many jobs.')
+        parser.add_argument('--poll', type=float, default=1, help='Seconds to wait when no jobs are due.')
+        parser.add_argument('--stale-after', type=int, default=3600,
+                            help='Requeue jobs that have been running longer than this many seconds.')
+        parser.add_argument('--worker', default=f'{socket.gethostname()}:{os.getpid()}',
+                            help='Name recorded on the jobs this worker claims.')
+
+    def handle(self, *args, **options):
+        requeued = Job.requeue_stale(options['stale_after'])
+        if requeued:
+            self.stdout.write(f'Requeued {requeued} stale jobs.')
+
+        run = failed = 0
+        while options['max_jobs'] is None or run < options['max_jobs']:
+            job = Job.claim(options['worker'])
+            if job is None:
+                if options['burst']:
+                    break
+                time.sleep(options['poll'])
+                continue
+            run += 1
+            if not job.run(settings.JOB_RETRY_DELAY):
+                failed += 1
+                self.stderr.write(f'Job {job.pk} {job.name} failed, attempt {job.attempts} of {job.max_attempts}.')
+        self.stdout.write(self.style.SUCCESS(f'Ran {run} jobs, {failed} failed.'))
@@ -0,0 +1,230 @@
+import bisect
+import random
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.db import transaction
+from django.utils.text import slugify
+
+from main.models import Employee, Team, PenaltyType, Penalty, CostCode, Timesheet, TimesheetRow, \
+    TimesheetClaimRow, Claim, TimesheetClaim, WeeklyRollup, overlapping_pairs
+
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery', 'Quinn',
+               'Charlie', 'Drew', 'Harper', 'Kai', 'Logan', 'Parker', 'Reese', 'Rowan', 'Sage', 'Blake']
+LAST_NAMES = ['Smith', 'Jones', 'Williams', 'Brown', 'Wilson', 'Taylor', 'Nguyen', 'Johnson', 'Martin', 'White',
+              'Anderson', 'Walker', 'Thompson', 'Kelly', 'Ryan', 'Lee', 'Harris', 'King', 'Clarke', 'Young']
+
+# Name, penalty type code, share of the timesheets submitted. The penalty types are named after the codes, which is
+# how Penalty.penalty_type matches them.
+PENALTIES = [
+    ('On Call', 'PD', 0.5),
+    ('Call Out', 'PD', 0.3),
+    ('Change Request', 'TL', 0.2),
+]
+
+# Duration range in minutes, share of the timesheets submitted
+DURATIONS = [
+    ((15, 120), 0.55),  # Short call outs
+    ((120, 480), 0.3),  # Change windows
+    ((480, 1440), 0.12),  # Overnight and weekend shifts
+    ((1440, 2160), 0.03),  # Shifts running over more than two days
+]
+
+
+class Command(BaseCommand):
+    help = 'Generates teams, employees, timesheets, claims and pay periods for load testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=5)
+        parser.add_argument('--employees', type=int, default=50, help='Employees in total, including managers.')
+        parser.add_argument('--years', type=float, default=1)
+        parser.add_argument('--timesheets-per-week', type=float, default=2,
+                            help='Average timesheets submitted per employee per week.')
+        parser.add_argument('--end-date', type=date.fromisoformat, default=date.today(),
+                            help='Last day of generated data (YYYY-MM-DD), pass it for reproducible output.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='seed', help='Prefix for usernames and team names.')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Timesheets written per transaction.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        end_date = options['end_date']
+        start_date = end_date - timedelta(days=round(options['years'] * 365))
+
+        penalties = self.create_reference_data()
+        teams, employees = self.create_teams_and_employees(rng, options)
+        pay_periods = self.create_pay_periods(start_date, end_date)
+        balances = self.create_timesheets(rng, employees, penalties, pay_periods, start_date, end_date,
+                                          options['timesheets_per_week'])
+        claim_count = self.create_claims(rng, employees, balances, start_date, end_date)
+        # The timesheets are bulk created, so their weekly rollups are built afterwards.
+        WeeklyRollup.backfill(start_date)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(teams)} teams, {len(employees)} employees, {len(pay_periods)} pay periods '
+            f'and {claim_count} claims between {start_date} and {end_date}.'))
+
+    def create_reference_data(self) -> list:
+        """
+        Makes sure the Manager group, cost codes, penalty types and penalties exist.
+
+        :return: List[Tuple(Penalty, share)]
+        """
+        Group.objects.get_or_create(name='Manager')
+        if CostCode.objects.filter(pk__in=[CostCode.BASE, CostCode.OVERTIME, CostCode.PUBLIC_HOLIDAY]).count() < 3:
+            call_command('loaddata', 'cost_code', verbosity=0)
+
+        penalties = []
+        for name, type_name, share in PENALTIES:
+            PenaltyType.objects.get_or_create(name=type_name)
+            penalty = Penalty.objects.filter(name=name, penalty_type=type_name).first()
+            if penalty is None:
+                penalty = Penalty.objects.create(name=name, penalty_type=type_name)
+            penalties.append((penalty, share))
+        return penalties
+
+    def create_teams_and_employees(self, rng, options):
+        prefix = options['prefix']
+        teams = Team.objects.bulk_create(
+            [Team(name=f'{prefix} team {number:03}') for number in range(1, options['teams'] + 1)])
+
+        password = make_password(options['password'])
+        employees = []
+        for number in range(1, options['employees'] + 1):
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            username = f'{prefix}_{number:06}'
+            employees.append(Employee(username=username,
+                                      first_name=first_name,
+                                      last_name=last_name,
+                                      slug=slugify(f'{first_name} {last_name} {username}'),
+                                      password=password,
+                                      team=teams[(number - 1) % len(teams)],
+                                      tutorial_done=True))
+        employees = Employee.objects.bulk_create(employees, batch_size=self.batch_size)
+
+        # The first employee in each team is its manager.
+        managers = employees[:len(teams)]
+        for team, manager in zip(teams, managers):
+            team.manager = manager
+        Team.objects.bulk_update(teams, ['manager'])
+        manager_group = Group.objects.get(name='Manager')
+        Employee.groups.through.objects.bulk_create(
+            [Employee.groups.through(employee_id=manager.pk, group_id=manager_group.pk) for manager in managers])
+        return teams, employees
+
+    def create_pay_periods(self, start_date, end_date) -> list:
+        """
+        Creates a fortnightly TimesheetClaim, paid on a Wednesday, for each period between the dates.
+
+        :return: List[TimesheetClaim]
+        """
+        pay_date = start_date + timedelta(days=(2 - start_date.weekday()) % 7 + 14)
+        pay_periods = []
+        while pay_date <= end_date + timedelta(days=7):
+            pay_periods.append(TimesheetClaim(pay_date=pay_date))
+            pay_date += timedelta(days=14)
+        return TimesheetClaim.objects.bulk_create(pay_periods)
+
+    def create_timesheets(self, rng, employees, penalties, pay_periods, start_date, end_date, per_week) -> dict:
+        """
+        Creates timesheets with their rows and cost code rows in batches.
+
+        :return: Dictionary{(employee pk, penalty type name): accrued seconds}
+        """
+        weeks = (end_date - start_date).days / 7
+        period_starts = [pay_period.period_start for pay_period in pay_periods]
+        balances = {}
+        batch = []
+        total = 0
+        for employee in employees:
+            generated = []
+            # Some employees are on call far more often than others.
+            for _ in range(round(rng.uniform(0.25, 1.75) * per_week * weeks)):
+                penalty = rng.choices([penalty for penalty, _ in penalties],
+                                      weights=[share for _, share in penalties])[0]
+                (low, high), = rng.choices([minutes for minutes, _ in DURATIONS],
+                                           weights=[share for _, share in DURATIONS])
+                start_date_time = datetime.combine(start_date, datetime.min.time()) + timedelta(
+                    days=rng.randrange((end_date - start_date).days),
+                    hours=rng.choice([rng.randint(0, 23), rng.randint(17, 23)]),
+                    minutes=rng.choice([0, 15, 30, 45]))
+                timesheet = Timesheet(employee=employee,
+                                      start_date_time=start_date_time,
+                                      _duration=rng.randint(low, high) * 60,
+                                      penalty=penalty)
+                timesheet.claim = self.pay_period_for(timesheet, pay_periods, period_starts)
+                timesheet.expiry_date_time = timesheet.calculate_expiry_date_time()
+                if timesheet.claim:
+                    # Only approved timesheets are added to pay periods.
+                    timesheet.status = Timesheet.APPROVED
+                generated.append(timesheet)
+            # Employees can't submit overlapping timesheets, the later of each overlapping pair is dropped.
+            overlapping = {id(later) for _, later in overlapping_pairs(generated)}
+            batch += [timesheet for timesheet in generated if id(timesheet) not in overlapping]
+            if len(batch) >= self.batch_size:
+                total += self.write_timesheets(batch, balances)
+                batch = []
+        total += self.write_timesheets(batch, balances)
+        self.stdout.write(f'Created {total} timesheets.')
+        return balances
+
+    @staticmethod
+    def pay_period_for(timesheet, pay_periods, period_starts):
+        """
+        Finds the latest pay period the timesheet falls in, matching TimesheetClaim.add_time_sheets.
+        """
+        index = bisect.bisect_right(period_starts, timesheet.start_date_time.date()) - 1
+        if index < 0 or timesheet.end_date_time.date() > pay_periods[index].period_end:
+            return None
+        return pay_periods[index]
+
+    @staticmethod
+    @transaction.atomic
+    def write_timesheets(batch, balances) -> int:
+        rows_per_timesheet, cost_rows = Timesheet.build_rows_in_bulk(batch)
+        rows = []
+        for timesheet, timesheet_rows in zip(batch, rows_per_timesheet):
+            if settings.PACK_TIMESHEET_ROWS:
+                timesheet.pack(timesheet_rows)
+            else:
+                rows += timesheet_rows
+            key = (timesheet.employee_id, timesheet.penalty.penalty_type)
+            balances[key] = balances.get(key, 0) + sum(row.payout_seconds for row in timesheet_rows)
+        Timesheet.objects.bulk_create(batch)
+        TimesheetRow.objects.bulk_create(rows)
+        TimesheetClaimRow.objects.bulk_create(cost_rows)
+        return len(batch)
+
+    def create_claims(self, rng, employees, balances, start_date, end_date) -> int:
+        """
+        Creates roughly monthly claims that never exceed the time the employee accrued.
+        """
+        penalty_types = {penalty_type.name: penalty_type for penalty_type in PenaltyType.objects.all()}
+        claims = []
+        for employee in employees:
+            for type_name, penalty_type in penalty_types.items():
+                available = balances.get((employee.pk, type_name), 0)
+                claim_date = start_date + timedelta(days=rng.randint(20, 40))
+                while claim_date <= end_date and available >= 3600:
+                    claimed_seconds = min(available, rng.randint(1, 8) * 3600)
+                    claims.append(Claim(employee=employee,
+                                        penalty_type=penalty_type,
+                                        claimed_seconds=claimed_seconds,
+                                        claim_date=claim_date))
+                    available -= claimed_seconds
+                    claim_date += timedelta(days=rng.randint(20, 40))
+
+        # claim_date is auto_now_add, bulk_create stamps today so the generated dates are written back after.
+        claim_dates = [claim.claim_date for claim in claims]
+        with transaction.atomic():
+            Claim.objects.bulk_create(claims, batch_size=self.batch_size)
+            for claim, claim_date in zip(claims, claim_dates):
+                claim.claim_date = claim_date
+            Claim.objects.bulk_update(claims, ['claim_date'], batch_size=self.batch_size)
+        return len(claims)
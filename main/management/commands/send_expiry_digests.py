@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.core import mail
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.template.loader import render_to_string
+
+from main.models import Timesheet
+
+
+class Command(BaseCommand):
+    help = 'Emails each employee a digest of their accrued time expiring in the next few days, run it once per ' \
+           'that many days.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Include time expiring within this many days.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails sent per connection.')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the digests to send.')
+
+    def handle(self, *args, **options):
+        timesheets = self.expiring(options['days'])
+        messages = [self.digest(employee, list(expiring), options['days'])
+                    for employee, expiring in groupby(timesheets, key=lambda timesheet: timesheet.employee)]
+        if options['dry_run']:
+            self.stdout.write(f'{len(messages)} digests would be sent.')
+            return
+
+        sent = 0
+        connection = mail.get_connection()
+        for start in range(0, len(messages), options['batch_size']):
+            sent += connection.send_messages(messages[start:start + options['batch_size']]) or 0
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} expiry digests.'))
+
+    @staticmethod
+    def expiring(days: int) -> list:
+        """
+        Timesheets with payout left that expire in the next days, grouped by employee, in one range query on the
+        expiry index. Employees without an email address are left out.
+
+        :return: List[Timesheet] with payout_seconds, ordered by employee and expiry
+        """
+        now = datetime.now()
+        return list(Timesheet.objects
+                    .filter(expiry_date_time__gte=now, expiry_date_time__lt=now + timedelta(days), archived=False)
+                    .exclude(employee__email='')
+                    .select_related('employee', 'penalty')
+                    .annotate(payout_seconds=Coalesce(Sum('timesheetrow__payout_seconds'), 0)
+                              + Coalesce('packed_payout_seconds', 0))
+                    .filter(payout_seconds__gt=0)
+                    .order_by('employee', 'expiry_date_time'))
+
+    @staticmethod
+    def digest(employee, timesheets: list, days: int) -> mail.EmailMessage:
+        for timesheet in timesheets:
+            timesheet.payout_hours = timesheet.payout_seconds / 3600
+        body = render_to_string('main/expiry_digest.txt', {
+            'employee': employee,
+            'days': days,
+            'timesheets': timesheets,
+            'total_hours': sum(timesheet.payout_hours for timesheet in timesheets),
+        })
+        return mail.EmailMessage(f'Time expiring in the next {days} days', body, settings.DEFAULT_FROM_EMAIL,
+                                 [employee.email])
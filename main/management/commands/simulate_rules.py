@@ -0,0 +1,57 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import reference_data
+from main.simulator import Rules, Simulation
+
+
+def penalty_value(value: str) -> tuple:
+    penalty, _, number = value.partition('=')
+    try:
+        return int(penalty), int(number)
+    except ValueError:
+        raise CommandError(f'Expected PENALTY=NUMBER, got "{value}".')
+
+
+class Command(BaseCommand):
+    help = 'Compares the hours per cost code and team of past timesheets with what they would be under other ' \
+           'penalty rules. Nothing is saved.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='First day (YYYY-MM-DD), a year before end by '
+                                                                     'default.')
+        parser.add_argument('--end', type=date.fromisoformat, default=date.today(),
+                            help='Last day (YYYY-MM-DD), today by default.')
+        parser.add_argument('--threshold', action='append', default=[], metavar='PENALTY=SECONDS',
+                            help='Base threshold of a penalty, can be repeated.')
+        parser.add_argument('--valid-days', action='append', default=[], metavar='PENALTY=DAYS',
+                            help='Days the timesheets of a penalty can be claimed for, can be repeated.')
+        parser.add_argument('--weekday-multiplier', type=float)
+        parser.add_argument('--sunday-multiplier', type=float)
+        parser.add_argument('--public-holiday-multiplier', type=float)
+
+    def handle(self, *args, **options):
+        end = options['end']
+        start = options['start'] or end - timedelta(days=365)
+        if end < start:
+            raise CommandError('The end date is before the start date.')
+        thresholds = dict(map(penalty_value, options['threshold']))
+        valid_days = dict(map(penalty_value, options['valid_days']))
+        missing = (set(thresholds) | set(valid_days)) - {penalty.pk for penalty in reference_data.penalties()}
+        if missing:
+            raise CommandError(f'No penalties with the ids: {", ".join(map(str, sorted(missing)))}.')
+
+        simulation = Simulation(start, end, Rules(thresholds, valid_days, options['weekday_multiplier'],
+                                                  options['sunday_multiplier'], options['public_holiday_multiplier']))
+        self.stdout.write(f'{len(simulation.history)} timesheets from {start} to {end}, hours now -> proposed.')
+        self.stdout.write('Cost codes:')
+        for row in simulation.cost_codes:
+            self.stdout.write(f'  {row["name"]}: {row["current"]:.2f} -> {row["proposed"]:.2f} '
+                              f'({row["delta"]:+.2f})')
+        self.stdout.write('Teams:')
+        for row in simulation.teams:
+            payout, claimable = row['payout'], row['claimable']
+            self.stdout.write(f'  {row["name"]}: payout {payout["current"]:.2f} -> {payout["proposed"]:.2f} '
+                              f'({payout["delta"]:+.2f}), claimable {claimable["current"]:.2f} -> '
+                              f'{claimable["proposed"]:.2f} ({claimable["delta"]:+.2f})')
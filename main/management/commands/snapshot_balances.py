@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.models import Employee, BalanceSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Snapshots the balances of employees with events since their last snapshot, run it periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employee', help='Slug of a single employee to snapshot.')
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.order_by('pk')
+        if options['employee']:
+            employees = employees.filter(slug=options['employee'])
+            if not employees.exists():
+                raise CommandError(f'No employee with the slug "{options["employee"]}".')
+
+        taken = sum(BalanceSnapshot.take(employee) is not None for employee in employees.iterator())
+        self.stdout.write(self.style.SUCCESS(f'Took {taken} balance snapshots.'))
@@ -0,0 +1,329 @@
+import cProfile
+import fcntl
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+
+# Upper bounds of the histogram buckets, the last bucket is +Inf.
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+QUERY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000]
+
+# Metric name: (help text, buckets)
+METRICS = {
+    'timesheets_request_duration_seconds': ('Total time spent handling the request.', DURATION_BUCKETS),
+    'timesheets_request_db_duration_seconds': ('Time spent running database queries.', DURATION_BUCKETS),
+    'timesheets_request_template_duration_seconds': ('Time spent rendering templates.', DURATION_BUCKETS),
+    'timesheets_request_queries': ('Number of database queries run.', QUERY_BUCKETS),
+}
+
+# Histograms of the processes that have exited, folded together so the directory doesn't grow with every restart.
+EXITED_FILENAME = 'metrics-exited.json'
+PROCESS_FILENAME = re.compile(r'metrics-(\d+)-\w+\.json')
+
+
+def _running(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # Exists, owned by another user.
+    return True
+
+
+def _read(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}  # Removed or replaced while reading, it is picked up on the next scrape.
+
+
+def _write(path: Path, histograms: dict):
+    temporary = path.with_name(f'{path.name}.tmp')
+    temporary.write_text(json.dumps(histograms))
+    os.replace(temporary, path)
+
+
+def _merge(merged: dict, histograms: dict):
+    for name, views in histograms.items():
+        for view, histogram in views.items():
+            total = merged.setdefault(name, {}).setdefault(
+                view, {'buckets': [0] * len(histogram['buckets']), 'sum': 0, 'count': 0})
+            total['buckets'] = [a + b for a, b in zip(total['buckets'], histogram['buckets'])]
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+
+
+class MetricsStore:
+    """
+    Request histograms for this process, periodically written to a file of its own in PERFORMANCE_METRICS_DIR.
+
+    Each gunicorn worker writes a separate file and collect() merges them all, so the /metrics endpoint reports
+    every worker whichever one serves the scrape. The files of exited workers are folded into one file of exited
+    processes, so counters never go backwards and the directory holds one file per running worker plus that one.
+    Processes are told apart by PID, so the directory must not be shared between hosts or containers.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.last_flush = 0
+        self.filename = f'metrics-{os.getpid()}-{uuid.uuid4().hex}.json'
+
+    @property
+    def directory(self) -> Path:
+        return Path(settings.PERFORMANCE_METRICS_DIR)
+
+    def observe(self, view: str, values: dict):
+        """
+        Adds one request to the histograms.
+
+        :param view: URL name of the view that handled the request
+        :param values: Dictionary{metric name: Float}
+        """
+        with self.lock:
+            for name, value in values.items():
+                buckets = METRICS[name][1]
+                histogram = self.histograms.setdefault(name, {}).setdefault(
+                    view, {'buckets': [0] * (len(buckets) + 1), 'sum': 0, 'count': 0})
+                index = next((i for i, bound in enumerate(buckets) if value <= bound), len(buckets))
+                histogram['buckets'][index] += 1
+                histogram['sum'] += value
+                histogram['count'] += 1
+        if time.monotonic() - self.last_flush > settings.PERFORMANCE_METRICS_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            self.last_flush = time.monotonic()
+            data = json.dumps(self.histograms)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self.directory / f'{self.filename}.tmp'
+        temporary.write_text(data)
+        os.replace(temporary, self.directory / self.filename)
+
+    def fold_exited(self):
+        """
+        Adds the files of processes that are no longer running to the exited file and removes them. Called by
+        collect() with the lock held.
+        """
+        exited = [path for path in self.directory.glob('metrics-*.json')
+                  if (match := PROCESS_FILENAME.fullmatch(path.name)) and not _running(int(match.group(1)))]
+        if not exited:
+            return
+        histograms = _read(self.directory / EXITED_FILENAME)
+        for path in exited:
+            _merge(histograms, _read(path))
+        _write(self.directory / EXITED_FILENAME, histograms)
+        for path in exited:
+            path.unlink()
+
+    def collect(self) -> dict:
+        """
+        Merges the histograms written by every process, after folding those of exited processes.
+
+        :return: Dictionary{metric name: Dictionary{view: histogram}}
+        """
+        self.flush()
+        merged = {}
+        # Workers scraped at the same time would otherwise fold the same file twice, or read a file both before and
+        # after it is folded.
+        with open(self.directory / 'metrics.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            self.fold_exited()
+            for path in self.directory.glob('metrics-*.json'):
+                _merge(merged, _read(path))
+        return merged
+
+    def render(self) -> str:
+        """
+        The merged histograms in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, views in sorted(self.collect().items()):
+            description, buckets = METRICS[name]
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for view, histogram in sorted(views.items()):
+                cumulative = 0
+                for bound, count in zip([str(bound) for bound in buckets] + ['+Inf'], histogram['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_sum{{view="{view}"}} {histogram["sum"]}')
+                lines.append(f'{name}_count{{view="{view}"}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsStore()
+
+
+class RequestTimer:
+    """
+    Database execute wrapper that counts and times the queries run for one request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0
+        self.template_seconds = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+class PerformanceMiddleware:
+    """
+    Records the query count, database time, template render time and total time of each request.
+
+    The timings are returned in a Server-Timing header and added to the histograms served at /metrics.
+    Keep it first in MIDDLEWARE so the total includes the other middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        request.performance_timer = timer = RequestTimer()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        total_seconds = time.perf_counter() - start
+
+        response['Server-Timing'] = ', '.join([
+            f'db;desc="{timer.queries} queries";dur={timer.db_seconds * 1000:.3f}',
+            f'template;dur={timer.template_seconds * 1000:.3f}',
+            f'total;dur={total_seconds * 1000:.3f}',
+        ])
+        match = request.resolver_match
+        metrics.observe(match.view_name if match else 'unresolved', {
+            'timesheets_request_duration_seconds': total_seconds,
+            'timesheets_request_db_duration_seconds': timer.db_seconds,
+            'timesheets_request_template_duration_seconds': timer.template_seconds,
+            'timesheets_request_queries': timer.queries,
+        })
+        return response
+
+    def process_template_response(self, request, response):
+        # Runs just before the response is rendered, the callback runs just after.
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.performance_timer.template_seconds += time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class QueryLog:
+    """
+    Database execute wrapper that keeps the SQL and duration of each query.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({'sql': sql, 'ms': (time.perf_counter() - start) * 1000})
+
+
+class ProfilingMiddleware:
+    """
+    Profiles requests with cProfile and saves the slow ones, with their SQL, to PROFILING_DIR.
+
+    A request is profiled when a staff user sends the PROFILING_HEADER header, or at random for a
+    PROFILING_SAMPLE_RATE share of requests. Sampled requests are only saved when they take longer than
+    PROFILING_THRESHOLD_MS. Only the newest PROFILING_MAX_FILES profiles are kept, see manage.py profiles.
+    Must come after AuthenticationMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        requested = bool(request.headers.get(settings.PROFILING_HEADER)) and request.user.is_staff
+        if not requested and random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        query_log = QueryLog()
+        start = time.perf_counter()
+        with connection.execute_wrapper(query_log):
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        total_ms = (time.perf_counter() - start) * 1000
+
+        if requested or total_ms > settings.PROFILING_THRESHOLD_MS:
+            match = request.resolver_match
+            response['X-Profile-Id'] = save_profile({
+                'time': time.time(),
+                'method': request.method,
+                'path': request.path,
+                'view': match.view_name if match else 'unresolved',
+                'status': response.status_code,
+                'total_ms': total_ms,
+                'queries': query_log.queries,
+                'functions': profile_functions(profiler),
+            })
+        return response
+
+
+def profile_functions(profiler, limit=500) -> list:
+    """
+    The functions with the most cumulative time in the profile.
+
+    :return: List[Dictionary{function, calls, total_ms, cumulative_ms}]
+    """
+    stats = pstats.Stats(profiler).stats
+    functions = [{'function': f'{filename}:{line}({name})',
+                  'calls': calls,
+                  'total_ms': total_time * 1000,
+                  'cumulative_ms': cumulative_time * 1000}
+                 for (filename, line, name), (_, calls, total_time, cumulative_time, _) in stats.items()]
+    return sorted(functions, key=lambda function: -function['cumulative_ms'])[:limit]
+
+
+def save_profile(profile: dict) -> str:
+    """
+    Writes the profile to PROFILING_DIR and removes the oldest files over PROFILING_MAX_FILES.
+
+    :return: File name of the profile
+    """
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = f'profile-{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}.json'
+    temporary = directory / f'{filename}.tmp'
+    temporary.write_text(json.dumps(profile))
+    os.replace(temporary, directory / filename)
+
+    for path in list_profiles()[settings.PROFILING_MAX_FILES:]:
+        path.unlink(missing_ok=True)
+    return filename
+
+
+def list_profiles() -> list:
+    """
+    :return: List[Path] of the saved profiles, newest first
+    """
+    return sorted(Path(settings.PROFILING_DIR).glob('profile-*.json'), key=lambda path: path.name, reverse=True)
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_timesheetclaim_timesheet_claim'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['employee', 'penalty_type'], name='claim_employee_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['employee', 'claim_date'], name='claim_employee_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['employee', 'start_date_time'], name='timesheet_employee_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['start_date_time'], name='timesheet_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheetrow',
+            index=models.Index(fields=['timesheet', 'date_worked'], name='timesheetrow_date_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.10 on 2026-10-19 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0020_event_balancesnapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timesheet',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='ArchivedTimesheetRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_worked', models.DateField()),
+                ('worked_seconds', models.IntegerField()),
+                ('payout_seconds', models.IntegerField()),
+                ('timesheet', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='main.timesheet')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedTimesheetClaimRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seconds', models.IntegerField(default=0)),
+                ('cost_code', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='main.costcode')),
+                ('time_sheet', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='main.timesheet')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
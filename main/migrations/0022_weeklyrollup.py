@@ -0,0 +1,35 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0021_timesheet_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeeklyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week', models.DateField()),
+                ('worked_seconds', models.IntegerField(default=0)),
+                ('payout_seconds', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('penalty', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.penalty')),
+                ('team', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.team')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='weeklyrollup',
+            index=models.Index(fields=['team', 'week'], name='rollup_team_week_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weeklyrollup',
+            constraint=models.UniqueConstraint(fields=('employee', 'week', 'penalty'), name='rollup_employee_week_penalty'),
+        ),
+    ]
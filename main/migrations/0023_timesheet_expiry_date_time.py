@@ -0,0 +1,39 @@
+# Generated by Django 4.0.10 on 2026-10-19 14:12
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def set_expiry_date_time(apps, schema_editor):
+    Penalty = apps.get_model('main', 'Penalty')
+    Timesheet = apps.get_model('main', 'Timesheet')
+    for penalty in Penalty.objects.all():
+        Timesheet.objects.filter(penalty=penalty) \
+            .update(expiry_date_time=F('start_date_time') + timedelta(penalty.valid_for_day_count))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0022_weeklyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timesheet',
+            name='expiry_date_time',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(set_expiry_date_time, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='timesheet',
+            name='expiry_date_time',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['expiry_date_time'], name='timesheet_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:15
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def approve_paid_timesheets(apps, schema_editor):
+    # Timesheets already in a pay period were paid before approval existed.
+    Timesheet = apps.get_model('main', 'Timesheet')
+    Timesheet.objects.filter(claim__isnull=False).update(status='approved')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0024_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claim',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='claim',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=8),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='reviewed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='reviewed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected')], default='pending', max_length=8),
+        ),
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['status', 'employee'], name='claim_status_employee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['status', 'employee'], name='timesheet_status_employee_idx'),
+        ),
+        migrations.RunPython(approve_paid_timesheets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0025_approval'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Roster',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.TextField()),
+                ('weekdays', models.CharField(max_length=7)),
+                ('start_time', models.TimeField()),
+                ('_duration', models.IntegerField(verbose_name='Duration')),
+                ('starts_on', models.DateField()),
+                ('rotation_weeks', models.IntegerField(default=1)),
+                ('penalty', models.ForeignKey(on_delete=django.db.models.deletion.RESTRICT, to='main.penalty')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RosterMember',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField(default=0)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                ('roster', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.roster')),
+            ],
+            options={
+                'ordering': ['position'],
+            },
+        ),
+    ]
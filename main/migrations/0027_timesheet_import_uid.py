@@ -0,0 +1,22 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0026_roster'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timesheet',
+            name='import_uid',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='timesheet',
+            constraint=models.UniqueConstraint(fields=('employee', 'import_uid'), name='timesheet_employee_import_uid'),
+        ),
+    ]
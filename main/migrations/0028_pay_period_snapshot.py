@@ -0,0 +1,29 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0027_timesheet_import_uid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayPeriodSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[('html', 'HTML'), ('csv', 'CSV')], max_length=4)),
+                ('content', models.BinaryField()),
+                ('digest', models.CharField(max_length=64)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('pay_period', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='main.timesheetclaim')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='payperiodsnapshot',
+            constraint=models.UniqueConstraint(fields=('pay_period', 'format'), name='pay_period_snapshot_format'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0028_pay_period_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timesheet',
+            name='packed_payout_seconds',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='timesheet',
+            name='packed_rows',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:48
+
+from django.db import migrations, models
+
+from main import packing
+
+
+def set_packed_last_day(apps, schema_editor):
+    Timesheet = apps.get_model('main', 'Timesheet')
+    timesheets = list(Timesheet.objects.filter(packed_rows__isnull=False).only('pk', 'packed_rows'))
+    for timesheet in timesheets:
+        timesheet.packed_last_day = max((day for day, _, _ in packing.unpack(timesheet.packed_rows)), default=None)
+    Timesheet.objects.bulk_update(timesheets, ['packed_last_day'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0029_timesheet_packed_rows'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='timesheet',
+            name='packed_last_day',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(set_packed_last_day, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='timesheet',
+            index=models.Index(fields=['employee', 'packed_last_day'], name='timesheet_packed_last_day_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.0.10 on 2026-10-19 11:53
+
+from django.db import migrations
+import main.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0030_timesheet_packed_last_day'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='employee',
+            name='slug',
+            field=main.models.PrecomputedSlugField(editable=False, null=True, populate_from='get_full_name', unique=True),
+        ),
+        migrations.AlterField(
+            model_name='team',
+            name='slug',
+            field=main.models.PrecomputedSlugField(editable=False, null=True, populate_from='name', unique=True),
+        ),
+    ]
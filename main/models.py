@@ -1,9 +1,18 @@
+from django.conf import settings
 from django.db.models.query import QuerySet
 from django.contrib.auth.models import AbstractUser, Group
+from django.core import serializers
 from django.core.exceptions import ValidationError
-from django.db import models
-from datetime import datetime, timedelta
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, models, transaction
+from django.db.models import F, Q, Sum, Max, Prefetch, prefetch_related_objects
+from django.db.models.functions import TruncWeek
+from django.utils.functional import cached_property
+from datetime import date, datetime, timedelta
 import autoslug
+import gzip
+from main import calculator, packing
+import traceback
 from django.urls import reverse
 
 
@@ -15,14 +24,47 @@ class PenaltyType(models.Model):
 
     @property
     def is_used(self):
-        return Penalty.objects.filter(penalty_type=self).count() > 0
+        from main import reference_data
+        return any(penalty.penalty_type == self.name for penalty in reference_data.penalties())
 
     def calculate_available_employee_time(self, employee: 'Employee'):
-        employee_timesheets = Timesheet.objects.filter(penalty__penalty_type=self, employee=employee)
-        employee_claims = Claim.objects.filter(employee=employee, penalty_type=self)
-        available_time = sum([ts.claimable_duration.total_seconds() for ts in employee_timesheets])
-        claimed_time = sum([claim.claimed_seconds for claim in employee_claims])
-        return (available_time - claimed_time) / 3600
+        return available_employee_hours([employee], [self])[employee.pk][self.pk]
+
+
+def available_employee_hours(employees, penalty_types) -> dict:
+    """
+    Gets available claimable time in hours for each employee and penalty type.
+
+    Sums the rows of unexpired timesheets and the claims in the database, so the number of queries
+    doesn't depend on how many timesheets or employees there are. Timesheets with packed rows add their
+    packed_payout_seconds, one row each.
+
+    :param employees: List[Employee] or QuerySet[Employee]
+    :param penalty_types: List[PenaltyType]
+    :return: Dictionary{employee pk: Dictionary{penalty type pk: Float}}
+    """
+    accrued = TimesheetRow.objects.filter(timesheet__expiry_date_time__gte=datetime.today(),
+                                          timesheet__employee__in=employees) \
+        .exclude(timesheet__status=Timesheet.REJECTED) \
+        .values_list('timesheet__employee', 'timesheet__penalty__penalty_type') \
+        .annotate(seconds=Sum('payout_seconds'))
+    packed = Timesheet.objects.filter(expiry_date_time__gte=datetime.today(), employee__in=employees,
+                                      packed_rows__isnull=False) \
+        .exclude(status=Timesheet.REJECTED) \
+        .values_list('employee', 'penalty__penalty_type') \
+        .annotate(seconds=Sum('packed_payout_seconds'))
+    claimed = Claim.objects.filter(employee__in=employees).exclude(status=Claim.REJECTED) \
+        .values_list('employee', 'penalty_type') \
+        .annotate(seconds=Sum('claimed_seconds'))
+    totals = {}
+    for employee, penalty_type, seconds in accrued.union(packed, all=True):
+        totals[(employee, penalty_type)] = totals.get((employee, penalty_type), 0) + seconds
+    accrued = totals
+    claimed = {(employee, penalty_type): seconds for employee, penalty_type, seconds in claimed}
+    return {employee.pk: {penalty_type.pk: (accrued.get((employee.pk, penalty_type.name), 0) -
+                                            claimed.get((employee.pk, penalty_type.pk), 0)) / 3600
+                          for penalty_type in penalty_types}
+            for employee in employees}
 
 
 class Penalty(models.Model):
@@ -39,10 +81,32 @@ class Penalty(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            adding = self._state.adding
+            super(Penalty, self).save(*args, **kwargs)
+            if not adding:
+                # Keeps the stored expiry of the penalty's timesheets in step with valid_for_day_count.
+                Timesheet.objects.filter(penalty=self) \
+                    .update(expiry_date_time=F('start_date_time') + timedelta(self.valid_for_day_count))
+
+
+class PrecomputedSlugField(autoslug.AutoSlugField):
+    """
+    AutoSlugField that keeps the slug of an instance with precomputed_slug set, instead of checking it is unique with
+    a query per instance. Used by bulk_create in manage.py provision_employees, where the slugs are made unique in
+    bulk first.
+    """
+
+    def pre_save(self, instance, add):
+        if getattr(instance, 'precomputed_slug', False):
+            return self.value_from_object(instance)
+        return super().pre_save(instance, add)
+
 
 class Employee(AbstractUser):
     team = models.ForeignKey('Team', on_delete=models.RESTRICT, null=True, blank=True)
-    slug = autoslug.AutoSlugField(populate_from='get_full_name', unique=True, null=True)
+    slug = PrecomputedSlugField(populate_from='get_full_name', unique=True, null=True)
     tutorial_done = models.BooleanField(default=False)
 
     def __str__(self):
@@ -63,13 +127,13 @@ class Employee(AbstractUser):
 
     @property
     def last_5_time_sheets(self):
-        time_sheets = Timesheet.objects.filter(employee=self).order_by(
-            'start_date_time').reverse()[:5]
+        time_sheets = Timesheet.objects.filter(employee=self).select_related('penalty').prefetch_related(
+            'timesheetrow_set').order_by('start_date_time').reverse()[:5]
         return time_sheets
 
     @property
     def last_5_claims(self):
-        return Claim.objects.filter(employee=self).order_by('claim_date').reverse()[:5]
+        return Claim.objects.filter(employee=self).select_related('penalty_type').order_by('claim_date').reverse()[:5]
 
     @property
     def total_time_sheets_submitted(self) -> int:
@@ -88,29 +152,61 @@ class Employee(AbstractUser):
 
         :return: List[Dictionary{penalty:PenaltyType, available: Int}
         """
-        penalties = PenaltyType.objects.all()
-        durations = []
-        for penalty in penalties:
-            durations.append({'penalty_type': penalty,
-                              'available': penalty.calculate_available_employee_time(self)})
-        return durations
+        try:
+            return self._prefetched_duration_per_penalty
+        except AttributeError:
+            return Employee._durations_per_penalty([self])[self.pk]
 
-    @property
+    @staticmethod
+    def prefetch_duration_per_penalty(employees) -> list:
+        """
+        Calculates duration_per_penalty for all the employees at once, so listing them doesn't query per employee.
+
+        :param employees: List[Employee] or QuerySet[Employee], the instances are updated in place
+        :return: List[Employee]
+        """
+        employees = list(employees)
+        durations = Employee._durations_per_penalty(employees)
+        for employee in employees:
+            employee._prefetched_duration_per_penalty = durations[employee.pk]
+        return employees
+
+    @staticmethod
+    def _durations_per_penalty(employees) -> dict:
+        from main import reference_data
+        penalties = reference_data.penalty_types()
+        hours = available_employee_hours(employees, penalties)
+        return {employee.pk: [{'penalty_type': penalty, 'available': hours[employee.pk][penalty.pk]}
+                              for penalty in penalties]
+                for employee in employees}
+
+    @cached_property
     def is_manager(self):
-        if self.groups:
-            try:
-                self.groups.get(name='Manager')
-                return True
-            except KeyError:
-                return False
-        else:
-            return False
+        return self.groups.filter(name='Manager').exists()
+
+    def balances_as_of(self, moment: datetime) -> dict:
+        """
+        Accrued minus claimed seconds for each penalty type as the event log recorded them at a moment.
+
+        Starts from the nearest BalanceSnapshot taken at or before the moment and replays only the events since.
+
+        :param moment: datetime, a date includes the whole day
+        :return: Dictionary{penalty type name: Int}
+        """
+        if not isinstance(moment, datetime):
+            moment = datetime.combine(moment, datetime.max.time())
+        snapshot = BalanceSnapshot.objects.filter(employee=self, taken_at__lte=moment).order_by('-taken_at').first()
+        events = Event.objects.filter(employee=self, created__lte=moment)
+        if snapshot:
+            events = events.filter(pk__gt=snapshot.last_event_id)
+        return add_balances(snapshot.balances if snapshot else {},
+                            *events.order_by('pk').values_list('balance_change', flat=True))
 
 
 class Team(models.Model):
     name = models.TextField()
     manager = models.ForeignKey(Employee, on_delete=models.RESTRICT, related_name='team_manager', blank=True, null=True)
-    slug = autoslug.AutoSlugField(populate_from='name', unique=True, null=True)
+    slug = PrecomputedSlugField(populate_from='name', unique=True, null=True)
 
     def __str__(self):
         return self.name
@@ -140,6 +236,7 @@ class Team(models.Model):
         manager_group = Group.objects.get(name='Manager')  # Add Employee to the Manager group
         manager_group.user_set.add(employee)
         manager_group.save()
+        employee.__dict__.pop('is_manager', None)
         self.manager = employee  # Set the teams manager to the Employee
         self.save()
 
@@ -171,12 +268,16 @@ class Team(models.Model):
         manager_group = Group.objects.get(name='Manager')  # Remove Employee from the Manager group
         manager_group.user_set.remove(employee)
         manager_group.save()
+        employee.__dict__.pop('is_manager', None)
 
         self.manager = None  # Remove the team manager.
         self.save()
 
     @property
     def staff_count(self):
+        # TeamListView annotates the count so listing teams doesn't query per team.
+        if hasattr(self, 'annotated_staff_count'):
+            return self.annotated_staff_count
         return Employee.objects.filter(team=self).count()
 
     @property
@@ -188,7 +289,7 @@ class Team(models.Model):
         :return: List[Dictionary{penalty:PenaltyType, available: Int}]
         """
         durations = {}
-        for employee in Employee.objects.filter(team=self):
+        for employee in Employee.prefetch_duration_per_penalty(Employee.objects.filter(team=self)):
             for penalty in employee.duration_per_penalty:
                 try:
                     durations[penalty['penalty_type'].name] += penalty['available']
@@ -201,67 +302,420 @@ def get_hours_left(ts):
     return 24 - (ts.hour + ts.minute / 60)
 
 
-class Timesheet(models.Model):
+def day_segments(start_date_time: datetime, seconds: int) -> list:
+    """
+    Splits worked time into the seconds worked on each day, the rows and cost rows of a timesheet are built per day.
+
+    :param start_date_time: Start of the worked time
+    :param seconds: Seconds worked
+    :return: List[Tuple(date, Int)]
+    """
+    end_date_time = start_date_time + timedelta(seconds=seconds)
+    # Worked Time is all within one day.
+    if start_date_time.date() == end_date_time.date():
+        return [(start_date_time.date(), seconds)]
+
+    # Worked Time is on multiple days.
+    segments = []
+    diff = end_date_time - start_date_time
+    start = start_date_time
+    for day in range(diff.days + bool(diff.seconds) + 1):
+        if start.date() != end_date_time.date():
+            hours_remaining = get_hours_left(start)
+        else:
+            hours_remaining = end_date_time.hour + end_date_time.minute / 60
+        segments.append((start.date(), round(hours_remaining * 3600)))
+        start = start + timedelta(hours=hours_remaining)
+    return segments
+
+
+def overlapping_pairs(timesheets) -> list:
+    """
+    Overlapping timesheets, found by sorting them by start and comparing each with the latest ending before it.
+
+    :param timesheets: List[Timesheet] of one employee
+    :return: List[Tuple(earlier Timesheet, later Timesheet)]
+    """
+    pairs = []
+    latest = None
+    for timesheet in sorted(timesheets, key=lambda timesheet: timesheet.start_date_time):
+        if latest and timesheet.start_date_time < latest.end_date_time:
+            pairs.append((latest, timesheet))
+        if latest is None or timesheet.end_date_time > latest.end_date_time:
+            latest = timesheet
+    return pairs
+
+
+def _first_cost_row(rows, cost_code_id):
+    return next((row for row in rows if row.cost_code_id == cost_code_id), None)
+
+
+class AbstractApproval(models.Model):
+    """
+    Manager sign-off of a timesheet or claim. Pending and approved items count towards the employee's balances,
+    rejected ones don't. Only approved timesheets are added to pay periods.
+    """
+    PENDING = 'pending'
+    APPROVED = 'approved'
+    REJECTED = 'rejected'
+    statuses = [
+        (PENDING, 'Pending'),
+        (APPROVED, 'Approved'),
+        (REJECTED, 'Rejected'),
+    ]
+
+    status = models.CharField(max_length=8, choices=statuses, default=PENDING)
+    reviewed_by = models.ForeignKey(Employee, on_delete=models.SET_NULL, blank=True, null=True, related_name='+')
+    reviewed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def review(cls, queryset: QuerySet, status: str, reviewer: Employee) -> int:
+        """
+        Approves or rejects the pending items of queryset with one UPDATE and records their events, with the balance
+        change of a rejection, in the same transaction. The number of queries doesn't depend on the number of items.
+
+        The model provides that change as a classmethod rejection_balance_changes(ids) returning
+        Dictionary{pk: Dictionary{penalty type name: Int}}, the change to the balances if the items are rejected.
+
+        :param queryset: QuerySet of the model, limited to the items the reviewer may review
+        :param status: APPROVED or REJECTED
+        :return: Int number of items reviewed
+        """
+        with transaction.atomic():
+            ids = list(queryset.filter(status=cls.PENDING).select_for_update().values_list('pk', flat=True))
+            if not ids:
+                return 0
+            changes = cls.rejection_balance_changes(ids) if status == cls.REJECTED else {}
+            now = datetime.now()
+            cls.objects.filter(pk__in=ids, status=cls.PENDING) \
+                .update(status=status, reviewed_by=reviewer, reviewed_at=now)
+            # Items another reviewer got to first were left alone by the update.
+            reviewed = list(cls.objects.filter(pk__in=ids, reviewed_by=reviewer, reviewed_at=now))
+            Event.objects.bulk_create([Event.build(item, Event.UPDATE, changes.get(item.pk)) for item in reviewed])
+        return len(reviewed)
+
+
+class Timesheet(AbstractApproval):
+    # Payout per second worked, see manage.py simulate_rules to try other values.
+    WEEKDAY_MULTIPLIER = 1.5
+    SUNDAY_MULTIPLIER = 2
+    PUBLIC_HOLIDAY_MULTIPLIER = 2.5
+    # Set together by pack and all None while the rows are in TimesheetRow or the archive.
+    PACKED_FIELDS = ['packed_rows', 'packed_payout_seconds', 'packed_last_day']
+
     employee = models.ForeignKey(Employee, on_delete=models.RESTRICT)
     start_date_time = models.DateTimeField()
     _duration = models.IntegerField()
     penalty = models.ForeignKey(Penalty, on_delete=models.RESTRICT)
     claim = models.ForeignKey('TimesheetClaim', blank=True, null=True, on_delete=models.RESTRICT)
+    # The rows have been moved to the archive tables, see manage.py archive_rows.
+    archived = models.BooleanField(default=False)
+    # start_date_time plus the penalty's valid_for_day_count, set on save.
+    expiry_date_time = models.DateTimeField()
+    # UID of the calendar event the timesheet was imported from, see manage.py import_ics.
+    import_uid = models.CharField(max_length=255, blank=True, null=True)
+    # The rows encoded by main.packing instead of saved as TimesheetRow, see manage.py pack_rows.
+    packed_rows = models.BinaryField(blank=True, null=True, editable=False)
+    # Total payout of packed_rows, so balances are summed in the database without decoding them.
+    packed_payout_seconds = models.IntegerField(blank=True, null=True, editable=False)
+    # Last day worked in packed_rows, so the rollups of a few weeks don't decode the employee's whole history.
+    packed_last_day = models.DateField(blank=True, null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'start_date_time'], name='timesheet_employee_start_idx'),
+            models.Index(fields=['start_date_time'], name='timesheet_start_idx'),
+            models.Index(fields=['expiry_date_time'], name='timesheet_expiry_idx'),
+            models.Index(fields=['status', 'employee'], name='timesheet_status_employee_idx'),
+            models.Index(fields=['employee', 'packed_last_day'], name='timesheet_packed_last_day_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'import_uid'], name='timesheet_employee_import_uid'),
+        ]
+
+    def save(self, *args, defer_rows=False, **kwargs):
+        """
+        :param defer_rows: Queue a job to generate the rows, event and rollups instead, see manage.py run_worker.
+        """
+        with transaction.atomic():
+            adding = self._state.adding
+            before = {} if adding else self.payout_per_penalty_type()
+            if adding and settings.PACK_TIMESHEET_ROWS:
+                self.pack([])
+            self.expiry_date_time = self.calculate_expiry_date_time()
+            super(Timesheet, self).save(*args, **kwargs)
+            if defer_rows:
+                Job.enqueue('generate_timesheet_rows', timesheet_id=self.pk, adding=adding, before=before)
+            else:
+                self.generate_rows(adding, before)
 
-    def save(self, *args, **kwargs):
-        super(Timesheet, self).save(*args, **kwargs)
-        self.create_time_sheet_row()
+    def generate_rows(self, adding: bool, before: dict):
+        """
+        Creates the rows and cost rows of the saved timesheet, records its event and refreshes its weekly rollups.
+
+        :param adding: The timesheet was created rather than updated
+        :param before: payout_per_penalty_type before the update
+        """
+        rows = self.create_time_sheet_row()
         self.create_time_sheet_cost_row()
+        # Existing rows are kept on update and now count towards the timesheet's current penalty type.
+        after = {str(self.penalty.penalty_type): sum(before.values()) + sum(row.payout_seconds for row in rows)}
+        Event.record(self, Event.CREATE if adding else Event.UPDATE,
+                     {} if self.status == self.REJECTED else add_balances(after, negate_balances(before)))
+        days = [row.date_worked for row in (rows if adding else self.rows)]
+        WeeklyRollup.refresh(self.employee, {week_start(day) for day in days})
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Event.record(self, Event.DELETE,
+                         {} if self.status == self.REJECTED else negate_balances(self.payout_per_penalty_type()))
+            weeks = {week_start(row.date_worked) for row in self.rows}
+            deleted = super(Timesheet, self).delete(*args, **kwargs)
+            WeeklyRollup.refresh(self.employee, weeks)
+            return deleted
+
+    @staticmethod
+    def build_rows_in_bulk(timesheets: list) -> tuple:
+        """
+        The rows and cost rows of many timesheets, the same as build_time_sheet_rows and build_time_sheet_cost_rows
+        of each, with the payout and cost codes of all their days calculated together by main.calculator.
 
-    def create_time_sheet_row(self):
-        diff = self.end_date_time - self.start_date_time
-
-        # Worked Time is all within one day.
-        if self.start_date_time.date() == self.end_date_time.date():
-            TimesheetRow.objects.create(date_worked=self.start_date_time.date(),
-                                        worked_seconds=self.duration.total_seconds(),
-                                        payout_seconds=self._calculate_payout_amount_in_seconds(
-                                            day=self.start_date_time.date(),
-                                            seconds=self.duration.total_seconds()),
-                                        timesheet_id=self.pk)
-        else:
-            # Worked Time is on multiple days.
-            start = self.start_date_time
-            for day in range(diff.days + bool(diff.seconds) + 1):
-                if start.date() != self.end_date_time.date():
-                    hours_remaining = get_hours_left(start)
+        :param timesheets: List[Timesheet] with penalty set
+        :return: Tuple(List[List[TimesheetRow]] in the order of the timesheets, List[TimesheetClaimRow])
+        """
+        owners, days, weekdays, holidays, seconds, priors, thresholds = [], [], [], [], [], [], []
+        for index, timesheet in enumerate(timesheets):
+            prior = 0
+            for day, day_seconds in day_segments(timesheet.start_date_time, timesheet._duration):
+                owners.append(index)
+                days.append(day)
+                weekdays.append(day.weekday())
+                holidays.append(timesheet.public_holiday(day))
+                seconds.append(day_seconds)
+                priors.append(prior)
+                thresholds.append(timesheet.penalty.base_threshold)
+                prior = day_seconds
+        allocated = calculator.calculate(weekdays, holidays, seconds, priors, thresholds, (
+            Timesheet.WEEKDAY_MULTIPLIER, Timesheet.SUNDAY_MULTIPLIER, Timesheet.PUBLIC_HOLIDAY_MULTIPLIER))
+
+        rows = [[] for _ in timesheets]
+        cost_rows = [[] for _ in timesheets]
+        segments = zip(owners, days, seconds, *(allocated[key].tolist() for key in (
+            'payout', 'base', 'overtime', 'public_holiday', 'cases')))
+        for index, day, day_seconds, payout, base, overtime, public_holiday, case in segments:
+            timesheet = timesheets[index]
+            rows[index].append(TimesheetRow(date_worked=day, worked_seconds=day_seconds, payout_seconds=payout,
+                                            timesheet=timesheet))
+            # Same rows as _calculate_cost_codes, later days add to the first row of a code where it does.
+            costs = cost_rows[index]
+            if case == calculator.PUBLIC_HOLIDAY:
+                costs.append(TimesheetClaimRow(time_sheet=timesheet, cost_code_id=CostCode.PUBLIC_HOLIDAY,
+                                               seconds=public_holiday))
+                continue
+            if case in (calculator.FIRST_BELOW, calculator.FIRST_OVER, calculator.CARRIED_BELOW):
+                first_base = _first_cost_row(costs, CostCode.BASE)
+                if case == calculator.CARRIED_BELOW and first_base:
+                    first_base.seconds += base
                 else:
-                    hours_remaining = self.end_date_time.hour + self.end_date_time.minute / 60
-                TimesheetRow.objects.create(date_worked=start.date(),
-                                            worked_seconds=round(hours_remaining * 3600),
-                                            payout_seconds=self._calculate_payout_amount_in_seconds(
-                                                day=start.date(),
-                                                seconds=round(hours_remaining * 3600)),
-                                            timesheet=self)
+                    costs.append(TimesheetClaimRow(time_sheet=timesheet, cost_code_id=CostCode.BASE, seconds=base))
+            if case == calculator.FIRST_BELOW:
+                continue
+            first_overtime = _first_cost_row(costs, CostCode.OVERTIME)
+            if case == calculator.CARRIED_OVER and first_overtime:
+                first_overtime.seconds += overtime
+            else:
+                costs.append(TimesheetClaimRow(time_sheet=timesheet, cost_code_id=CostCode.OVERTIME, seconds=overtime))
+        return rows, [row for costs in cost_rows for row in costs]
+
+    @staticmethod
+    def bulk_create_with_rows(timesheets: list, batch_size: int = 500) -> list:
+        """
+        Creates the timesheets with their rows, cost rows, events and weekly rollups, the same as saving each one,
+        with a few bulk queries and one transaction per batch.
+
+        :param timesheets: List[Timesheet] unsaved, with employee and penalty set
+        :return: List[Timesheet]
+        """
+        for start in range(0, len(timesheets), batch_size):
+            batch = timesheets[start:start + batch_size]
+            with transaction.atomic():
+                for timesheet in batch:
+                    timesheet.expiry_date_time = timesheet.calculate_expiry_date_time()
+                rows_per_timesheet, cost_rows = Timesheet.build_rows_in_bulk(batch)
+                if settings.PACK_TIMESHEET_ROWS:
+                    for timesheet, timesheet_rows in zip(batch, rows_per_timesheet):
+                        timesheet.pack(timesheet_rows)
+                Timesheet.objects.bulk_create(batch)
+                rows, events, weeks = [], [], {}
+                for timesheet, timesheet_rows in zip(batch, rows_per_timesheet):
+                    if not timesheet.packed:
+                        rows += timesheet_rows
+                    events.append(Event.build(timesheet, Event.CREATE, {
+                        str(timesheet.penalty.penalty_type): sum(row.payout_seconds for row in timesheet_rows)}))
+                    weeks.setdefault(timesheet.employee, set()).update(
+                        week_start(row.date_worked) for row in timesheet_rows)
+                TimesheetRow.objects.bulk_create(rows)
+                TimesheetClaimRow.objects.bulk_create(cost_rows)
+                Event.objects.bulk_create(events)
+                for employee, employee_weeks in weeks.items():
+                    WeeklyRollup.refresh(employee, employee_weeks)
+        return timesheets
+
+    @staticmethod
+    def regenerate_rows(timesheets: list):
+        """
+        Replaces the rows and cost rows of saved timesheets that aren't archived with freshly built ones in one
+        transaction, recording an event for each change in payout and refreshing the weekly rollups. Timesheets
+        with packed rows are packed again, any TimesheetRow they have is deleted.
+
+        :param timesheets: List[Timesheet] with employee and penalty set
+        """
+        ids = [timesheet.pk for timesheet in timesheets]
+        with transaction.atomic():
+            before = {}
+            for timesheet_id, day, payout in TimesheetRow.objects.filter(timesheet_id__in=ids) \
+                    .values_list('timesheet', 'date_worked', 'payout_seconds'):
+                entry = before.setdefault(timesheet_id, [0, set()])
+                entry[0] += payout
+                entry[1].add(day)
+            for timesheet in timesheets:
+                for row in (timesheet.rows if timesheet.packed else []):
+                    entry = before.setdefault(timesheet.pk, [0, set()])
+                    entry[0] += row.payout_seconds
+                    entry[1].add(row.date_worked)
+            TimesheetRow.objects.filter(timesheet_id__in=ids).delete()
+            TimesheetClaimRow.objects.filter(time_sheet_id__in=ids).delete()
+            rows_per_timesheet, cost_rows = Timesheet.build_rows_in_bulk(timesheets)
+            packed = []
+            for timesheet, rows in zip(timesheets, rows_per_timesheet):
+                if timesheet.packed:
+                    timesheet.pack(rows)
+                    packed.append(timesheet)
+            Timesheet.objects.bulk_update(packed, Timesheet.PACKED_FIELDS)
+            TimesheetRow.objects.bulk_create([row for timesheet, rows in zip(timesheets, rows_per_timesheet)
+                                              if not timesheet.packed for row in rows])
+            TimesheetClaimRow.objects.bulk_create(cost_rows)
+
+            events, weeks = [], {}
+            for timesheet, rows in zip(timesheets, rows_per_timesheet):
+                payouts, days = before.get(timesheet.pk, (0, set()))
+                change = {str(timesheet.penalty.penalty_type): sum(row.payout_seconds for row in rows) - payouts}
+                events.append(Event.build(timesheet, Event.UPDATE, {} if timesheet.status == Timesheet.REJECTED
+                                          else change))
+                weeks.setdefault(timesheet.employee, set()).update(
+                    week_start(day) for day in days | {row.date_worked for row in rows})
+            Event.objects.bulk_create(events)
+            for employee, employee_weeks in weeks.items():
+                WeeklyRollup.refresh(employee, employee_weeks)
+
+    def overlapping(self):
+        """
+        A saved timesheet of the same employee that overlaps this one. Rejected timesheets don't count, so a
+        rejected shift can be submitted again.
+
+        Two lookups on the (employee, start_date_time) index, the latest timesheet starting at or before this one
+        and the first starting during it, so the cost doesn't grow with the employee's history. Once overlaps
+        are rejected the employee's timesheets that aren't rejected don't overlap each other, so no earlier one can
+        reach further.
+
+        :return: Timesheet or None
+        """
+        others = Timesheet.objects.filter(employee_id=self.employee_id).exclude(pk=self.pk) \
+            .exclude(status=Timesheet.REJECTED)
+        previous = others.filter(start_date_time__lte=self.start_date_time).order_by('-start_date_time').first()
+        if previous and previous.end_date_time > self.start_date_time:
+            return previous
+        return others.filter(start_date_time__gt=self.start_date_time, start_date_time__lt=self.end_date_time) \
+            .order_by('start_date_time').first()
+
+    @staticmethod
+    def batch_overlaps(timesheets) -> list:
+        """
+        Overlaps in a batch of unsaved timesheets, with each other or with saved timesheets that aren't rejected.
+
+        The saved timesheets each employee's batch could overlap are loaded with two indexed queries, then everything
+        is checked in memory with overlapping_pairs.
+
+        :param timesheets: List[Timesheet]
+        :return: List[Tuple(Timesheet, Timesheet)] each with at least one timesheet from the batch
+        """
+        by_employee = {}
+        for timesheet in timesheets:
+            by_employee.setdefault(timesheet.employee_id, []).append(timesheet)
+        overlaps = []
+        for employee, batch in by_employee.items():
+            start = min(timesheet.start_date_time for timesheet in batch)
+            end = max(timesheet.end_date_time for timesheet in batch)
+            saved = Timesheet.objects.filter(employee_id=employee).exclude(status=Timesheet.REJECTED)
+            during = list(saved.filter(start_date_time__gte=start, start_date_time__lt=end))
+            previous = saved.filter(start_date_time__lt=start).order_by('-start_date_time').first()
+            pairs = overlapping_pairs(batch + during + ([previous] if previous else []))
+            overlaps += [pair for pair in pairs if pair[0].pk is None or pair[1].pk is None]
+        return overlaps
+
+    @classmethod
+    def rejection_balance_changes(cls, ids: list) -> dict:
+        changes = {}
+        rows = TimesheetRow.objects.filter(timesheet__in=ids) \
+            .values_list('timesheet', 'timesheet__penalty__penalty_type').annotate(seconds=Sum('payout_seconds'))
+        packed = Timesheet.objects.filter(pk__in=ids, packed_rows__isnull=False) \
+            .values_list('pk', 'penalty__penalty_type', 'packed_payout_seconds')
+        for timesheet, penalty_type, seconds in rows.union(packed, all=True):
+            changes.setdefault(timesheet, {})[penalty_type] = changes.get(timesheet, {}).get(penalty_type, 0) - seconds
+        return changes
+
+    def payout_per_penalty_type(self) -> dict:
+        """
+        Payout seconds of the saved timesheet rows.
+
+        :return: Dictionary{penalty type name: Int}
+        """
+        if self.packed:
+            return dict(Timesheet.objects.filter(pk=self.pk).values_list('penalty__penalty_type',
+                                                                         'packed_payout_seconds'))
+        return dict(TimesheetRow.objects.filter(timesheet=self)
+                    .values_list('timesheet__penalty__penalty_type')
+                    .annotate(seconds=Sum('payout_seconds')))
+
+    def create_time_sheet_row(self) -> list:
+        rows = self.build_time_sheet_rows()
+        if not self.packed:
+            return TimesheetRow.objects.bulk_create(rows)
+        # Added to the packed rows, the same as TimesheetRow keeps the rows of earlier saves.
+        self.pack(self.rows + rows)
+        Timesheet.objects.filter(pk=self.pk).update(**{field: getattr(self, field) for field in self.PACKED_FIELDS})
+        return rows
+
+    def build_time_sheet_rows(self) -> list:
+        """
+        Builds the unsaved timesheet rows, one for each day worked.
 
-                start = start + timedelta(hours=hours_remaining)
+        :return: List[TimesheetRow]
+        """
+        return [TimesheetRow(date_worked=day,
+                             worked_seconds=seconds,
+                             payout_seconds=self._calculate_payout_amount_in_seconds(day=day, seconds=seconds),
+                             timesheet=self)
+                for day, seconds in day_segments(self.start_date_time, self._duration)]
 
     def create_time_sheet_cost_row(self):
-        if self.start_date_time.date() == self.end_date_time.date():
-            # Worked Time is all within one day.
-            self._calculate_and_create_cost_codes(self.start_date_time.date(), self._duration, 0)
-        else:
-            # Worked Time is on multiple days.
-            start = self.start_date_time
-            diff = self.end_date_time - self.start_date_time
-            prior_day_time = 0
-            for day in range(diff.days + bool(diff.seconds) + 1):
-                if start.date() != self.end_date_time.date():
-                    hours_remaining = get_hours_left(start)
-                else:
-                    hours_remaining = self.end_date_time.hour + self.end_date_time.minute / 60
+        TimesheetClaimRow.objects.bulk_create(self.build_time_sheet_cost_rows())
 
-                self._calculate_and_create_cost_codes(start.date(),
-                                                      round(hours_remaining * 3600),
-                                                      prior_day_time)
-                prior_day_time = round(hours_remaining * 3600)
+    def build_time_sheet_cost_rows(self) -> list:
+        """
+        Builds the unsaved cost code rows for the timesheet.
 
-                start = start + timedelta(hours=hours_remaining)
+        :return: List[TimesheetClaimRow]
+        """
+        rows = []
+        prior_day_time = 0
+        for day, seconds in day_segments(self.start_date_time, self._duration):
+            self._calculate_cost_codes(day, seconds, prior_day_time, rows)
+            prior_day_time = seconds
+        return rows
 
     def public_holiday(self, day):
         return False
@@ -270,125 +724,169 @@ class Timesheet(models.Model):
         is_public_holiday = self.public_holiday(day)
         duration = 0
         if is_public_holiday:  # public holiday 2.5x Multiplier
-            duration += seconds * 2.5
+            duration += seconds * self.PUBLIC_HOLIDAY_MULTIPLIER
         elif day.weekday() == 6 and not is_public_holiday:  # Sunday 2x Multiplier
-            duration += seconds * 2
+            duration += seconds * self.SUNDAY_MULTIPLIER
         elif not is_public_holiday and not day.weekday() == 6:  # Base 1.5x Multiplier
-            duration += seconds * 1.5
+            duration += seconds * self.WEEKDAY_MULTIPLIER
         return round(duration)
 
-    def _calculate_and_create_cost_codes(self, day, seconds, prior) -> None:
+    def _calculate_cost_codes(self, day, seconds, prior, rows: list) -> None:
+        """
+        Adds the cost code rows for one day of the timesheet to rows.
+
+        :param day: Date worked
+        :param seconds: Seconds worked on the day
+        :param prior: Seconds worked on the previous day of the timesheet
+        :param rows: List[TimesheetClaimRow] built so far, updated in place
+        """
         is_public_holiday = self.public_holiday(day)
         over_base_threshold = prior >= self.penalty.base_threshold
         seconds_below_threshold = seconds < self.penalty.base_threshold
         first_record = prior == 0
         if is_public_holiday:  # Always public holiday 2.5x Multiplier
-            cost_code = CostCode.objects.get(pk=3)  # Not ideal
-            TimesheetClaimRow.objects.create(time_sheet=self,
-                                             cost_code=cost_code,
-                                             seconds=seconds)
+            rows.append(TimesheetClaimRow(time_sheet=self,
+                                          cost_code_id=CostCode.PUBLIC_HOLIDAY,
+                                          seconds=seconds))
             return
         elif day.weekday() == 6 and not is_public_holiday:  # Always Sunday 2x Multiplier
-            cost_code = CostCode.objects.get(pk=2)  # Not ideal
-            TimesheetClaimRow.objects.create(time_sheet=self,
-                                             cost_code=cost_code,
-                                             seconds=seconds)
+            rows.append(TimesheetClaimRow(time_sheet=self,
+                                          cost_code_id=CostCode.OVERTIME,
+                                          seconds=seconds))
             return
         elif not is_public_holiday and not day.weekday() == 6:  # Weekday, no modifiers, can have carry over
 
             if first_record and seconds_below_threshold:  # First cost code entered, not over threshold
-                cost_code = CostCode.objects.get(pk=1)  # Not ideal
                 # All seconds are added to base code, no further actions
-                TimesheetClaimRow.objects.create(
+                rows.append(TimesheetClaimRow(
                     time_sheet=self,
-                    cost_code=cost_code,
+                    cost_code_id=CostCode.BASE,
                     seconds=seconds
-                )
+                ))
                 return
 
             if first_record and not seconds_below_threshold:  # First cost code entered, over threshold
-                cost_code = CostCode.objects.get(pk=1)  # Not ideal
                 # Assign the base threshold seconds to the base code
-                TimesheetClaimRow.objects.create(
+                rows.append(TimesheetClaimRow(
                     time_sheet=self,
-                    cost_code=cost_code,
+                    cost_code_id=CostCode.BASE,
                     seconds=self.penalty.base_threshold
-                )
-                cost_code = CostCode.objects.get(pk=2)  # Not ideal
+                ))
                 # Assign remaining seconds to the overtime code
-                TimesheetClaimRow.objects.create(
+                rows.append(TimesheetClaimRow(
                     time_sheet=self,
-                    cost_code=cost_code,
+                    cost_code_id=CostCode.OVERTIME,
                     seconds=abs(self.penalty.base_threshold - seconds)
-                )
+                ))
                 return
 
             if not first_record and over_base_threshold:
                 # previous record already over threshold, apply next modifier to remaining time.
                 # check if there is a previous record with the same code
-                cost_code = CostCode.objects.get(pk=2)
-                tcr = TimesheetClaimRow.objects.filter(time_sheet=self, cost_code=cost_code).first()
+                tcr = _first_cost_row(rows, CostCode.OVERTIME)
                 if tcr:
                     # add seconds to existing claim
                     tcr.seconds += seconds
-                    tcr.save()
                     return
                 else:
                     # create new claim with over time code
-                    TimesheetClaimRow.objects.create(
+                    rows.append(TimesheetClaimRow(
                         time_sheet=self,
-                        cost_code=cost_code,
+                        cost_code_id=CostCode.OVERTIME,
                         seconds=seconds
-                    )
+                    ))
                     return
 
             if not first_record and not over_base_threshold:
                 # previous record wasn't over the threshold
-                cost_code = CostCode.objects.get(pk=1)
                 # take the prior amount and subtract it from the base threshold
                 # then use that value to create a claim with the base code
-                tcr = TimesheetClaimRow.objects.filter(time_sheet=self, cost_code=cost_code).first()
+                tcr = _first_cost_row(rows, CostCode.BASE)
                 if tcr:
                     tcr.seconds += abs(prior - self.penalty.base_threshold)
-                    tcr.save()
                 else:
-                    TimesheetClaimRow.objects.create(
+                    rows.append(TimesheetClaimRow(
                         time_sheet=self,
-                        cost_code=cost_code,
+                        cost_code_id=CostCode.BASE,
                         seconds=abs(prior - self.penalty.base_threshold)
-                    )
+                    ))
 
-                cost_code = CostCode.objects.get(pk=2)
                 # remaining seconds are to be used on the over time code
-                TimesheetClaimRow.objects.create(
+                rows.append(TimesheetClaimRow(
                     time_sheet=self,
-                    cost_code=cost_code,
+                    cost_code_id=CostCode.OVERTIME,
                     seconds=abs(seconds - abs(prior - self.penalty.base_threshold))
-                )
+                ))
                 return
 
+    def calculate_expiry_date_time(self) -> datetime:
+        """
+        The time after which the timesheet can no longer be claimed, stored as expiry_date_time on save.
+        Callers that bulk create timesheets set expiry_date_time from this themselves.
+        """
+        return self.start_date_time + timedelta(self.penalty.valid_for_day_count)
+
     @property
     def expired(self):
-        today = datetime.today()
-        expiry_date = self.start_date_time + timedelta(self.penalty.valid_for_day_count)
-        if expiry_date >= today:
-            return False
-        else:
-            return True
+        expiry_date = self.expiry_date_time or self.calculate_expiry_date_time()
+        return expiry_date < datetime.today()
+
+    @property
+    def packed(self) -> bool:
+        return self.packed_rows is not None
+
+    def pack(self, rows: list):
+        """
+        Sets the PACKED_FIELDS to the rows, without saving.
+
+        :param rows: List[TimesheetRow]
+        """
+        self.packed_rows = packing.pack((row.date_worked, row.worked_seconds, row.payout_seconds) for row in rows)
+        self.packed_payout_seconds = sum(row.payout_seconds for row in rows)
+        self.packed_last_day = max((row.date_worked for row in rows), default=None)
 
     @property
     def rows(self) -> QuerySet:
         """
-        List of the timesheet rows.
+        List of the timesheet rows, read from the archive once the timesheet is archived and decoded from
+        packed_rows, unsaved, when they are packed.
 
-        :return: QuerySet[TimesheetRow]
+        :return: QuerySet[TimesheetRow], QuerySet[ArchivedTimesheetRow] or List[TimesheetRow]
         """
-        rows = TimesheetRow.objects.filter(timesheet=self)
+        if self.archived:
+            return self.archivedtimesheetrow_set.all()
+        if self.packed:
+            return [TimesheetRow(timesheet=self, date_worked=day, worked_seconds=worked, payout_seconds=payout)
+                    for day, worked, payout in packing.unpack(self.packed_rows)]
+        rows = self.timesheetrow_set.all()
         return rows
 
     @property
     def costs(self):
-        return TimesheetClaimRow.objects.filter(time_sheet=self)
+        if self.archived:
+            return self.archivedtimesheetclaimrow_set.all()
+        return self.timesheetclaimrow_set.all()
+
+    @staticmethod
+    def prefetch_rows(timesheets) -> list:
+        """
+        Prefetches rows and costs for all the timesheets, from the archive tables for archived timesheets.
+        Packed rows are already loaded with the timesheet.
+
+        :param timesheets: List[Timesheet] or QuerySet[Timesheet]
+        :return: List[Timesheet]
+        """
+        timesheets = list(timesheets)
+        hot = [timesheet for timesheet in timesheets if not timesheet.archived]
+        prefetch_related_objects([timesheet for timesheet in hot if not timesheet.packed], 'timesheetrow_set')
+        prefetch_related_objects(
+            hot, Prefetch('timesheetclaimrow_set', queryset=TimesheetClaimRow.objects.select_related('cost_code')))
+        prefetch_related_objects(
+            [timesheet for timesheet in timesheets if timesheet.archived],
+            'archivedtimesheetrow_set',
+            Prefetch('archivedtimesheetclaimrow_set',
+                     queryset=ArchivedTimesheetClaimRow.objects.select_related('cost_code')))
+        return timesheets
 
     @property
     def duration(self):
@@ -396,7 +894,9 @@ class Timesheet(models.Model):
 
     @property
     def claimable_duration(self):
-        return self.accrued_duration if not self.expired else timedelta(seconds=0)
+        if self.expired or self.status == self.REJECTED:
+            return timedelta(seconds=0)
+        return self.accrued_duration
 
     @property
     def accrued_duration(self):
@@ -407,12 +907,15 @@ class Timesheet(models.Model):
         return self.start_date_time + timedelta(seconds=self.duration.total_seconds())
 
 
-class TimesheetRow(models.Model):
+class AbstractTimesheetRow(models.Model):
     date_worked = models.DateField()
     worked_seconds = models.IntegerField()
     payout_seconds = models.IntegerField()
     timesheet = models.ForeignKey(Timesheet, on_delete=models.RESTRICT)
 
+    class Meta:
+        abstract = True
+
     @property
     def duration(self):
         return timedelta(seconds=self.worked_seconds)
@@ -426,22 +929,134 @@ class TimesheetRow(models.Model):
         return self.date_worked.strftime("%A")
 
 
-class Claim(models.Model):
+class TimesheetRow(AbstractTimesheetRow):
+    class Meta:
+        indexes = [
+            models.Index(fields=['timesheet', 'date_worked'], name='timesheetrow_date_idx'),
+        ]
+
+
+class ArchivedTimesheetRow(AbstractTimesheetRow):
+    """
+    Row of an archived timesheet, moved out of TimesheetRow by manage.py archive_rows.
+    """
+
+
+class Roster(models.Model):
+    """
+    A recurring on-call shift on the weekdays of a week. The members take turns in position order, each covering
+    rotation_weeks weeks, starting from the first member in the week of starts_on. Expand it into timesheets with
+    manage.py generate_roster.
+    """
+    name = models.TextField()
+    penalty = models.ForeignKey(Penalty, on_delete=models.RESTRICT)
+    # Weekday numbers of the shifts, Monday is 0, e.g. "01234" for weeknights.
+    weekdays = models.CharField(max_length=7)
+    start_time = models.TimeField()
+    _duration = models.IntegerField(verbose_name='Duration')
+    starts_on = models.DateField()
+    rotation_weeks = models.IntegerField(default=1)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def duration(self):
+        return timedelta(seconds=self._duration)
+
+    def clean(self):
+        if not self.weekdays or any(day not in '0123456' for day in self.weekdays):
+            raise ValidationError('Weekdays must be digits from 0 for Monday to 6 for Sunday.')
+        if self.rotation_weeks < 1:
+            raise ValidationError('Each member must be on call for at least one week.')
+
+    def expand(self, start: date, end: date) -> list:
+        """
+        The unsaved timesheets of the roster's shifts starting from start up to and including end.
+
+        :return: List[Timesheet]
+        """
+        members = [member.employee for member in
+                   self.rostermember_set.select_related('employee').order_by('position', 'pk')]
+        if not members:
+            return []
+        first_week = week_start(self.starts_on)
+        timesheets = []
+        day = max(start, self.starts_on)
+        while day <= end:
+            if str(day.weekday()) in self.weekdays:
+                turn = (week_start(day) - first_week).days // 7 // self.rotation_weeks
+                timesheets.append(Timesheet(employee=members[turn % len(members)],
+                                            start_date_time=datetime.combine(day, self.start_time),
+                                            _duration=self._duration,
+                                            penalty=self.penalty))
+            day += timedelta(days=1)
+        return timesheets
+
+    def generate(self, start: date, end: date, batch_size: int = 500) -> tuple:
+        """
+        Creates the roster's timesheets from start to end with Timesheet.bulk_create_with_rows. Shifts that overlap
+        a timesheet the employee already has, e.g. from an earlier run, are skipped.
+
+        :return: Tuple(List[Timesheet] created, List[Timesheet] skipped)
+        """
+        timesheets = self.expand(start, end)
+        skipped = {id(later if later.pk is None else earlier)
+                   for earlier, later in Timesheet.batch_overlaps(timesheets)}
+        created = [timesheet for timesheet in timesheets if id(timesheet) not in skipped]
+        Timesheet.bulk_create_with_rows(created, batch_size)
+        return created, [timesheet for timesheet in timesheets if id(timesheet) in skipped]
+
+
+class RosterMember(models.Model):
+    roster = models.ForeignKey(Roster, on_delete=models.CASCADE)
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    position = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['position']
+
+
+class Claim(AbstractApproval):
     employee = models.ForeignKey(Employee, on_delete=models.RESTRICT)
     claimed_seconds = models.IntegerField(verbose_name='Duration')
     penalty_type = models.ForeignKey(PenaltyType, on_delete=models.RESTRICT)
     claim_date = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'penalty_type'], name='claim_employee_type_idx'),
+            models.Index(fields=['employee', 'claim_date'], name='claim_employee_date_idx'),
+            models.Index(fields=['status', 'employee'], name='claim_status_employee_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.employee_can_claim_penalty_type():
-            super(Claim, self).save(*args, **kwargs)
+            with transaction.atomic():
+                adding = self._state.adding
+                before = {} if adding else {
+                    name: seconds for name, seconds in
+                    Claim.objects.filter(pk=self.pk).values_list('penalty_type__name', 'claimed_seconds')}
+                super(Claim, self).save(*args, **kwargs)
+                Event.record(self, Event.CREATE if adding else Event.UPDATE,
+                             {} if self.status == self.REJECTED else
+                             add_balances(before, {self.penalty_type.name: -self.claimed_seconds}))
         else:
             raise ValidationError('Employee doesn\'t have enough time available to make this claim.', code='invalid')
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Event.record(self, Event.DELETE,
+                         {} if self.status == self.REJECTED else {self.penalty_type.name: self.claimed_seconds})
+            return super(Claim, self).delete(*args, **kwargs)
+
+    @classmethod
+    def rejection_balance_changes(cls, ids: list) -> dict:
+        return {claim: {penalty_type: seconds} for claim, penalty_type, seconds in
+                cls.objects.filter(pk__in=ids).values_list('pk', 'penalty_type__name', 'claimed_seconds')}
+
     def employee_can_claim_penalty_type(self) -> bool:
-        employee_time_sheets = Timesheet.objects.filter(employee=self.employee, penalty__penalty_type=self.penalty_type)
-        available_time = sum([ts.penalty.penalty_type.calculate_available_employee_time(self.employee) * 3600
-                              for ts in employee_time_sheets])
+        available_time = self.penalty_type.calculate_available_employee_time(self.employee) * 3600
         if available_time >= self.claimed_seconds:
             return True
         else:
@@ -453,23 +1068,52 @@ class Claim(models.Model):
 
 
 class CostCode(models.Model):
+    # Primary keys of the cost codes the timesheet calculations expect, see fixtures/cost_code.json
+    BASE = 1  # 1.5x Multiplier
+    OVERTIME = 2  # 2x Multiplier
+    PUBLIC_HOLIDAY = 3  # 2.5x Multiplier
+
     name = models.CharField(max_length=50)
     code = models.CharField(max_length=50)
 
 
-class TimesheetClaimRow(models.Model):
+class AbstractTimesheetClaimRow(models.Model):
     time_sheet = models.ForeignKey(Timesheet, on_delete=models.RESTRICT)
     cost_code = models.ForeignKey(CostCode, on_delete=models.RESTRICT)
     seconds = models.IntegerField(default=0)
 
+    class Meta:
+        abstract = True
+
     @property
     def units(self):
         return self.seconds / 3600
 
 
+class TimesheetClaimRow(AbstractTimesheetClaimRow):
+    pass
+
+
+class ArchivedTimesheetClaimRow(AbstractTimesheetClaimRow):
+    """
+    Cost code row of an archived timesheet, moved out of TimesheetClaimRow by manage.py archive_rows.
+    """
+
+
 class TimesheetClaim(models.Model):
     pay_date = models.DateField(blank=True, null=True)
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            adding = self._state.adding
+            super(TimesheetClaim, self).save(*args, **kwargs)
+            Event.record(self, Event.CREATE if adding else Event.UPDATE)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            Event.record(self, Event.DELETE)
+            return super(TimesheetClaim, self).delete(*args, **kwargs)
+
     @property
     def period_end(self):
         return self.pay_date - timedelta(days=self.pay_date.weekday() + 1)
@@ -478,16 +1122,422 @@ class TimesheetClaim(models.Model):
     def period_start(self):
         return self.period_end - timedelta(days=14)
 
+    @property
+    def closed(self) -> bool:
+        # Once the pay date has passed the pay period must not change, see main.documents.freeze.
+        return self.pay_date is not None and self.pay_date < date.today()
+
+    @cached_property
+    def frozen(self) -> bool:
+        return self.payperiodsnapshot_set.exists()
+
     def add_time_sheets(self):
+        if self.frozen:
+            raise ValidationError('The pay period has been frozen, its timesheets can\'t change.')
         time_sheets = Timesheet.objects.filter(start_date_time__gte=self.period_start,
-                                               start_date_time__lte=self.period_end)
+                                               start_date_time__lte=self.period_end,
+                                               status=Timesheet.APPROVED)
+        events = []
         for time_sheet in time_sheets:
             if time_sheet.end_date_time.date() > self.period_end:
                 pass
             else:
                 self.timesheet_set.add(time_sheet)
+                events.append(Event.build(time_sheet, Event.UPDATE))
                 # todo will currently override existing time sheets with newest claim #
                 # todo allow for checking existing records
+        Event.objects.bulk_create(events)
+
+
+class PayPeriodSnapshot(models.Model):
+    """
+    A claim document of a closed pay period, rendered once by main.documents.freeze and served as stored.
+    """
+    HTML = 'html'
+    CSV = 'csv'
+    FORMATS = [(HTML, 'HTML'), (CSV, 'CSV')]
+    CONTENT_TYPES = {HTML: 'text/html; charset=utf-8', CSV: 'text/csv; charset=utf-8'}
+
+    pay_period = models.ForeignKey(TimesheetClaim, on_delete=models.CASCADE)
+    format = models.CharField(max_length=4, choices=FORMATS)
+    # Gzip compressed, with the SHA-256 of the uncompressed document as the ETag.
+    content = models.BinaryField()
+    digest = models.CharField(max_length=64)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pay_period', 'format'], name='pay_period_snapshot_format'),
+        ]
+
+    def __str__(self):
+        return f'{self.pay_period.pay_date} {self.format}'
+
+    @property
+    def content_type(self) -> str:
+        return self.CONTENT_TYPES[self.format]
+
+    def text(self) -> str:
+        return gzip.decompress(self.content).decode()
+
+
+def add_balances(*balances) -> dict:
+    """
+    Adds balances together.
+
+    :param balances: Dictionary{penalty type name: Int}
+    :return: Dictionary{penalty type name: Int}, without the zero balances
+    """
+    total = {}
+    for balance in balances:
+        for name, seconds in balance.items():
+            total[name] = total.get(name, 0) + seconds
+    return {name: seconds for name, seconds in total.items() if seconds}
+
+
+def negate_balances(balances: dict) -> dict:
+    return {name: -seconds for name, seconds in balances.items()}
+
+
+class Event(models.Model):
+    """
+    Append only record of a create, update or delete of a Timesheet, Claim or TimesheetClaim.
+
+    data holds the fields of the object after the change, or before it for a delete. balance_change is the change
+    to the employee's accrued minus claimed seconds for each penalty type name.
+    Queryset update(), delete() and bulk_create() bypass the log, as does seed_load.
+    """
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    actions = [
+        (CREATE, 'Create'),
+        (UPDATE, 'Update'),
+        (DELETE, 'Delete'),
+    ]
+
+    created = models.DateTimeField(auto_now_add=True)
+    action = models.CharField(max_length=6, choices=actions)
+    model = models.CharField(max_length=50)
+    object_id = models.IntegerField()
+    # Not constrained so the history outlives the employee.
+    employee = models.ForeignKey(Employee, on_delete=models.DO_NOTHING, db_constraint=False, null=True,
+                                 related_name='+')
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    balance_change = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'created'], name='event_employee_created_idx'),
+            models.Index(fields=['model', 'object_id'], name='event_object_idx'),
+        ]
+
+    @classmethod
+    def build(cls, instance: models.Model, action: str, balance_change: dict = None) -> 'Event':
+        """
+        Builds the unsaved event for a change to instance.
+
+        :param instance: Timesheet, Claim or TimesheetClaim
+        :param action: Event.CREATE, Event.UPDATE or Event.DELETE
+        :param balance_change: Dictionary{penalty type name: Int}
+        """
+        return cls(action=action,
+                   model=instance._meta.model_name,
+                   object_id=instance.pk,
+                   employee_id=getattr(instance, 'employee_id', None),
+                   data=serializers.serialize('python', [instance])[0]['fields'],
+                   balance_change=balance_change or {})
+
+    @classmethod
+    def record(cls, instance: models.Model, action: str, balance_change: dict = None) -> 'Event':
+        event = cls.build(instance, action, balance_change)
+        event.save()
+        return event
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValidationError('Events are append only.')
+        super(Event, self).save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValidationError('Events are append only.')
+
+
+class BalanceSnapshot(models.Model):
+    """
+    An employee's balances as of the event last_event_id, so replays start from here rather than the first event.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    taken_at = models.DateTimeField(auto_now_add=True)
+    last_event_id = models.IntegerField()
+    balances = models.JSONField(default=dict)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['employee', 'taken_at'], name='snapshot_employee_taken_idx'),
+        ]
+
+    @classmethod
+    def take(cls, employee: Employee):
+        """
+        Snapshots the employee's balances, unless there are no events since their last snapshot.
+
+        The first snapshot is calculated from the timesheet rows and claims, so it includes changes made
+        before the event log existed or that bypassed it.
+
+        :return: BalanceSnapshot or None
+        """
+        with transaction.atomic():
+            last_event_id = Event.objects.aggregate(last=Max('pk'))['last'] or 0
+            previous = cls.objects.filter(employee=employee).order_by('-taken_at', '-pk').first()
+            if previous is None:
+                # Archived timesheets are counted from the archive, their rows may have been summarized.
+                accrued = TimesheetRow.objects.filter(timesheet__employee=employee, timesheet__archived=False) \
+                    .exclude(timesheet__status=Timesheet.REJECTED) \
+                    .values_list('timesheet__penalty__penalty_type').annotate(seconds=Sum('payout_seconds'))
+                packed = Timesheet.objects.filter(employee=employee, archived=False, packed_rows__isnull=False) \
+                    .exclude(status=Timesheet.REJECTED) \
+                    .values_list('penalty__penalty_type').annotate(seconds=Sum('packed_payout_seconds'))
+                archived = ArchivedTimesheetRow.objects.filter(timesheet__employee=employee) \
+                    .values_list('timesheet__penalty__penalty_type').annotate(seconds=Sum('payout_seconds'))
+                claimed = Claim.objects.filter(employee=employee).exclude(status=Claim.REJECTED) \
+                    .values_list('penalty_type__name').annotate(seconds=Sum('claimed_seconds'))
+                balances = add_balances(dict(accrued), dict(packed), dict(archived), negate_balances(dict(claimed)))
+            else:
+                changes = Event.objects.filter(employee=employee, pk__gt=previous.last_event_id,
+                                               pk__lte=last_event_id) \
+                    .order_by('pk').values_list('balance_change', flat=True)
+                if not changes:
+                    return None
+                balances = add_balances(previous.balances, *changes)
+            return cls.objects.create(employee=employee, last_event_id=last_event_id, balances=balances)
+
+
+def week_start(day: date) -> date:
+    """
+    :return: The Monday of the day's week
+    """
+    return day - timedelta(days=day.weekday())
+
+
+class WeeklyRollup(models.Model):
+    """
+    Worked and payout seconds of an employee for each week, starting on Monday, and penalty.
+
+    Kept up to date by Timesheet.save and delete, which recalculate the weeks the timesheet touches.
+    team is the employee's team when the week was last calculated. Rebuild with manage.py backfill_rollups.
+    """
+    week = models.DateField()
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
+    team = models.ForeignKey(Team, on_delete=models.SET_NULL, blank=True, null=True)
+    penalty = models.ForeignKey(Penalty, on_delete=models.CASCADE)
+    worked_seconds = models.IntegerField(default=0)
+    payout_seconds = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'week', 'penalty'], name='rollup_employee_week_penalty'),
+        ]
+        indexes = [
+            models.Index(fields=['team', 'week'], name='rollup_team_week_idx'),
+        ]
+
+    @staticmethod
+    def totals(employee: Employee = None, since: date = None, until: date = None) -> dict:
+        """
+        Sums the timesheet rows, current, packed and archived, by employee, week and penalty.
+
+        Packed rows are decoded together in Python, only from the packed timesheets with days worked between since
+        and until, found on the (employee, packed_last_day) index.
+
+        :param employee: Only sum the employee's rows
+        :param since: Only sum the days worked from this date on
+        :param until: Only sum the days worked before this date
+        :return: Dictionary{(employee pk, week, penalty pk): Tuple(worked seconds, payout seconds)}
+        """
+        filters = Q()
+        packed = Timesheet.objects.filter(archived=False, packed_rows__isnull=False)
+        if employee:
+            filters &= Q(timesheet__employee=employee)
+            packed = packed.filter(employee=employee)
+        if since:
+            filters &= Q(date_worked__gte=since)
+            packed = packed.filter(packed_last_day__gte=since)
+        if until:
+            filters &= Q(date_worked__lt=until)
+            packed = packed.filter(start_date_time__lt=until)
+        current = TimesheetRow.objects.filter(filters, timesheet__archived=False)
+        archived = ArchivedTimesheetRow.objects.filter(filters)
+        totals = {}
+
+        def add(key, worked, payout):
+            previous = totals.get(key, (0, 0))
+            totals[key] = (previous[0] + worked, previous[1] + payout)
+
+        current, archived = (rows.values_list('timesheet__employee', TruncWeek('date_worked'), 'timesheet__penalty')
+                             .annotate(worked=Sum('worked_seconds'), payout=Sum('payout_seconds'))
+                             for rows in (current, archived))
+        for employee_id, week, penalty, worked, payout in current.union(archived, all=True):
+            add((employee_id, week, penalty), worked, payout)
+
+        timesheets = list(packed.values_list('employee', 'penalty', 'packed_rows'))
+        records, owners = packing.decode([packed_rows for _, _, packed_rows in timesheets])
+        first = since.toordinal() if since else 0
+        last = until.toordinal() if until else date.max.toordinal() + 1
+        for owner, day, worked, payout in zip(owners.tolist(), *(records[field].tolist()
+                                                                for field in ('day', 'worked', 'payout'))):
+            if first <= day < last:
+                employee_id, penalty, _ = timesheets[owner]
+                add((employee_id, week_start(date.fromordinal(day)), penalty), worked, payout)
+        return totals
+
+    @classmethod
+    def refresh(cls, employee: Employee, weeks: set):
+        """
+        Recalculates the employee's rollups for the weeks.
+
+        :param weeks: Set[date] of Mondays
+        """
+        if not weeks:
+            return
+        totals = cls.totals(employee, min(weeks), max(weeks) + timedelta(days=7))
+        with transaction.atomic():
+            cls.objects.filter(employee=employee, week__in=weeks).delete()
+            cls.objects.bulk_create([cls(week=week, employee_id=employee.pk, team_id=employee.team_id,
+                                         penalty_id=penalty, worked_seconds=worked, payout_seconds=payout)
+                                     for (_, week, penalty), (worked, payout) in totals.items() if week in weeks])
+
+    @classmethod
+    def backfill(cls, since: date = None, batch_size: int = 1000) -> int:
+        """
+        Rebuilds the rollups of every employee from the timesheet rows.
+
+        :param since: Only rebuild the weeks from this date on
+        :return: Number of rollups created
+        """
+        since = week_start(since) if since else None
+        totals = cls.totals(since=since)
+        teams = dict(Employee.objects.filter(pk__in={employee for employee, _, _ in totals})
+                     .values_list('pk', 'team'))
+        with transaction.atomic():
+            (cls.objects.filter(week__gte=since) if since else cls.objects.all()).delete()
+            rollups = cls.objects.bulk_create([
+                cls(week=week, employee_id=employee, team_id=teams[employee], penalty_id=penalty,
+                    worked_seconds=worked, payout_seconds=payout)
+                for (employee, week, penalty), (worked, payout) in totals.items()], batch_size=batch_size)
+        return len(rollups)
+
+
+class Job(models.Model):
+    """
+    Background job stored in the database, run by manage.py run_worker. The handlers are registered in main/jobs.py.
+
+    A job is claimed by moving it from QUEUED to RUNNING with a conditional update, so two workers never run the
+    same job. Failed jobs are retried with a growing delay until max_attempts is reached.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    statuses = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    arguments = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=7, choices=statuses, default=QUEUED)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField(default=datetime.now)
+    created = models.DateTimeField(auto_now_add=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
+
+    @classmethod
+    def enqueue(cls, name: str, /, max_attempts: int = 3, **arguments) -> 'Job':
+        """
+        Queues a job, in the caller's transaction so it only runs if the change that queued it is committed.
+
+        :param name: Name of a handler in main/jobs.py
+        :param arguments: JSON serializable keyword arguments for the handler
+        """
+        from main import jobs
+        if name not in jobs.HANDLERS:
+            raise ValueError(f'No job handler named "{name}".')
+        return cls.objects.create(name=name, arguments=arguments, max_attempts=max_attempts)
+
+    @classmethod
+    def claim(cls, worker: str):
+        """
+        Claims the next due job for worker. Uses SELECT ... FOR UPDATE SKIP LOCKED where the database supports it,
+        on SQLite the conditional update alone decides which worker gets the job.
+
+        :return: Job or None
+        """
+        now = datetime.now()
+        with transaction.atomic():
+            due = cls.objects.filter(status=cls.QUEUED, run_after__lte=now).order_by('run_after', 'pk')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            for job in due[:10]:
+                claimed = cls.objects.filter(pk=job.pk, status=cls.QUEUED) \
+                    .update(status=cls.RUNNING, locked_by=worker, locked_at=now, attempts=F('attempts') + 1)
+                if claimed:
+                    job.refresh_from_db()
+                    return job
+        return None
+
+    @classmethod
+    def requeue_stale(cls, seconds: int) -> int:
+        """
+        Puts jobs back on the queue that have been running for longer than seconds, their worker is assumed gone.
+
+        :return: Int number of jobs requeued
+        """
+        return cls.objects.filter(status=cls.RUNNING, locked_at__lt=datetime.now() - timedelta(seconds=seconds)) \
+            .update(status=cls.QUEUED, locked_by='', locked_at=None)
+
+    def run(self, retry_delay: int = 30) -> bool:
+        """
+        Runs the claimed job. The handler and marking the job done share a transaction, so a job that fails
+        leaves no changes behind and is retried after retry_delay seconds, doubling with each attempt.
+
+        :return: Boolean the job succeeded
+        """
+        from main import jobs
+        try:
+            with transaction.atomic():
+                jobs.HANDLERS[self.name](**self.arguments)
+                self.status = self.DONE
+                self.finished = datetime.now()
+                self.save(update_fields=['status', 'finished'])
+            return True
+        except Exception:
+            self.last_error = traceback.format_exc()
+            if self.attempts < self.max_attempts:
+                self.status = self.QUEUED
+                self.run_after = datetime.now() + timedelta(seconds=retry_delay * 2 ** (self.attempts - 1))
+            else:
+                self.status = self.FAILED
+                self.finished = datetime.now()
+            self.locked_by = ''
+            self.locked_at = None
+            self.save(update_fields=['status', 'run_after', 'finished', 'locked_by', 'locked_at', 'last_error'])
+            return False
+
 
 # output duration per cost code (multiplier)
 # 1.5 is drawn from cost code A
@@ -0,0 +1,39 @@
+"""
+Fixed width encoding of the rows of a timesheet stored packed in Timesheet.packed_rows, see manage.py pack_rows and
+the PACK_TIMESHEET_ROWS setting.
+
+Each day is one 12 byte record, little endian: the date as a proleptic Gregorian ordinal, the worked seconds and the
+payout seconds, in the order of the days.
+"""
+from datetime import date
+
+import numpy as np
+
+RECORD = np.dtype([('day', '<u4'), ('worked', '<i4'), ('payout', '<i4')])
+
+
+def pack(rows) -> bytes:
+    """
+    :param rows: Iterable[Tuple(date worked, worked seconds, payout seconds)]
+    :return: bytes of the records
+    """
+    return np.array([(day.toordinal(), worked, payout) for day, worked, payout in rows], dtype=RECORD).tobytes()
+
+
+def unpack(data: bytes) -> list:
+    """
+    :return: List[Tuple(date worked, worked seconds, payout seconds)]
+    """
+    return [(date.fromordinal(day), worked, payout) for day, worked, payout in np.frombuffer(data, RECORD).tolist()]
+
+
+def decode(blobs: list) -> tuple:
+    """
+    Decodes the rows of many timesheets at once.
+
+    :param blobs: List[bytes] of packed rows
+    :return: Tuple(structured array of every record, array of the index in blobs each record came from)
+    """
+    records = np.frombuffer(b''.join(blobs), RECORD)
+    owners = np.repeat(np.arange(len(blobs)), [len(blob) // RECORD.itemsize for blob in blobs])
+    return records, owners
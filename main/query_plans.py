@@ -0,0 +1,155 @@
+"""
+Checks that the queries the views and model hot paths run read the growing tables through an index.
+
+The SQL is captured from the real code paths running on a seeded database, see manage.py check_query_plans, and each
+statement is explained on its own, so the check follows the code as it changes.
+"""
+import re
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from main import benchmarks, reports, employee_index
+from main.ledger import Ledger
+from main.management.commands.send_expiry_digests import Command as ExpiryDigests
+from main.models import Employee, Timesheet, Claim, TimesheetRow, TimesheetClaimRow, Job, WeeklyRollup, \
+    BalanceSnapshot, week_start
+
+# Tables that grow with usage, a full scan of any of these is treated as a regression.
+HOT_TABLES = [model._meta.db_table for model in (Employee, Timesheet, TimesheetRow, Claim, TimesheetClaimRow, Job)]
+
+# SQLite reports "SCAN <table>", PostgreSQL reports "Seq Scan on <table>".
+FULL_SCAN_PATTERNS = [
+    re.compile(r'\bSCAN (?:TABLE )?(\w+)'),
+    re.compile(r'Seq Scan on (\w+)'),
+]
+
+# Statements with a plan worth checking, inserts and savepoints always have the same one.
+EXPLAINED_STATEMENTS = re.compile(r'^\s*(?:SELECT|UPDATE|DELETE)\b', re.IGNORECASE)
+
+# The caches start empty so cached reports and reference data are queried too, and the real cache is left alone.
+EMPTY_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                            'LOCATION': 'query-plans'}}
+
+
+def intended_scans() -> set:
+    """
+    :return: Set[String] of the statements that read a whole hot table on purpose
+    """
+    # The search index is built from every active employee, once per process and change.
+    return {employee_index.indexed_employees().query.sql_with_params()[0]}
+
+
+class StatementRecorder:
+    """
+    Database execute wrapper that keeps the distinct statements worth explaining, with their first parameters.
+    """
+
+    def __init__(self):
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and EXPLAINED_STATEMENTS.match(sql):
+            self.statements.setdefault(sql, params)
+        return execute(sql, params, many, context)
+
+
+def hot_paths(data: dict) -> dict:
+    """
+    The model paths and every named route, as an employee and as their manager.
+
+    :param data: Dictionary from main.benchmarks.load_benchmark_data
+    :return: Dictionary{name: Callable}
+    """
+    employee = data['employee']
+    penalty_type = data['penalty_type']
+    day = data['timesheet'].start_date_time.date()
+    unsaved = Timesheet(employee=employee, penalty=data['penalty'], start_date_time=data['timesheet'].start_date_time,
+                        _duration=3600)
+    paths = benchmarks.model_benchmarks(data)
+    paths.update({
+        'Ledger.count': lambda: Ledger(employee, penalty_type).count(),
+        'Ledger page': lambda: Ledger(employee, penalty_type)[:20],
+        'Employee.balances_as_of': lambda: employee.balances_as_of(data['timesheet'].start_date_time),
+        'BalanceSnapshot.take': lambda: BalanceSnapshot.take(employee),
+        'Timesheet.overlapping': lambda: unsaved.overlapping(),
+        'Timesheet.batch_overlaps': lambda: Timesheet.batch_overlaps([unsaved]),
+        'WeeklyRollup.refresh': lambda: WeeklyRollup.refresh(employee, {week_start(day)}),
+        'WeeklyRollup.totals': lambda: WeeklyRollup.totals(employee, day - timedelta(days=28)),
+        'pay_period_costs': lambda: reports.pay_period_costs([data['pay_period']]),
+        'Job.claim': lambda: Job.claim('check_query_plans'),
+        'send_expiry_digests': lambda: ExpiryDigests.expiring(7),
+    })
+
+    client = Client(raise_request_exception=False)
+
+    def get(url, user):
+        def path():
+            client.force_login(user)
+            client.get(url, HTTP_REFERER='/')
+        return path
+
+    for name, kwargs in benchmarks.route_kwargs(data).items():
+        url = reverse(name, kwargs=kwargs)
+        for role in ('employee', 'manager'):
+            paths[f'GET {name} as {role}'] = get(url, data[role])
+    return paths
+
+
+def capture(func) -> dict:
+    """
+    Runs func inside a transaction that is rolled back and records the statements it runs.
+
+    :return: Dictionary{sql: params}
+    """
+    recorder = StatementRecorder()
+    with transaction.atomic():
+        with connection.execute_wrapper(recorder):
+            func()
+        transaction.set_rollback(True)
+    return recorder.statements
+
+
+def explain(sql: str, params) -> str:
+    """
+    :return: The database's query plan for the statement, one line per step
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        # SQLite has the step in the last of several columns, PostgreSQL returns one column.
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def full_table_scans(plan: str) -> list:
+    """
+    :param plan: Output of explain()
+    :return: List[String] of the hot tables the plan reads with a full scan
+    """
+    tables = []
+    for pattern in FULL_SCAN_PATTERNS:
+        tables += [table for table in pattern.findall(plan) if table in HOT_TABLES]
+    return tables
+
+
+def plan_regressions(data: dict, stdout=None) -> list:
+    """
+    Captures the statements of every hot path and explains each of them.
+
+    :param data: Dictionary from main.benchmarks.load_benchmark_data
+    :param stdout: Optional stream every statement and its plan are written to
+    :return: List[String] describing each statement with a full scan of a hot table
+    """
+    failures = []
+    intended = intended_scans()
+    with override_settings(CACHES=EMPTY_CACHES):
+        for name, func in hot_paths(data).items():
+            for sql, params in capture(func).items():
+                plan = explain(sql, params)
+                if stdout:
+                    stdout.write(f'{name}\n{sql}\n{plan}\n\n')
+                tables = full_table_scans(plan)
+                if tables and sql not in intended:
+                    failures.append(f'{name}: full scan of {", ".join(tables)}\n  {sql}')
+    return failures
@@ -0,0 +1,105 @@
+"""
+Process-local cache of the reference data tables, PenaltyType, Penalty and CostCode.
+
+They are read on almost every request but rarely change. Each process keeps its own copy and reloads it when the
+version token in the shared cache (settings.REFERENCE_DATA_CACHE) changes. The token is replaced whenever one of the
+models is saved or deleted, and again when that transaction commits.
+
+Queryset update() and bulk_create() don't send signals, call bump() after using them on these models.
+The cached instances are shared, treat them as read only.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.db.models.signals import post_save, post_delete
+
+from main.models import PenaltyType, Penalty, CostCode
+
+MODELS = (PenaltyType, Penalty, CostCode)
+VERSION_KEY = 'reference-data-version'
+
+_local = {'version': None, 'objects': {}}
+
+
+class _Uncommitted(threading.local):
+    # Set while a change is not yet committed, other transactions must not see it and a rollback must discard it.
+    # Kept per thread like the connection whose transaction it describes.
+    pending = False
+
+
+_uncommitted = _Uncommitted()
+
+
+def _cache():
+    return caches[settings.REFERENCE_DATA_CACHE]
+
+
+def bump():
+    """
+    Replaces the shared version token so every process reloads the reference data.
+    """
+    _cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def objects(model) -> list:
+    """
+    All the instances of a reference data model, ordered by primary key.
+
+    :param model: PenaltyType, Penalty or CostCode
+    :return: List[Model]
+    """
+    if _uncommitted.pending:
+        if connection.in_atomic_block:
+            return list(model.objects.order_by('pk'))
+        # The transaction with the change has ended, committed or not, so the copy can't be trusted.
+        _uncommitted.pending = False
+        _local['version'] = None
+
+    version = _cache().get_or_set(VERSION_KEY, lambda: uuid.uuid4().hex, None)
+    if version != _local['version']:
+        _local['version'] = version
+        _local['objects'] = {}
+    if model not in _local['objects']:
+        _local['objects'][model] = list(model.objects.order_by('pk'))
+    return _local['objects'][model]
+
+
+def get(model, pk):
+    """
+    Looks up a reference data instance by primary key.
+
+    :return: Model or None
+    """
+    return next((instance for instance in objects(model) if instance.pk == pk), None)
+
+
+def penalty_types() -> list:
+    return objects(PenaltyType)
+
+
+def penalties() -> list:
+    return objects(Penalty)
+
+
+def cost_codes() -> list:
+    return objects(CostCode)
+
+
+def _changed(sender, **kwargs):
+    bump()
+    if connection.in_atomic_block:
+        _uncommitted.pending = True
+        transaction.on_commit(_committed)
+
+
+def _committed():
+    _uncommitted.pending = False
+    bump()
+
+
+for _model in MODELS:
+    post_save.connect(_changed, sender=_model, dispatch_uid=f'reference_data_{_model.__name__}_save')
+    post_delete.connect(_changed, sender=_model, dispatch_uid=f'reference_data_{_model.__name__}_delete')
@@ -0,0 +1,130 @@
+import csv
+import uuid
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import DEFERRED, Sum
+from django.db.models.signals import post_init, post_save
+
+from main import reference_data
+from main.models import TimesheetClaimRow, ArchivedTimesheetClaimRow, Team, Employee
+
+CACHE_KEY = 'pay-period-report:v2:{teams}:{pk}'
+# Replaced whenever an employee changes team, the cached costs are grouped by the teams at the time.
+TEAMS_VERSION_KEY = 'pay-period-report-teams-version'
+
+
+def _cache():
+    return caches[settings.REPORT_CACHE]
+
+
+def bump_teams():
+    """
+    Replaces the team assignment version so every cached pay period is calculated again.
+    """
+    _cache().set(TEAMS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def pay_period_costs(pay_periods: list) -> dict:
+    """
+    Seconds worked per team and cost code in each pay period, by the team the employee is in now.
+
+    Periods that have been paid are cached indefinitely and open periods for REPORT_OPEN_PERIOD_TIMEOUT seconds, both
+    until an employee changes team.
+    The periods missing from the cache are calculated together with one grouped query, archived timesheets are
+    read from the archive.
+
+    :param pay_periods: List[TimesheetClaim]
+    :return: Dictionary{pay period pk: Dictionary{(team pk or None, cost code pk): Int}}
+    """
+    teams = _cache().get_or_set(TEAMS_VERSION_KEY, lambda: uuid.uuid4().hex, None)
+    keys = {pay_period.pk: CACHE_KEY.format(teams=teams, pk=pay_period.pk) for pay_period in pay_periods}
+    cached = _cache().get_many(keys.values())
+    costs = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pay_period for pay_period in pay_periods if pay_period.pk not in costs]
+    if not missing:
+        return costs
+
+    current = TimesheetClaimRow.objects.filter(time_sheet__claim__in=missing, time_sheet__archived=False) \
+        .values_list('time_sheet__claim', 'time_sheet__employee__team', 'cost_code').annotate(seconds=Sum('seconds'))
+    archived = ArchivedTimesheetClaimRow.objects.filter(time_sheet__claim__in=missing) \
+        .values_list('time_sheet__claim', 'time_sheet__employee__team', 'cost_code').annotate(seconds=Sum('seconds'))
+    for pay_period in missing:
+        costs[pay_period.pk] = {}
+    for pay_period, team, cost_code, seconds in current.union(archived, all=True):
+        costs[pay_period][(team, cost_code)] = costs[pay_period].get((team, cost_code), 0) + seconds
+
+    today = date.today()
+    _cache().set_many({keys[pay_period.pk]: costs[pay_period.pk]
+                       for pay_period in missing if pay_period.pay_date < today}, None)
+    _cache().set_many({keys[pay_period.pk]: costs[pay_period.pk]
+                       for pay_period in missing if pay_period.pay_date >= today},
+                      settings.REPORT_OPEN_PERIOD_TIMEOUT)
+    return costs
+
+
+class PayPeriodReport:
+    """
+    Hours per team, with a column for each pay period and cost code.
+    """
+
+    def __init__(self, pay_periods):
+        self.pay_periods = list(pay_periods)
+        self.cost_codes = reference_data.cost_codes()
+        self.costs = pay_period_costs(self.pay_periods)
+
+    @property
+    def columns(self) -> list:
+        """
+        :return: List[Tuple(TimesheetClaim, CostCode)]
+        """
+        return [(pay_period, cost_code) for pay_period in self.pay_periods for cost_code in self.cost_codes]
+
+    @property
+    def rows(self) -> list:
+        """
+        One row per team with hours in the report, employees without a team are grouped under "No team".
+
+        :return: List[Dictionary{team: String, hours: List[Float], total: Float}]
+        """
+        team_ids = {team for costs in self.costs.values() for team, _ in costs}
+        names = dict(Team.objects.filter(pk__in=team_ids - {None}).values_list('pk', 'name'))
+        names[None] = 'No team'
+        rows = []
+        for team in sorted(team_ids, key=lambda team: (team is None, names.get(team, ''))):
+            hours = [self.costs[pay_period.pk].get((team, cost_code.pk), 0) / 3600
+                     for pay_period, cost_code in self.columns]
+            rows.append({'team': names.get(team, ''), 'hours': hours, 'total': sum(hours)})
+        return rows
+
+    def write_csv(self, file):
+        writer = csv.writer(file)
+        writer.writerow(['Team'] + [f'{pay_period.pay_date} {cost_code.code}' for pay_period, cost_code in self.columns]
+                        + ['Total'])
+        for row in self.rows:
+            writer.writerow([row['team']] + [f'{hours:.2f}' for hours in row['hours']] + [f'{row["total"]:.2f}'])
+
+
+def _employee_loaded(sender, instance, **kwargs):
+    # Left out when the employee was loaded without the team, a save then counts as a change of team.
+    instance._saved_team_id = instance.__dict__.get('team_id', DEFERRED)
+
+
+def _employee_saved(sender, instance, created, update_fields=None, **kwargs):
+    # Saves that leave the team alone, like profile edits and the last_login update on each log in, keep the reports.
+    if update_fields is not None and 'team' not in update_fields:
+        return
+    previous = getattr(instance, '_saved_team_id', DEFERRED)
+    instance._saved_team_id = instance.team_id
+    # New employees have no timesheets yet, and employees with timesheets can't be deleted.
+    if created or previous == instance.team_id:
+        return
+    bump_teams()
+    # Reports calculated before the change commits still see the old teams.
+    transaction.on_commit(bump_teams)
+
+
+post_init.connect(_employee_loaded, sender=Employee, dispatch_uid='reports_employee_init')
+post_save.connect(_employee_saved, sender=Employee, dispatch_uid='reports_employee_save')
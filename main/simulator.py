@@ -0,0 +1,203 @@
+"""
+What-if simulation of penalty rule changes over historic timesheets, nothing is written to the database.
+
+The timesheets of a date range are loaded once into flat arrays with one entry per day worked, then the payout and
+cost code allocation of Timesheet.build_time_sheet_rows and Timesheet.build_time_sheet_cost_rows are replayed under
+the proposed rules by main.calculator and compared with the rows that are stored now.
+"""
+from array import array
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from django.db.models import Q, Sum
+
+from main import calculator, reference_data
+from main.models import Timesheet, TimesheetRow, ArchivedTimesheetRow, TimesheetClaimRow, ArchivedTimesheetClaimRow, \
+    CostCode, Team, day_segments
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch_seconds(moment: datetime) -> int:
+    return int((moment - EPOCH).total_seconds())
+
+
+def _add(totals: dict, key, seconds):
+    totals[key] = totals.get(key, 0) + seconds
+
+
+class Rules:
+    """
+    Penalty parameters and payout multipliers to simulate, the current ones where no other value is given.
+    """
+
+    def __init__(self, thresholds: dict = None, valid_days: dict = None, weekday_multiplier: float = None,
+                 sunday_multiplier: float = None, public_holiday_multiplier: float = None):
+        """
+        :param thresholds: Dictionary{penalty pk: base_threshold seconds}
+        :param valid_days: Dictionary{penalty pk: valid_for_day_count}
+        """
+        penalties = reference_data.penalties()
+        self.thresholds = {penalty.pk: penalty.base_threshold for penalty in penalties}
+        self.thresholds.update(thresholds or {})
+        self.valid_days = {penalty.pk: penalty.valid_for_day_count for penalty in penalties}
+        self.valid_days.update(valid_days or {})
+        # Weekday, Sunday and public holiday.
+        self.multipliers = (
+            Timesheet.WEEKDAY_MULTIPLIER if weekday_multiplier is None else weekday_multiplier,
+            Timesheet.SUNDAY_MULTIPLIER if sunday_multiplier is None else sunday_multiplier,
+            Timesheet.PUBLIC_HOLIDAY_MULTIPLIER if public_holiday_multiplier is None else public_holiday_multiplier,
+        )
+
+
+class History:
+    """
+    Timesheets started between two dates, inclusive, as parallel arrays. Rejected timesheets are left out.
+
+    Per timesheet: penalty, team (0 for no team) and start in seconds since 1970. Per day worked: the index of the
+    timesheet, the day of the week, whether it's a public holiday, the seconds worked and the seconds worked on the
+    previous day of the timesheet.
+    """
+
+    def __init__(self, start: date, end: date):
+        self.start = start
+        self.end = end
+        self.penalties = array('q')
+        self.teams = array('q')
+        self.starts = array('q')
+        self.timesheets = array('q')
+        self.weekdays = array('b')
+        self.holidays = array('b')
+        self.seconds = array('q')
+        self.priors = array('q')
+        is_public_holiday = Timesheet().public_holiday
+        holidays = {}
+        for start_date_time, duration, penalty, team in self.queryset() \
+                .values_list('start_date_time', '_duration', 'penalty', 'employee__team').iterator(chunk_size=2000):
+            index = len(self.penalties)
+            self.penalties.append(penalty)
+            self.teams.append(team or 0)
+            self.starts.append(_epoch_seconds(start_date_time))
+            prior = 0
+            for day, seconds in day_segments(start_date_time, duration):
+                if day not in holidays:
+                    holidays[day] = is_public_holiday(day)
+                self.timesheets.append(index)
+                self.weekdays.append(day.weekday())
+                self.holidays.append(holidays[day])
+                self.seconds.append(seconds)
+                self.priors.append(prior)
+                prior = seconds
+
+    def queryset(self):
+        return Timesheet.objects.filter(start_date_time__gte=self.start,
+                                        start_date_time__lt=self.end + timedelta(days=1)) \
+            .exclude(status=Timesheet.REJECTED)
+
+    def __len__(self):
+        return len(self.penalties)
+
+    def simulate(self, rules: Rules, moment: datetime = None) -> dict:
+        """
+        Replays the payout and cost code allocation of every day worked under the rules.
+
+        :param moment: Time claimable hours are counted at, now by default
+        :return: Dictionary{cost_codes: Dictionary{cost code pk: Int}, payout: Dictionary{team pk: Int},
+            claimable: Dictionary{team pk: Int}} in seconds, team pk 0 for no team
+        """
+        now = _epoch_seconds(moment or datetime.today())
+        penalty_ids, penalties = np.unique(np.frombuffer(self.penalties, dtype=np.int64), return_inverse=True)
+        thresholds = np.array([rules.thresholds[penalty] for penalty in penalty_ids.tolist()], dtype=np.int64)
+        valid_days = np.array([rules.valid_days[penalty] for penalty in penalty_ids.tolist()], dtype=np.int64)
+        unexpired = np.frombuffer(self.starts, dtype=np.int64) + valid_days[penalties] * 86400 >= now
+
+        timesheets = np.frombuffer(self.timesheets, dtype=np.int64)
+        allocated = calculator.calculate(np.frombuffer(self.weekdays, dtype=np.int8),
+                                         np.frombuffer(self.holidays, dtype=np.int8).astype(bool),
+                                         np.frombuffer(self.seconds, dtype=np.int64),
+                                         np.frombuffer(self.priors, dtype=np.int64),
+                                         thresholds[penalties][timesheets], rules.multipliers)
+        team_ids, teams = np.unique(np.frombuffer(self.teams, dtype=np.int64)[timesheets], return_inverse=True)
+        payout = np.bincount(teams, weights=allocated['payout'], minlength=len(team_ids))
+        claimable = np.bincount(teams, weights=np.where(unexpired[timesheets], allocated['payout'], 0),
+                                minlength=len(team_ids))
+        team_ids = team_ids.tolist()
+        return {'cost_codes': {CostCode.BASE: int(allocated['base'].sum()),
+                               CostCode.OVERTIME: int(allocated['overtime'].sum()),
+                               CostCode.PUBLIC_HOLIDAY: int(allocated['public_holiday'].sum())},
+                'payout': dict(zip(team_ids, map(int, payout.tolist()))),
+                'claimable': dict(zip(team_ids, map(int, claimable.tolist())))}
+
+    def stored(self, moment: datetime = None) -> dict:
+        """
+        The same totals as simulate, read from the stored rows and the archive with grouped queries.
+        """
+        moment = moment or datetime.today()
+        timesheets = self.queryset()
+        rows = Q(timesheet__in=timesheets)
+        payout = dict(payout=Sum('payout_seconds'),
+                      claimable=Sum('payout_seconds', filter=Q(timesheet__expiry_date_time__gte=moment)))
+        current = TimesheetRow.objects.filter(rows, timesheet__archived=False) \
+            .values_list('timesheet__employee__team').annotate(**payout)
+        archived = ArchivedTimesheetRow.objects.filter(rows).values_list('timesheet__employee__team').annotate(**payout)
+        packed = timesheets.filter(archived=False, packed_rows__isnull=False).values_list('employee__team') \
+            .annotate(payout=Sum('packed_payout_seconds'),
+                      claimable=Sum('packed_payout_seconds', filter=Q(expiry_date_time__gte=moment)))
+        totals = {'cost_codes': {CostCode.BASE: 0, CostCode.OVERTIME: 0, CostCode.PUBLIC_HOLIDAY: 0},
+                  'payout': {},
+                  'claimable': {}}
+        for team, paid, claimable in current.union(archived, packed, all=True):
+            _add(totals['payout'], team or 0, paid)
+            _add(totals['claimable'], team or 0, claimable or 0)
+
+        costs = Q(time_sheet__in=timesheets)
+        current = TimesheetClaimRow.objects.filter(costs, time_sheet__archived=False) \
+            .values_list('cost_code').annotate(seconds=Sum('seconds'))
+        archived = ArchivedTimesheetClaimRow.objects.filter(costs) \
+            .values_list('cost_code').annotate(seconds=Sum('seconds'))
+        for cost_code, seconds in current.union(archived, all=True):
+            _add(totals['cost_codes'], cost_code, seconds)
+        return totals
+
+
+class Simulation:
+    """
+    Hours per cost code and per team now and under the proposed rules, with the difference.
+    """
+
+    def __init__(self, start: date, end: date, rules: Rules, moment: datetime = None):
+        self.history = History(start, end)
+        self.rules = rules
+        self.current = self.history.stored(moment)
+        self.proposed = self.history.simulate(rules, moment)
+
+    @staticmethod
+    def _row(name, current, proposed) -> dict:
+        return {'name': name, 'current': current / 3600, 'proposed': proposed / 3600,
+                'delta': (proposed - current) / 3600}
+
+    @property
+    def cost_codes(self) -> list:
+        """
+        :return: List[Dictionary{name: String, current: Float, proposed: Float, delta: Float}] in hours
+        """
+        return [self._row(cost_code.code, self.current['cost_codes'].get(cost_code.pk, 0),
+                          self.proposed['cost_codes'].get(cost_code.pk, 0))
+                for cost_code in reference_data.cost_codes()]
+
+    @property
+    def teams(self) -> list:
+        """
+        Payout and claimable hours per team, by the team the employee is in now.
+
+        :return: List[Dictionary{name: String, payout: Dictionary, claimable: Dictionary}] with the current,
+            proposed and delta hours like cost_codes
+        """
+        team_ids = set(self.current['payout']) | set(self.proposed['payout'])
+        names = dict(Team.objects.filter(pk__in=team_ids - {0}).values_list('pk', 'name'))
+        names[0] = 'No team'
+        return [{'name': names.get(team, ''),
+                 'payout': self._row('', self.current['payout'].get(team, 0), self.proposed['payout'].get(team, 0)),
+                 'claimable': self._row('', self.current['claimable'].get(team, 0),
+                                        self.proposed['claimable'].get(team, 0))}
+                for team in sorted(team_ids, key=lambda team: (team == 0, names.get(team, '')))]
@@ -0,0 +1,79 @@
+from datetime import date, datetime, timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.models import Claim, Employee, Event, Penalty, PenaltyType, Team, Timesheet, TimesheetClaim
+
+
+class ApprovalTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.team = Team.objects.create(name='Network')
+        self.manager = Employee.objects.create_user(username='ant')
+        self.team.add_manager(self.manager)
+        self.employee = Employee.objects.create_user(username='bob')
+        self.team.add_employee(self.employee)
+        self.penalty_type = PenaltyType.objects.create(name='Paid')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        self.start = datetime.combine(date.today() - timedelta(days=3), datetime.min.time())
+
+    def add_timesheets(self, count, employee=None):
+        for number in range(count):
+            Timesheet(employee=employee or self.employee, start_date_time=self.start + timedelta(hours=2 * number),
+                      _duration=3600, penalty=self.penalty).save()
+
+    def test_review_is_set_based(self):
+        counts = []
+        for size in (2, 20):
+            self.add_timesheets(size)
+            with CaptureQueriesContext(connection) as queries:
+                reviewed = Timesheet.review(Timesheet.objects.filter(status=Timesheet.PENDING), Timesheet.APPROVED,
+                                            self.manager)
+            counts.append(len(queries))
+            self.assertEqual(reviewed, size)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(set(Timesheet.objects.values_list('status', 'reviewed_by')),
+                         {(Timesheet.APPROVED, self.manager.pk)})
+
+    def test_rejection_balances(self):
+        self.add_timesheets(2)
+        Claim.objects.create(employee=self.employee, penalty_type=self.penalty_type, claimed_seconds=1800)
+        self.assertEqual(self.penalty_type.calculate_available_employee_time(self.employee), 2.5)
+        Claim.review(Claim.objects.all(), Claim.REJECTED, self.manager)
+        self.assertEqual(self.penalty_type.calculate_available_employee_time(self.employee), 3)
+        Timesheet.review(Timesheet.objects.filter(pk=Timesheet.objects.first().pk), Timesheet.REJECTED, self.manager)
+        self.assertEqual(self.penalty_type.calculate_available_employee_time(self.employee), 1.5)
+        self.assertEqual(self.employee.balances_as_of(datetime.now()), {'Paid': 1.5 * 3600})
+        # Reviewed items are left alone.
+        self.assertEqual(Timesheet.review(Timesheet.objects.all(), Timesheet.REJECTED, self.manager), 1)
+        self.assertEqual(Event.objects.filter(action=Event.UPDATE).count(), 3)
+
+    def test_only_approved_timesheets_are_paid(self):
+        self.add_timesheets(2)
+        Timesheet.review(Timesheet.objects.filter(pk=Timesheet.objects.first().pk), Timesheet.APPROVED, self.manager)
+        pay_period = TimesheetClaim(pay_date=self.start.date() + timedelta(days=10))
+        pay_period.save()
+        pay_period.add_time_sheets()
+        self.assertEqual(list(pay_period.timesheet_set.values_list('status', flat=True)), [Timesheet.APPROVED])
+
+    def test_queue(self):
+        self.add_timesheets(2)
+        self.add_timesheets(1, self.manager)
+        outsider = Employee.objects.create_user(username='cat')
+        self.add_timesheets(1, outsider)
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('approval-queue'))
+        self.assertEqual(len(response.context['timesheets']), 2)
+
+        ids = list(Timesheet.objects.values_list('pk', flat=True))
+        response = self.client.post(reverse('approval-queue'), {'action': 'approve', 'timesheet': ids}, follow=True)
+        self.assertContains(response, '2 timesheets and 0 claims approved.')
+        self.assertEqual(Timesheet.objects.filter(status=Timesheet.PENDING).count(), 2)
+
+    def test_queue_managers_only(self):
+        self.client.force_login(self.employee)
+        self.assertEqual(self.client.get(reverse('approval-queue')).status_code, 403)
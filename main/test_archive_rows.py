@@ -0,0 +1,71 @@
+from datetime import date, datetime
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from main.models import Employee, Penalty, Timesheet, TimesheetClaim, TimesheetRow, TimesheetClaimRow, \
+    ArchivedTimesheetRow, ArchivedTimesheetClaimRow, BalanceSnapshot
+
+
+class ArchiveRowsTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.employee = Employee.objects.create_user(username='ant', is_staff=True)
+        penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        # Monday evening into Tuesday, in the pay period paid on Wednesday 12 January 2022
+        self.timesheet = Timesheet(employee=self.employee, start_date_time=datetime(2022, 1, 3, 20), _duration=8 * 3600,
+                                   penalty=penalty)
+        self.timesheet.save()
+        self.pay_period = TimesheetClaim(pay_date=date(2022, 1, 12))
+        self.pay_period.save()
+        Timesheet.objects.update(status=Timesheet.APPROVED)
+        self.pay_period.add_time_sheets()
+        # Not in a pay period
+        self.unpaid = Timesheet(employee=self.employee, start_date_time=datetime(2022, 2, 7, 10), _duration=3600,
+                                penalty=penalty)
+        self.unpaid.save()
+        self.rows = list(TimesheetRow.objects.filter(timesheet=self.timesheet).values_list(
+            'date_worked', 'worked_seconds', 'payout_seconds'))
+        self.costs = list(TimesheetClaimRow.objects.filter(time_sheet=self.timesheet).values_list(
+            'cost_code', 'seconds'))
+
+    def test_archive(self):
+        call_command('archive_rows', '--days=30', stdout=StringIO())
+        self.timesheet.refresh_from_db()
+        self.assertTrue(self.timesheet.archived)
+        self.assertFalse(TimesheetRow.objects.filter(timesheet=self.timesheet).exists())
+        self.assertFalse(TimesheetClaimRow.objects.filter(time_sheet=self.timesheet).exists())
+        self.assertEqual(list(self.timesheet.rows.values_list('date_worked', 'worked_seconds', 'payout_seconds')),
+                         self.rows)
+        self.assertEqual(list(self.timesheet.costs.values_list('cost_code', 'seconds')), self.costs)
+        self.unpaid.refresh_from_db()
+        self.assertFalse(self.unpaid.archived)
+        self.assertTrue(TimesheetRow.objects.filter(timesheet=self.unpaid).exists())
+
+    def test_summarize(self):
+        call_command('archive_rows', '--days=30', '--summarize', stdout=StringIO())
+        summary = TimesheetRow.objects.get(timesheet=self.timesheet)
+        self.assertEqual((summary.date_worked, summary.worked_seconds, summary.payout_seconds),
+                         (self.rows[0][0], sum(row[1] for row in self.rows), sum(row[2] for row in self.rows)))
+        self.assertEqual(sum(TimesheetClaimRow.objects.filter(time_sheet=self.timesheet).values_list(
+            'seconds', flat=True)), sum(cost[1] for cost in self.costs))
+        self.assertEqual(ArchivedTimesheetRow.objects.count(), len(self.rows))
+        self.assertEqual(ArchivedTimesheetClaimRow.objects.count(), len(self.costs))
+        self.assertEqual(BalanceSnapshot.take(self.employee).balances,
+                         {'Paid': sum(row[2] for row in self.rows) + 5400})
+
+    def test_too_recent(self):
+        call_command('archive_rows', f'--days={(date.today() - date(2022, 1, 1)).days}', stdout=StringIO())
+        self.timesheet.refresh_from_db()
+        self.assertFalse(self.timesheet.archived)
+
+    def test_pay_period_reads_archive(self):
+        call_command('archive_rows', '--days=30', stdout=StringIO())
+        self.client.force_login(self.employee)
+        response = self.client.get(reverse('timesheet-claim'))
+        timesheet, = [timesheet for timesheet in response.context['timesheets'] if timesheet.pk == self.timesheet.pk]
+        self.assertEqual(len(timesheet.rows), len(self.rows))
+        self.assertEqual(len(timesheet.costs), len(self.costs))
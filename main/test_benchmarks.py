@@ -0,0 +1,32 @@
+from django.test import TestCase
+
+from main.benchmarks import compare, measure
+from main.models import PenaltyType
+
+
+class TestCompare(TestCase):
+    baseline = {'small': {'GET home': {'wall_ms': 10.0, 'queries': 5}}}
+
+    def test_no_regression(self):
+        results = {'small': {'GET home': {'wall_ms': 12.0, 'queries': 5}}}
+        self.assertEqual(compare(results, self.baseline, 0.25), [])
+
+    def test_slower(self):
+        results = {'small': {'GET home': {'wall_ms': 13.0, 'queries': 5}}}
+        self.assertEqual(len(compare(results, self.baseline, 0.25)), 1)
+
+    def test_more_queries(self):
+        results = {'small': {'GET home': {'wall_ms': 10.0, 'queries': 6}}}
+        self.assertEqual(len(compare(results, self.baseline, 0.25)), 1)
+
+    def test_missing_from_baseline(self):
+        results = {'small': {'GET home': {'wall_ms': 10.0, 'queries': 5}, 'GET login': {'wall_ms': 1.0, 'queries': 1}},
+                   'large': {'GET home': {'wall_ms': 100.0, 'queries': 50}}}
+        self.assertEqual(len(compare(results, self.baseline, 0.25)), 2)
+
+
+class TestMeasure(TestCase):
+    def test_counts_queries_and_rolls_back(self):
+        result = measure(lambda: PenaltyType.objects.create(name='Paid'), repeat=2)
+        self.assertEqual(result['queries'], 1)
+        self.assertEqual(PenaltyType.objects.count(), 0)
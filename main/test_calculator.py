@@ -0,0 +1,61 @@
+import random
+from datetime import date, datetime, timedelta
+
+from django.test import TestCase
+
+from main import calculator
+from main.models import CostCode, Employee, Penalty, Timesheet
+
+MULTIPLIERS = (Timesheet.WEEKDAY_MULTIPLIER, Timesheet.SUNDAY_MULTIPLIER, Timesheet.PUBLIC_HOLIDAY_MULTIPLIER)
+
+
+def with_holidays(timesheet: Timesheet) -> Timesheet:
+    # The first of each month, public_holiday itself never returns True yet.
+    timesheet.public_holiday = lambda day: day.day == 1
+    return timesheet
+
+
+class CalculatorTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.employee = Employee.objects.create_user(username='ant')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid', base_threshold=7200)
+        self.generator = random.Random(7)
+
+    def test_matches_scalar_path(self):
+        timesheet = with_holidays(Timesheet(penalty=self.penalty))
+        weekdays, holidays, seconds, priors, expected = [], [], [], [], []
+        for _ in range(500):
+            day = date(2022, 1, 1) + timedelta(days=self.generator.randrange(365))
+            day_seconds = self.generator.choice([0, 3600, 7200, self.generator.randrange(1, 86400)])
+            prior = self.generator.choice([0, 3600, 7200, self.generator.randrange(1, 86400)])
+            cost_rows = []
+            timesheet._calculate_cost_codes(day, day_seconds, prior, cost_rows)
+            weekdays.append(day.weekday())
+            holidays.append(timesheet.public_holiday(day))
+            seconds.append(day_seconds)
+            priors.append(prior)
+            expected.append((timesheet._calculate_payout_amount_in_seconds(day, day_seconds),
+                             *(sum(row.seconds for row in cost_rows if row.cost_code_id == cost_code)
+                               for cost_code in (CostCode.BASE, CostCode.OVERTIME, CostCode.PUBLIC_HOLIDAY))))
+        allocated = calculator.calculate(weekdays, holidays, seconds, priors, [7200] * len(seconds), MULTIPLIERS)
+        self.assertEqual(list(zip(*(allocated[key].tolist()
+                                    for key in ('payout', 'base', 'overtime', 'public_holiday')))), expected)
+
+    def test_bulk_rows_match_scalar_rows(self):
+        timesheets = []
+        moment = datetime(2022, 1, 1, 6)
+        for _ in range(200):
+            moment += timedelta(minutes=self.generator.randrange(0, 72 * 60, 15))
+            timesheets.append(with_holidays(Timesheet(employee=self.employee, penalty=self.penalty,
+                                                      start_date_time=moment,
+                                                      _duration=self.generator.randrange(1, 48 * 60) * 60)))
+        rows, cost_rows = Timesheet.build_rows_in_bulk(timesheets)
+        self.assertEqual([[(row.timesheet, row.date_worked, row.worked_seconds, row.payout_seconds) for row in
+                           timesheet_rows] for timesheet_rows in rows],
+                         [[(row.timesheet, row.date_worked, row.worked_seconds, row.payout_seconds) for row in
+                           timesheet.build_time_sheet_rows()] for timesheet in timesheets])
+        self.assertEqual([(row.time_sheet, row.cost_code_id, row.seconds) for row in cost_rows],
+                         [(row.time_sheet, row.cost_code_id, row.seconds)
+                          for timesheet in timesheets for row in timesheet.build_time_sheet_cost_rows()])
@@ -0,0 +1,77 @@
+import gzip
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main import documents
+from main.models import Employee, Penalty, PayPeriodSnapshot, Team, Timesheet, TimesheetClaim
+
+
+class PayPeriodDocumentTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        team = Team.objects.create(name='Network')
+        self.employee = Employee.objects.create_user(username='ant', first_name='Ant')
+        team.add_employee(self.employee)
+        penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        self.pay_period = TimesheetClaim(pay_date=date.today() - timedelta(days=1))
+        self.pay_period.save()
+        for day in range(3):
+            timesheet = Timesheet(employee=self.employee, penalty=penalty, _duration=3 * 3600,
+                                  start_date_time=datetime.combine(self.pay_period.period_start, datetime.min.time())
+                                  + timedelta(days=day, hours=20))
+            timesheet.save()
+        Timesheet.objects.update(status=Timesheet.APPROVED)
+        self.pay_period.add_time_sheets()
+        self.client.force_login(self.employee)
+
+    def test_freeze(self):
+        html = documents.render(self.pay_period, PayPeriodSnapshot.HTML)
+        out = StringIO()
+        call_command('freeze_pay_periods', stdout=out)
+        self.assertIn('Froze 1 pay periods.', out.getvalue())
+        snapshot = PayPeriodSnapshot.objects.get(pay_period=self.pay_period, format=PayPeriodSnapshot.HTML)
+        self.assertEqual(snapshot.text(), html)
+        csv = PayPeriodSnapshot.objects.get(pay_period=self.pay_period, format=PayPeriodSnapshot.CSV).text()
+        # Base and overtime rows for each timesheet, except one for the Sunday the period starts on.
+        self.assertEqual(len(csv.splitlines()), 1 + 5)
+        self.assertIn('ant,Ant,Network', csv)
+
+        call_command('freeze_pay_periods', stdout=out)
+        self.assertIn('Froze 0 pay periods.', out.getvalue())
+        with self.assertRaises(ValidationError):
+            TimesheetClaim.objects.get(pk=self.pay_period.pk).add_time_sheets()
+        with self.assertRaises(ValueError):
+            documents.freeze(TimesheetClaim.objects.create(pay_date=date.today()))
+
+    def test_served_from_snapshot(self):
+        url = reverse('pay-period-document', kwargs={'pk': self.pay_period.pk, 'extension': 'html'})
+        response = self.client.get(url)
+        self.assertIn('no-cache', response['Cache-Control'])
+        live = response.content.decode()
+
+        documents.freeze(self.pay_period)
+        self.assertRedirects(self.client.get(reverse('timesheet-claim')), url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(len([query for query in queries if 'payperiodsnapshot' in query['sql']]), 2)
+        self.assertNotIn('main_timesheet"', ''.join(query['sql'] for query in queries))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        self.assertEqual(gzip.decompress(response.content).decode(), live)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(reverse('pay-period-document', kwargs={'pk': self.pay_period.pk,
+                                                                          'extension': 'csv'}))
+        self.assertTrue(response.content.decode().startswith('Pay date,Timesheet'))
+        self.assertEqual(self.client.get(reverse('pay-period-document', kwargs={'pk': self.pay_period.pk,
+                                                                                'extension': 'pdf'})).status_code,
+                         404)
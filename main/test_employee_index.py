@@ -0,0 +1,65 @@
+from django.contrib.auth.models import Group
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from main import employee_index
+from main.models import Employee
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class EmployeeIndexTestCase(TransactionTestCase):
+    # Runs outside a transaction so saves commit like they do in a request.
+    fixtures = ['auth_group.json']
+
+    def setUp(self) -> None:
+        employee_index._local['version'] = None
+        employee_index._uncommitted.pending = False
+        self.anne = Employee.objects.create_user(username='asmith', first_name='Anne', last_name='Smith')
+        self.andy = Employee.objects.create_user(username='andy', first_name='Andrew', last_name='Jones')
+        Employee.objects.create_user(username='bob', first_name='Bob', last_name='Smithers')
+
+    @staticmethod
+    def usernames(query: str) -> list:
+        return [employee['username'] for employee in employee_index.search(query)]
+
+    def test_search(self):
+        self.assertEqual(self.usernames('an'), ['andy', 'asmith'])
+        self.assertEqual(self.usernames('SMITH'), ['asmith', 'bob'])
+        self.assertEqual(self.usernames('anne smith'), ['asmith'])
+        self.assertEqual(self.usernames('sm an'), ['asmith'])
+        self.assertEqual(self.usernames('jones-'), [])
+        self.assertEqual(self.usernames(' '), [])
+        self.assertEqual(len(employee_index.search('a', limit=1)), 1)
+        with self.assertNumQueries(0):
+            self.usernames('bob')
+
+    def test_rebuilt_when_changed(self):
+        self.assertEqual(self.usernames('jones'), ['andy'])
+        self.andy.last_name = 'Brown'
+        self.andy.save()
+        self.assertEqual(self.usernames('jones'), [])
+        self.assertEqual(self.usernames('brown'), ['andy'])
+        self.andy.is_active = False
+        self.andy.save()
+        self.assertEqual(self.usernames('brown'), [])
+
+        # Logging in only saves last_login and keeps the index.
+        version = employee_index._local['version']
+        self.client.force_login(self.anne)
+        self.usernames('anne')
+        self.assertEqual(employee_index._local['version'], version)
+
+    def test_views(self):
+        self.client.force_login(self.anne)
+        self.assertEqual(self.client.get(reverse('employee-autocomplete'), {'q': 'bob'}).status_code, 403)
+        self.anne.groups.add(Group.objects.get(name='Manager'))
+        response = self.client.get(reverse('employee-autocomplete'), {'q': 'bob'})
+        self.assertEqual(response.json(), {'results': [{
+            'username': 'bob', 'name': 'Bob Smithers',
+            'url': reverse('employee-detail', kwargs={'slug': Employee.objects.get(username='bob').slug})}]})
+        response = self.client.get(reverse('employee-search'), {'q': 'smith'})
+        self.assertContains(response, 'Anne Smith')
+        self.assertContains(response, 'Bob Smithers')
+        self.assertContains(self.client.get(reverse('employee-search'), {'q': 'zed'}), 'No employees match')
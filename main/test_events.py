@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.test import TestCase
+
+from main.models import Employee, PenaltyType, Penalty, Timesheet, Claim, TimesheetClaim, Event, BalanceSnapshot
+
+
+class EventTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.penalty_type = PenaltyType.objects.create(name='Paid')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        self.employee = Employee.objects.create_user(username='ant')
+        # A recent Monday to Saturday, 1 hour at 1.5x
+        start = datetime.today().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        while start.weekday() == 6:
+            start -= timedelta(days=1)
+        self.timesheet = Timesheet(employee=self.employee, start_date_time=start, _duration=3600,
+                                   penalty=self.penalty)
+        self.timesheet.save()
+
+    def test_timesheet_created(self):
+        event = Event.objects.get(model='timesheet')
+        self.assertEqual((event.action, event.object_id, event.employee), (Event.CREATE, self.timesheet.pk,
+                                                                           self.employee))
+        self.assertEqual(event.balance_change, {'Paid': 5400})
+        self.assertEqual(event.data['_duration'], 3600)
+
+    def test_claim_changes(self):
+        claim = Claim(employee=self.employee, penalty_type=self.penalty_type, claimed_seconds=1800)
+        claim.save()
+        claim.claimed_seconds = 900
+        claim.save()
+        claim.delete()
+        events = Event.objects.filter(model='claim').order_by('pk')
+        self.assertEqual([(event.action, event.balance_change) for event in events],
+                         [(Event.CREATE, {'Paid': -1800}),
+                          (Event.UPDATE, {'Paid': 900}),
+                          (Event.DELETE, {'Paid': 900})])
+
+    def test_pay_period_events(self):
+        pay_period = TimesheetClaim(pay_date=self.timesheet.start_date_time.date() + timedelta(days=10))
+        pay_period.save()
+        Timesheet.objects.update(status=Timesheet.APPROVED)
+        pay_period.add_time_sheets()
+        self.assertTrue(Event.objects.filter(model='timesheetclaim', action=Event.CREATE).exists())
+        event = Event.objects.filter(model='timesheet').latest('pk')
+        self.assertEqual((event.action, event.data['claim']), (Event.UPDATE, pay_period.pk))
+
+    def test_append_only(self):
+        event = Event.objects.first()
+        with self.assertRaises(ValidationError):
+            event.save()
+        with self.assertRaises(ValidationError):
+            event.delete()
+
+    def test_balances_as_of(self):
+        two_days_ago = datetime.now() - timedelta(days=2)
+        Event.objects.update(created=two_days_ago)
+        snapshot = BalanceSnapshot.take(self.employee)
+        self.assertEqual(snapshot.balances, {'Paid': 5400})
+        Claim(employee=self.employee, penalty_type=self.penalty_type, claimed_seconds=1800).save()
+
+        # The snapshot plus the claim
+        with self.assertNumQueries(2):
+            self.assertEqual(self.employee.balances_as_of(datetime.now()), {'Paid': 3600})
+        # Before the snapshot, replayed from the first event
+        self.assertEqual(self.employee.balances_as_of(datetime.today().date() - timedelta(days=1)), {'Paid': 5400})
+        self.assertEqual(self.employee.balances_as_of(two_days_ago - timedelta(days=1)), {})
+
+        snapshot = BalanceSnapshot.take(self.employee)
+        self.assertEqual(snapshot.balances, {'Paid': 3600})
+        self.assertIsNone(BalanceSnapshot.take(self.employee))
+
+    def test_snapshot_balances_command(self):
+        out = StringIO()
+        call_command('snapshot_balances', stdout=out)
+        self.assertIn('Took 1 balance snapshots.', out.getvalue())
+        call_command('snapshot_balances', stdout=out)
+        self.assertIn('Took 0 balance snapshots.', out.getvalue())
@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from main.models import Employee, Penalty, Timesheet
+
+
+class ExpiryTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.employee = Employee.objects.create_user(username='ant', first_name='Anthony', email='ant@example.com')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Toil', valid_for_day_count=14)
+        self.today = datetime.combine(datetime.today().date(), datetime.min.time())
+
+    def add_timesheet(self, days_ago, employee=None):
+        timesheet = Timesheet(employee=employee or self.employee, penalty=self.penalty, _duration=3 * 3600,
+                              start_date_time=self.today - timedelta(days=days_ago, hours=-10))
+        timesheet.save()
+        return timesheet
+
+    def test_expiry_date_time(self):
+        timesheet = self.add_timesheet(1)
+        self.assertEqual(timesheet.expiry_date_time, timesheet.start_date_time + timedelta(14))
+        self.assertFalse(timesheet.expired)
+        self.penalty.valid_for_day_count = 0
+        self.penalty.save()
+        timesheet.refresh_from_db()
+        self.assertEqual(timesheet.expiry_date_time, timesheet.start_date_time)
+        self.assertTrue(timesheet.expired)
+
+    def test_digest(self):
+        soon = self.add_timesheet(12)
+        sooner = self.add_timesheet(13)
+        self.add_timesheet(1)
+        self.add_timesheet(20)
+        no_email = Employee.objects.create_user(username='bob')
+        self.add_timesheet(12, no_email)
+        out = StringIO()
+        with self.assertNumQueries(1):
+            call_command('send_expiry_digests', '--days=3', stdout=out)
+        self.assertIn('Sent 1 expiry digests.', out.getvalue())
+        message, = mail.outbox
+        self.assertEqual((message.to, message.subject), (['ant@example.com'], 'Time expiring in the next 3 days'))
+        self.assertIn('9.00 hours of your accrued time', message.body)
+        self.assertLess(message.body.index(f'{sooner.start_date_time:%d/%m/%Y %H:%M}'),
+                        message.body.index(f'{soon.start_date_time:%d/%m/%Y %H:%M}'))
+
+    def test_dry_run(self):
+        self.add_timesheet(12)
+        out = StringIO()
+        call_command('send_expiry_digests', '--dry-run', stdout=out)
+        self.assertIn('1 digests would be sent.', out.getvalue())
+        self.assertEqual(mail.outbox, [])
@@ -0,0 +1,86 @@
+import tempfile
+from datetime import datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.ics import read_events
+from main.models import Employee, Penalty, Timesheet
+
+CALENDAR = '''BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+UID:shift-1\r
+DTSTART:20220301T080000Z\r
+DTEND:20220301T100000Z\r
+ATTENDEE;CN="Anthony: primary":mailto:Ant@Example.com\r
+ATTENDEE:mailto:nobody@example.com\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:shift-2\r
+DTSTART;TZID=Australia/Sydney:20220302T180000\r
+DURATION:PT14H\r
+ATTENDEE;CN=Anthony:mailto:ant@exam\r
+ ple.com\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:shift-3\r
+DTSTART:20220301T090000\r
+DURATION:PT1H\r
+ATTENDEE:mailto:ant@example.com\r
+END:VEVENT\r
+END:VCALENDAR\r
+'''
+
+
+class IcsImportTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.ant = Employee.objects.create_user(username='ant', email='ant@example.com')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+
+    def import_ics(self, content, *args):
+        out = StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.ics') as file:
+            file.write(content)
+            file.flush()
+            call_command('import_ics', file.name, f'--penalty={self.penalty.pk}', *args, stdout=out,
+                         stderr=StringIO())
+        return out.getvalue()
+
+    def test_read_events(self):
+        first, second, third = read_events(StringIO(CALENDAR))
+        self.assertEqual((first['uid'], first['start'], first['end']),
+                         ('shift-1', datetime(2022, 3, 1, 8), datetime(2022, 3, 1, 10)))
+        self.assertEqual(first['attendees'], ['ant@example.com', 'nobody@example.com'])
+        # Sydney is UTC+11 in March.
+        self.assertEqual((second['start'], second['end'] - second['start']),
+                         (datetime(2022, 3, 2, 7), timedelta(hours=14)))
+        self.assertEqual(second['attendees'], ['ant@example.com'])
+        self.assertEqual(third['start'], datetime(2022, 3, 1, 9))
+
+    def test_import(self):
+        out = self.import_ics(CALENDAR)
+        self.assertIn('Created 2 timesheets, skipped 0 already imported, 1 overlapping and 0 without a duration.', out)
+        first, second = Timesheet.objects.order_by('start_date_time')
+        self.assertEqual((first.import_uid, first.employee, first.duration), ('shift-1', self.ant, timedelta(hours=2)))
+        self.assertEqual((second.import_uid, second.start_date_time), ('shift-2', datetime(2022, 3, 2, 7)))
+        self.assertEqual(second.rows.count(), 1)
+
+    def test_reimport_is_a_no_op(self):
+        self.import_ics(CALENDAR)
+        with CaptureQueriesContext(connection) as queries:
+            out = self.import_ics(CALENDAR, '--batch-size=1')
+        self.assertIn('Created 0 timesheets, skipped 2 already imported, 1 overlapping', out)
+        self.assertEqual(Timesheet.objects.count(), 2)
+        self.assertFalse([query for query in queries if query['sql'].startswith('INSERT')])
+
+    def test_invalid(self):
+        with self.assertRaisesMessage(CommandError, 'Event 1 of the file has no UID or DTSTART.'):
+            self.import_ics('BEGIN:VEVENT\nDTSTART:20220301T080000Z\nEND:VEVENT\n')
+        self.assertFalse(Timesheet.objects.exists())
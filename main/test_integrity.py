@@ -0,0 +1,77 @@
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from main.management.commands.check_integrity import compare, DUPLICATED, MISMATCHED, MISSING
+from main.models import ArchivedTimesheetRow, Employee, Penalty, PenaltyType, Timesheet, TimesheetClaim, \
+    TimesheetClaimRow, TimesheetRow
+
+
+class IntegrityTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.employee = Employee.objects.create_user(username='ant')
+        self.penalty_type = PenaltyType.objects.create(name='Paid')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        start = datetime.combine(date.today() - timedelta(days=5), datetime.min.time())
+        self.timesheets = []
+        for number in range(4):
+            timesheet = Timesheet(employee=self.employee, start_date_time=start + timedelta(days=number, hours=20),
+                                  _duration=6 * 3600, penalty=self.penalty)
+            timesheet.save()
+            self.timesheets.append(timesheet)
+
+    def check(self, *args) -> str:
+        out = StringIO()
+        call_command('check_integrity', '--workers=1', '--batch-size=3', *args, stdout=out)
+        return out.getvalue()
+
+    def test_compare(self):
+        self.assertIsNone(compare([(1, 2), (3, 4)], [(3, 4), (1, 2)]))
+        self.assertEqual(compare([], [(1, 2)]), MISSING)
+        self.assertEqual(compare([(1, 2), (3, 4)] * 2, [(3, 4), (1, 2)]), DUPLICATED)
+        self.assertEqual(compare([(1, 2), (3, 4), (1, 2)], [(3, 4), (1, 2)]), MISMATCHED)
+
+    def test_reports_and_repairs(self):
+        self.assertIn('0 mismatched, 0 duplicated, 0 missing, 0 orphaned archived rows.', self.check())
+
+        first, second, third, fourth = self.timesheets
+        first.save()  # Saving again adds the rows a second time.
+        Timesheet.objects.filter(pk=second.pk).update(_duration=3600)
+        TimesheetClaimRow.objects.filter(time_sheet=third).delete()
+        ArchivedTimesheetRow.objects.create(timesheet=fourth, date_worked=fourth.start_date_time.date(),
+                                            worked_seconds=60, payout_seconds=90)
+        output = self.check()
+        self.assertIn(f'Timesheet {first.pk}: rows duplicated.', output)
+        self.assertIn(f'Timesheet {first.pk}: cost rows duplicated.', output)
+        self.assertIn(f'Timesheet {second.pk}: rows mismatched.', output)
+        self.assertIn(f'Timesheet {third.pk}: cost rows missing.', output)
+        self.assertIn('2 mismatched, 2 duplicated, 1 missing, 1 orphaned archived rows.', output)
+
+        self.assertIn('Rebuilt the rows of 3 timesheets and deleted 1 orphaned archived rows.', self.check('--repair'))
+        self.assertIn('0 mismatched, 0 duplicated, 0 missing, 0 orphaned archived rows.', self.check())
+        self.assertEqual(TimesheetRow.objects.filter(timesheet=first).count(), 2)
+        # The events recorded for the repair keep the event log in step with the rows.
+        self.assertEqual(self.employee.balances_as_of(datetime.now())['Paid'] / 3600,
+                         self.penalty_type.calculate_available_employee_time(self.employee))
+
+    def test_closed_pay_period_not_repaired(self):
+        pay_period = TimesheetClaim.objects.create(pay_date=date.today() - timedelta(days=1))
+        first = self.timesheets[0]
+        Timesheet.objects.filter(pk=first.pk).update(claim=pay_period)
+        TimesheetRow.objects.filter(timesheet=first).delete()
+        output = self.check('--repair')
+        self.assertIn(f'Timesheet {first.pk}: rows missing.', output)
+        self.assertIn('Rebuilt the rows of 0 timesheets', output)
+        self.assertIn('Left 1 archived timesheets or timesheets in closed pay periods as they are.', output)
+        self.assertFalse(TimesheetRow.objects.filter(timesheet=first).exists())
+
+    def test_worker_processes(self):
+        TimesheetRow.objects.filter(timesheet=self.timesheets[0]).delete()
+        out = StringIO()
+        call_command('check_integrity', '--workers=2', '--batch-size=1', stdout=out)
+        self.assertIn(f'Timesheet {self.timesheets[0].pk}: rows missing.', out.getvalue())
+        self.assertIn('0 mismatched, 0 duplicated, 1 missing', out.getvalue())
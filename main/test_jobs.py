@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from main import jobs
+from main.models import Employee, Event, Job, Penalty, Timesheet, TimesheetRow
+
+
+class JobTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.employee = Employee.objects.create_user(username='ant')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+
+    def run_worker(self):
+        out = StringIO()
+        call_command('run_worker', '--burst', stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_deferred_rows(self):
+        timesheet = Timesheet(employee=self.employee, start_date_time=datetime(2022, 3, 1, 22), _duration=4 * 3600,
+                              penalty=self.penalty)
+        timesheet.save(defer_rows=True)
+        self.assertFalse(TimesheetRow.objects.filter(timesheet=timesheet).exists())
+        self.assertIn('Ran 1 jobs, 0 failed.', self.run_worker())
+        self.assertEqual(TimesheetRow.objects.filter(timesheet=timesheet).count(), 2)
+        self.assertTrue(Event.objects.filter(model='timesheet', object_id=timesheet.pk).exists())
+        self.assertEqual(Job.objects.get().status, Job.DONE)
+
+    @override_settings(JOB_QUEUE_TIMESHEET_ROWS=True)
+    def test_create_view_defers_rows(self):
+        self.client.force_login(self.employee)
+        self.client.post(reverse('timesheet-create'), {
+            'start_date_time': '2022-03-01T11:00', '_duration': 60, 'penalty': self.penalty.pk})
+        self.assertEqual((Job.objects.get().name, TimesheetRow.objects.count()), ('generate_timesheet_rows', 0))
+
+    def test_claim_once(self):
+        Job.enqueue('command', name='snapshot_balances')
+        job = Job.claim('first')
+        self.assertEqual((job.status, job.locked_by, job.attempts), (Job.RUNNING, 'first', 1))
+        self.assertIsNone(Job.claim('second'))
+        job.locked_at = datetime.now() - timedelta(hours=2)
+        job.save()
+        self.assertEqual(Job.requeue_stale(3600), 1)
+        self.assertEqual(Job.claim('second').locked_by, 'second')
+
+    def test_retries(self):
+        with mock.patch.dict(jobs.HANDLERS, {'command': mock.Mock(side_effect=RuntimeError('down'))}):
+            job = Job.enqueue('command', max_attempts=2, name='snapshot_balances')
+            self.assertIn('Ran 1 jobs, 1 failed.', self.run_worker())
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+            self.assertIn('RuntimeError: down', job.last_error)
+            # Not due again until the retry delay has passed.
+            self.assertIn('Ran 0 jobs', self.run_worker())
+            Job.objects.update(run_after=datetime.now())
+            self.run_worker()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_enqueue_unknown(self):
+        with self.assertRaisesMessage(ValueError, 'No job handler named "missing".'):
+            Job.enqueue('missing')
@@ -0,0 +1,65 @@
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from main.ledger import Ledger
+from main.models import Claim, Employee, Penalty, PenaltyType, Team, Timesheet, TimesheetClaim
+
+
+class LedgerTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.employee = Employee.objects.create_user(username='ant')
+        self.penalty_type = PenaltyType.objects.create(name='Paid')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid', valid_for_day_count=14)
+        today = datetime.combine(date.today(), datetime.min.time())
+        # Expired, then two that haven't, 1.5 payout hours each.
+        for days_ago in (30, 5, 2):
+            Timesheet(employee=self.employee, start_date_time=today - timedelta(days=days_ago, hours=-10),
+                      _duration=3600, penalty=self.penalty).save()
+        Claim.objects.create(employee=self.employee, penalty_type=self.penalty_type, claimed_seconds=1800)
+        self.ledger = Ledger(self.employee, self.penalty_type)
+
+    def test_running_balance(self):
+        entries = self.ledger[0:10]
+        self.assertEqual([(entry['kind'], entry['hours'], entry['balance']) for entry in entries], [
+            ('claim', -0.5, 2.5),
+            ('accrual', 1.5, 3),
+            ('accrual', 1.5, 1.5),
+            ('expiry', -1.5, 0),
+            ('accrual', 1.5, 1.5),
+        ])
+        self.assertEqual(entries[0]['balance'], self.penalty_type.calculate_available_employee_time(self.employee))
+        self.assertEqual(entries[3]['date'], date.today() - timedelta(days=16))
+
+    def test_pages_keep_the_balance(self):
+        self.assertEqual(self.ledger.count(), 5)
+        with self.assertNumQueries(1):
+            page = self.ledger[3:5]
+        self.assertEqual([entry['balance'] for entry in page], [0, 1.5])
+        self.assertEqual(self.ledger[5:10], [])
+
+    def test_summarized_archive(self):
+        before = self.ledger[0:10]
+        pay_period = TimesheetClaim.objects.create(pay_date=date.today() - timedelta(days=1))
+        Timesheet.objects.filter(start_date_time__lt=datetime.now() - timedelta(days=20)).update(claim=pay_period)
+        call_command('archive_rows', '--days=20', '--summarize', stdout=StringIO())
+        self.assertTrue(Timesheet.objects.filter(archived=True).exists())
+        self.assertEqual(self.ledger[0:10], before)
+        self.assertEqual(self.ledger[1:], before[1:])
+
+    def test_view(self):
+        self.client.force_login(self.employee)
+        url = reverse('employee-ledger', kwargs={'slug': self.employee.slug, 'penalty_type_id': self.penalty_type.pk})
+        response = self.client.get(url)
+        self.assertEqual(len(response.context['object_list']), 5)
+        other = Employee.objects.create_user(username='bob')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 403)
+        Team.objects.create(name='Network').add_manager(other)
+        Employee.objects.filter(pk=self.employee.pk).update(team=other.team)
+        self.assertEqual(self.client.get(url).status_code, 200)
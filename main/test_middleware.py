@@ -0,0 +1,122 @@
+import os
+import subprocess
+import sys
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from main.middleware import metrics, MetricsStore, list_profiles
+from main.models import Employee
+
+
+class PerformanceMiddlewareTestCase(TestCase):
+    fixtures = ['auth_group.json']
+
+    def setUp(self) -> None:
+        self.metrics_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(PERFORMANCE_METRICS_DIR=self.metrics_dir.name, METRICS_TOKEN='secret')
+        self.settings.enable()
+        metrics.histograms = {}
+        self.test_employee = Employee.objects.create_user(username='ant', first_name='Anthony', last_name='Lorraine')
+
+    def tearDown(self) -> None:
+        self.settings.disable()
+        self.metrics_dir.cleanup()
+
+    def test_server_timing_header(self):
+        self.client.force_login(user=self.test_employee)
+        response = self.client.get(reverse('home'))
+        timings = [timing.split(';')[0] for timing in response['Server-Timing'].split(', ')]
+        self.assertEqual(timings, ['db', 'template', 'total'])
+        self.assertRegex(response['Server-Timing'], r'db;desc="\d+ queries";dur=[\d.]+')
+
+    def test_metrics_require_staff_or_token(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_staff(self):
+        self.test_employee.is_staff = True
+        self.test_employee.save()
+        self.client.force_login(user=self.test_employee)
+        self.client.get(reverse('home'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '# TYPE timesheets_request_duration_seconds histogram')
+        self.assertContains(response, 'timesheets_request_queries_count{view="home"} 1')
+
+    def test_metrics_merge_processes(self):
+        other_process = MetricsStore()
+        other_process.observe('home', {'timesheets_request_queries': 3})
+        other_process.flush()
+        metrics.observe('home', {'timesheets_request_queries': 30})
+        merged = metrics.collect()['timesheets_request_queries']['home']
+        self.assertEqual(merged['count'], 2)
+        self.assertEqual(merged['sum'], 33)
+        self.assertIn('timesheets_request_queries_bucket{view="home",le="+Inf"} 2', metrics.render())
+
+    def test_metrics_fold_exited_processes(self):
+        for queries in (3, 4):
+            exited = subprocess.Popen([sys.executable, '-c', ''])
+            exited.wait()
+            exited_process = MetricsStore()
+            exited_process.filename = f'metrics-{exited.pid}-{queries}.json'
+            exited_process.observe('home', {'timesheets_request_queries': queries})
+            exited_process.flush()
+            metrics.observe('home', {'timesheets_request_queries': 30})
+            merged = metrics.collect()['timesheets_request_queries']['home']
+        self.assertEqual(merged['count'], 4)
+        self.assertEqual(merged['sum'], 67)
+        self.assertEqual(sorted(name for name in os.listdir(self.metrics_dir.name) if name.endswith('.json')),
+                         sorted(['metrics-exited.json', metrics.filename]))
+
+
+class ProfilingMiddlewareTestCase(TestCase):
+    fixtures = ['auth_group.json']
+
+    def setUp(self) -> None:
+        self.profiles_dir = tempfile.TemporaryDirectory()
+        self.settings = override_settings(PROFILING_DIR=self.profiles_dir.name, PROFILING_MAX_FILES=2)
+        self.settings.enable()
+        self.test_employee = Employee.objects.create_user(username='ant', first_name='Anthony', last_name='Lorraine')
+        self.client.force_login(user=self.test_employee)
+
+    def tearDown(self) -> None:
+        self.settings.disable()
+        self.profiles_dir.cleanup()
+
+    def test_header_requires_staff(self):
+        response = self.client.get(reverse('home'), HTTP_X_PROFILE='1')
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list_profiles(), [])
+
+    def test_staff_header_saves_profile(self):
+        self.test_employee.is_staff = True
+        self.test_employee.save()
+        response = self.client.get(reverse('home'), HTTP_X_PROFILE='1')
+        profile, = list_profiles()
+        self.assertEqual(response['X-Profile-Id'], profile.name)
+        out = StringIO()
+        call_command('profiles', profile.name, stdout=out)
+        self.assertIn('Top functions by cumulative time', out.getvalue())
+        self.assertIn('SELECT', out.getvalue())
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_THRESHOLD_MS=0)
+    def test_sampled_profiles_rotate(self):
+        for _ in range(3):
+            self.client.get(reverse('home'))
+        self.assertEqual(len(list_profiles()), 2)
+        out = StringIO()
+        call_command('profiles', stdout=out)
+        self.assertEqual(out.getvalue().count('(home)'), 2)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_THRESHOLD_MS=60000)
+    def test_fast_sampled_requests_are_not_saved(self):
+        self.client.get(reverse('home'))
+        self.assertEqual(list_profiles(), [])
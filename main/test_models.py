@@ -1,5 +1,10 @@
+from datetime import datetime, timedelta
 from unittest import TestCase
 
+from django import test
+
+from main.models import Employee, PenaltyType, Penalty, Timesheet, Claim, Team
+
 
 class TestPenaltyType(TestCase):
     def test_is_used(self):
@@ -108,3 +113,41 @@ class TestClaim(TestCase):
 
     def test_duration(self):
         self.fail()
+
+
+class TestAvailableEmployeeHours(test.TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.penalty_type = PenaltyType.objects.create(name='Paid')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type=self.penalty_type)
+        self.team = Team.objects.create(name='test team')
+        self.employee = Employee.objects.create_user(username='ant', team=self.team)
+        # Monday, 1 hour at 1.5x
+        Timesheet(employee=self.employee, start_date_time=self.recent_weekday(), _duration=3600,
+                  penalty=self.penalty).save()
+        # Expired
+        Timesheet(employee=self.employee, start_date_time=datetime(2022, 1, 3, 10), _duration=3600,
+                  penalty=self.penalty).save()
+        Claim.objects.bulk_create([Claim(employee=self.employee, penalty_type=self.penalty_type,
+                                         claimed_seconds=1800)])
+
+    @staticmethod
+    def recent_weekday():
+        day = datetime.today().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        while day.weekday() == 6:
+            day -= timedelta(days=1)
+        return day
+
+    def test_calculate_available_employee_time(self):
+        self.assertEqual(self.penalty_type.calculate_available_employee_time(self.employee), 1)
+
+    def test_prefetch_duration_per_penalty(self):
+        employee, = Employee.prefetch_duration_per_penalty(Employee.objects.filter(pk=self.employee.pk))
+        with self.assertNumQueries(0):
+            durations = employee.duration_per_penalty
+        self.assertEqual(durations, self.employee.duration_per_penalty)
+        self.assertEqual(durations, [{'penalty_type': self.penalty_type, 'available': 1}])
+
+    def test_team_duration_per_penalty(self):
+        self.assertEqual(self.team.duration_per_penalty, [('Paid', 1)])
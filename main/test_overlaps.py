@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+from django.test import TestCase
+from django.urls import reverse
+
+from main.forms import TimeSheetModelForm
+from main.models import Employee, Penalty, Timesheet, overlapping_pairs
+
+
+class OverlapTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.employee = Employee.objects.create_user(username='ant')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        # A long history, the checks shouldn't depend on it.
+        Timesheet.objects.bulk_create([
+            Timesheet(employee=self.employee, start_date_time=datetime(2021, 1, 1, 10) + timedelta(days=day),
+                      _duration=3600, penalty=self.penalty, expiry_date_time=datetime(2021, 1, 15))
+            for day in range(200)])
+        self.saved = Timesheet(employee=self.employee, start_date_time=datetime(2022, 3, 1, 10), _duration=2 * 3600,
+                               penalty=self.penalty)
+        self.saved.save()
+
+    def timesheet(self, start, hours, employee=None):
+        return Timesheet(employee=employee or self.employee, start_date_time=start, _duration=round(hours * 3600),
+                         penalty=self.penalty)
+
+    def test_overlapping(self):
+        self.assertEqual(self.timesheet(datetime(2022, 3, 1, 11), 2).overlapping(), self.saved)
+        with self.assertNumQueries(2):
+            self.assertEqual(self.timesheet(datetime(2022, 3, 1, 9), 2).overlapping(), self.saved)
+        self.assertEqual(self.timesheet(datetime(2022, 3, 1, 10, 30), 0.5).overlapping(), self.saved)
+        self.assertIsNone(self.timesheet(datetime(2022, 3, 1, 12), 1).overlapping())
+        self.assertIsNone(self.timesheet(datetime(2022, 3, 1, 9), 1).overlapping())
+        self.assertIsNone(self.saved.overlapping())
+        other = Employee.objects.create_user(username='bob')
+        self.assertIsNone(self.timesheet(datetime(2022, 3, 1, 11), 2, other).overlapping())
+
+    def test_overlapping_pairs(self):
+        first = self.timesheet(datetime(2022, 4, 1, 10), 10)
+        inside = self.timesheet(datetime(2022, 4, 1, 11), 1)
+        after_inside = self.timesheet(datetime(2022, 4, 1, 13), 1)
+        after = self.timesheet(datetime(2022, 4, 1, 20), 1)
+        self.assertEqual(overlapping_pairs([after, after_inside, inside, first]),
+                         [(first, inside), (first, after_inside)])
+
+    def test_batch_overlaps(self):
+        new = self.timesheet(datetime(2022, 3, 1, 8), 3)
+        clear = self.timesheet(datetime(2022, 3, 2, 8), 3)
+        twice = self.timesheet(datetime(2022, 3, 2, 10), 3)
+        with self.assertNumQueries(2):
+            overlaps = Timesheet.batch_overlaps([new, clear, twice])
+        self.assertEqual(overlaps, [(new, self.saved), (clear, twice)])
+
+    def test_form(self):
+        data = {'start_date_time': '2022-03-01T11:00', '_duration': 60, 'penalty': self.penalty.pk}
+        form = TimeSheetModelForm(data=data, employee=self.employee)
+        self.assertEqual(form.errors['__all__'], ['Overlaps your timesheet starting 01/03/2022 10:00.'])
+        data['start_date_time'] = '2022-03-01T12:00'
+        self.assertTrue(TimeSheetModelForm(data=data, employee=self.employee).is_valid())
+
+    def test_create_view(self):
+        self.client.force_login(self.employee)
+        response = self.client.post(reverse('timesheet-create'), {
+            'start_date_time': '2022-03-01T11:00', '_duration': 60, 'penalty': self.penalty.pk})
+        self.assertContains(response, 'Overlaps your timesheet')
+        self.assertEqual(Timesheet.objects.filter(start_date_time__gte=datetime(2022, 3, 1)).count(), 1)
+
+    def test_resubmit_after_rejection(self):
+        Timesheet.objects.filter(pk=self.saved.pk).update(status=Timesheet.REJECTED)
+        self.assertIsNone(self.timesheet(datetime(2022, 3, 1, 10), 2).overlapping())
+        self.assertEqual(Timesheet.batch_overlaps([self.timesheet(datetime(2022, 3, 1, 9), 2)]), [])
+        self.client.force_login(self.employee)
+        self.client.post(reverse('timesheet-create'), {
+            'start_date_time': '2022-03-01T10:00', '_duration': 120, 'penalty': self.penalty.pk})
+        self.assertEqual(Timesheet.objects.filter(start_date_time=datetime(2022, 3, 1, 10)).count(), 2)
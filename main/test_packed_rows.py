@@ -0,0 +1,115 @@
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from main import packing
+from main.ledger import Ledger
+from main.models import BalanceSnapshot, Employee, Penalty, PenaltyType, Timesheet, TimesheetRow, WeeklyRollup, \
+    week_start
+
+
+class PackedRowsTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.penalty_type = PenaltyType.objects.create(name='Paid')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid', base_threshold=7200)
+        self.table = self.create_timesheets('ant')
+        with override_settings(PACK_TIMESHEET_ROWS=True):
+            self.packed = self.create_timesheets('bee')
+
+    def create_timesheets(self, username: str) -> list:
+        employee = Employee.objects.create_user(username=username)
+        start = datetime.combine(date.today() - timedelta(days=20), datetime.min.time())
+        timesheets = []
+        for number in range(4):
+            timesheet = Timesheet(employee=employee, penalty=self.penalty, _duration=(3 + 4 * number) * 3600,
+                                  start_date_time=start + timedelta(days=3 * number, hours=20))
+            timesheet.save()
+            timesheets.append(timesheet)
+        # Saving again adds the rows a second time in both modes.
+        timesheets[0].save()
+        timesheets.append(Timesheet.bulk_create_with_rows([
+            Timesheet(employee=employee, penalty=self.penalty, _duration=5 * 3600,
+                      start_date_time=start + timedelta(days=15, hours=22))])[0])
+        return timesheets
+
+    @staticmethod
+    def rows(timesheet: Timesheet) -> list:
+        return [(row.date_worked, row.worked_seconds, row.payout_seconds)
+                for row in Timesheet.objects.get(pk=timesheet.pk).rows]
+
+    def balances(self, timesheets: list) -> tuple:
+        employee = timesheets[0].employee
+        WeeklyRollup.backfill()
+        # The first snapshot of an employee is summed from the rows.
+        BalanceSnapshot.objects.filter(employee=employee).delete()
+        return (self.penalty_type.calculate_available_employee_time(employee),
+                employee.balances_as_of(datetime.now())['Paid'],
+                BalanceSnapshot.take(employee).balances['Paid'],
+                Ledger(employee, self.penalty_type)[:1][0]['balance'],
+                list(WeeklyRollup.objects.filter(employee=employee).order_by('week')
+                     .values_list('week', 'worked_seconds', 'payout_seconds')),
+                Timesheet.rejection_balance_changes([timesheet.pk for timesheet in timesheets[:2]]).get(
+                    timesheets[0].pk))
+
+    def test_pack(self):
+        rows = [(date(2022, 3, 1), 3600, 5400), (date(2022, 3, 2), 60, 90)]
+        self.assertEqual(len(packing.pack(rows)), 24)
+        self.assertEqual(packing.unpack(packing.pack(rows)), rows)
+        records, owners = packing.decode([packing.pack(rows), b'', packing.pack(rows[1:])])
+        self.assertEqual(owners.tolist(), [0, 0, 2])
+        self.assertEqual(records['payout'].tolist(), [5400, 90, 90])
+
+    def test_same_as_rows_table(self):
+        self.assertFalse(TimesheetRow.objects.filter(timesheet__employee=self.packed[0].employee).exists())
+        self.assertTrue(all(Timesheet.objects.get(pk=timesheet.pk).packed for timesheet in self.packed))
+        self.assertEqual([self.rows(timesheet) for timesheet in self.packed],
+                         [self.rows(timesheet) for timesheet in self.table])
+        self.assertEqual(len(self.rows(self.packed[0])), 2)
+        self.assertEqual(self.balances(self.packed), self.balances(self.table))
+
+    def test_rollup_window(self):
+        last = Timesheet.objects.get(pk=self.packed[-1].pk)
+        self.assertEqual(last.packed_last_day, max(row.date_worked for row in last.rows))
+        since = week_start(self.packed[3].start_date_time.date())
+        until = since + timedelta(days=14)
+        with CaptureQueriesContext(connection) as queries:
+            packed = WeeklyRollup.totals(self.packed[0].employee, since, until)
+        # Only the timesheets reaching the window are read, older ones stay on the index.
+        self.assertIn('"packed_last_day" >=', queries[-1]['sql'])
+        table = WeeklyRollup.totals(self.table[0].employee, since, until)
+        self.assertEqual(list(packed.values()), list(table.values()))
+        self.assertEqual(len(packed), 2)
+
+    def test_check_integrity(self):
+        out = StringIO()
+        call_command('check_integrity', '--workers=1', '--repair', stdout=out)
+        self.assertIn(f'Timesheet {self.packed[0].pk}: rows duplicated.', out.getvalue())
+        self.assertEqual(len(self.rows(self.packed[0])), 1)
+        self.assertIn('0 mismatched, 0 duplicated, 0 missing', self.check_integrity())
+
+    def check_integrity(self) -> str:
+        out = StringIO()
+        call_command('check_integrity', '--workers=1', stdout=out)
+        return out.getvalue()
+
+    def test_pack_rows(self):
+        before = self.balances(self.table)
+        expected = [self.rows(timesheet) for timesheet in self.table]
+        out = StringIO()
+        call_command('pack_rows', '--batch-size=2', stdout=out)
+        self.assertIn(f'Packed {len(self.table)} timesheets, 10 rows.', out.getvalue())
+        self.assertFalse(TimesheetRow.objects.exists())
+        self.assertEqual([self.rows(timesheet) for timesheet in self.table], expected)
+        self.assertEqual(self.balances(self.table), before)
+
+        call_command('pack_rows', '--unpack', stdout=out)
+        self.assertIn(f'Unpacked {len(self.table) * 2} timesheets, 20 rows.', out.getvalue())
+        self.assertFalse(Timesheet.objects.filter(packed_rows__isnull=False).exists())
+        self.assertEqual([self.rows(timesheet) for timesheet in self.table], expected)
+        self.assertIn('0 mismatched, 4 duplicated, 0 missing', self.check_integrity())
@@ -0,0 +1,69 @@
+import csv
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.management.commands.provision_employees import COLUMNS
+from main.models import Employee, Team
+
+
+class ProvisionEmployeesTestCase(TestCase):
+    fixtures = ['auth_group.json']
+
+    def setUp(self) -> None:
+        self.team = Team.objects.create(name='Network')
+        Employee.objects.create_user(username='ant', first_name='Anthony', last_name='Lorraine')
+
+    def provision(self, rows, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='') as file:
+            writer = csv.DictWriter(file, COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+            file.flush()
+            call_command('provision_employees', file.name, *args, stdout=StringIO())
+
+    def test_provision(self):
+        self.provision([
+            {'username': 'bob', 'first_name': 'Anthony', 'last_name': 'Lorraine', 'password': 'secret-1',
+             'team': 'Network'},
+            {'username': 'cat', 'first_name': 'Anthony', 'last_name': 'Lorraine', 'password': 'secret-2',
+             'team': 'Servers', 'manager': 'yes'},
+            {'username': 'dan'},
+        ], '--workers=2')
+        bob, cat, dan = Employee.objects.filter(username__in=['bob', 'cat', 'dan']).order_by('username')
+        self.assertEqual([bob.slug, cat.slug, dan.slug], ['anthony-lorraine-2', 'anthony-lorraine-3', 'dan'])
+        self.assertTrue(bob.check_password('secret-1'))
+        self.assertTrue(cat.check_password('secret-2'))
+        self.assertFalse(dan.has_usable_password())
+        self.assertEqual(bob.team, self.team)
+        servers = Team.objects.get(name='Servers')
+        self.assertEqual((servers.slug, servers.manager), ('servers', cat))
+        self.assertTrue(cat.is_manager)
+        self.assertIsNone(dan.team)
+        # Instances saved one at a time still get a unique slug.
+        eve = Employee.objects.create_user(username='eve', first_name='Anthony', last_name='Lorraine')
+        self.assertEqual(eve.slug, 'anthony-lorraine-4')
+
+    def test_queries_do_not_grow_with_rows(self):
+        counts = []
+        for prefix, size in [('small', 5), ('large', 50)]:
+            rows = [{'username': f'{prefix}{number}', 'first_name': 'Sam', 'last_name': 'Smith', 'team': prefix}
+                    for number in range(size)]
+            with CaptureQueriesContext(connection) as queries:
+                self.provision(rows, '--workers=1')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Employee.objects.filter(slug__startswith='sam-smith').count(), 55)
+
+    def test_invalid_file_creates_nothing(self):
+        with self.assertRaisesMessage(CommandError, 'Usernames already taken: ant.'):
+            self.provision([{'username': 'ant'}, {'username': 'bob'}], '--workers=1')
+        with self.assertRaisesMessage(CommandError, 'Teams with more than one manager in the file: Network.'):
+            self.provision([{'username': 'bob', 'team': 'Network', 'manager': 'yes'},
+                            {'username': 'cat', 'team': 'Network', 'manager': 'yes'}], '--workers=1')
+        self.assertFalse(Employee.objects.filter(username='bob').exists())
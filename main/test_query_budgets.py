@@ -0,0 +1,145 @@
+import sys
+from collections import defaultdict
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from main.benchmarks import load_benchmark_data, route_kwargs
+
+# Maximum queries allowed for a GET of each named route, for any user.
+QUERY_BUDGETS = {
+    'home': 19,
+    'employee-detail': 20,
+    'employee-ledger': 8,
+    'employee-update': 8,
+    'employee-search': 5,
+    'employee-autocomplete': 4,
+    'logout': 4,
+    'login': 4,
+    'register-employee': 2,
+    'timesheet-create': 5,
+    'timesheet-detail': 12,
+    'penalty-claim': 9,
+    'penalty-create': 5,
+    'penalty-delete': 5,
+    'penalty-type-create': 7,
+    'penalty-type-delete': 5,
+    'team-create': 5,
+    'team-delete': 7,
+    'team-list': 6,
+    'team-join-staff': 6,
+    'team-leave-staff': 6,
+    'team-join-manager': 4,
+    'team-leave-manager': 14,
+    'team-view-members-list': 6,
+    'team-overtime-trend': 6,
+    'manager-team-member-list': 18,
+    'timesheet-claim': 9,
+    'pay-period-document': 7,
+    'approval-queue': 6,
+    'metrics': 4,
+    'pay-period-report': 6,
+    'pay-period-report-csv': 5,
+    'rules-simulator': 10,
+}
+
+SMALL_DATASET = {'teams': 2, 'employees': 6, 'years': 0.1, 'prefix': 'small'}
+LARGE_DATASET = {'teams': 4, 'employees': 40, 'years': 0.5, 'prefix': 'large'}
+
+
+def call_site() -> str:
+    """
+    The innermost project source line running the current query, with the template line rendering it if any.
+    """
+    frame = sys._getframe(2)
+    source = None
+    template = None
+    while frame and not (source and template):
+        filename = frame.f_code.co_filename
+        if source is None and filename.startswith(str(settings.BASE_DIR)) and \
+                not filename.endswith(('test_query_budgets.py', 'manage.py')):
+            source = f'{filename[len(str(settings.BASE_DIR)) + 1:]}:{frame.f_lineno}'
+        if template is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            if getattr(node, 'origin', None) and getattr(node, 'token', None):
+                template = f'{node.origin.template_name}:{node.token.lineno}'
+        frame = frame.f_back
+    return f'{source} ({template})' if template else str(source)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((call_site(), sql))
+        return execute(sql, params, many, context)
+
+    def report(self) -> str:
+        by_call_site = defaultdict(list)
+        for site, sql in self.queries:
+            by_call_site[site].append(sql)
+        lines = []
+        for site, statements in sorted(by_call_site.items(), key=lambda item: -len(item[1])):
+            lines.append(f'  {len(statements):>5} x {site}')
+            lines.append(f'          {statements[0]}')
+        return '\n'.join(lines)
+
+
+class QueryBudgetTestCase(TestCase):
+    fixtures = ['auth_group.json']
+
+    def record(self, client, route, kwargs, user) -> QueryRecorder:
+        recorder = QueryRecorder()
+        with transaction.atomic():
+            if user:
+                client.force_login(user)
+            else:
+                client.logout()
+            with connection.execute_wrapper(recorder):
+                client.get(reverse(route, kwargs=kwargs), HTTP_REFERER='/')
+            transaction.set_rollback(True)
+        return recorder
+
+    def walk(self) -> dict:
+        """
+        GETs every named route as an employee, a manager and an anonymous user.
+
+        :return: Dictionary{(route, role): QueryRecorder}
+        """
+        data = load_benchmark_data()
+        client = Client(raise_request_exception=False)
+        users = {'employee': data['employee'], 'manager': data['manager'], 'anonymous': None}
+        recorded = {}
+        for route, kwargs in route_kwargs(data).items():
+            for role, user in users.items():
+                recorded[(route, role)] = self.record(client, route, kwargs, user)
+        return recorded
+
+    def test_every_route_has_a_budget(self):
+        from timesheets.urls import urlpatterns
+        names = {pattern.name for pattern in urlpatterns if getattr(pattern, 'name', None)}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_query_budgets(self):
+        call_command('seed_load', '--end-date=2022-06-30', stdout=StringIO(), **SMALL_DATASET)
+        small = self.walk()
+        call_command('seed_load', '--end-date=2022-06-30', stdout=StringIO(), **LARGE_DATASET)
+        large = self.walk()
+
+        failures = []
+        for (route, role), recorder in large.items():
+            count = len(recorder.queries)
+            small_count = len(small[(route, role)].queries)
+            if count > QUERY_BUDGETS[route]:
+                failures.append(f'{route} as {role}: {count} queries, budget {QUERY_BUDGETS[route]}\n'
+                                f'{recorder.report()}')
+            elif count > small_count:
+                failures.append(f'{route} as {role}: {count} queries on the large dataset, '
+                                f'{small_count} on the small dataset\n{recorder.report()}')
+        if failures:
+            self.fail('Query budgets exceeded:\n\n' + '\n\n'.join(failures))
@@ -0,0 +1,20 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from main.benchmarks import SIZES, load_benchmark_data
+from main.query_plans import capture, explain, full_table_scans, plan_regressions
+from main.models import Employee
+
+
+class TestQueryPlans(TestCase):
+    fixtures = ['auth_group.json']
+
+    def test_full_table_scans(self):
+        sql, params = next(iter(capture(lambda: list(Employee.objects.filter(first_name='Anne'))).items()))
+        self.assertEqual(full_table_scans(explain(sql, params)), ['main_employee'])
+
+    def test_hot_paths_use_indexes(self):
+        call_command('seed_load', '--end-date=2022-06-30', seed=0, stdout=StringIO(), **SIZES['small'])
+        self.assertEqual(plan_regressions(load_benchmark_data()), [])
@@ -0,0 +1,77 @@
+import threading
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from main import reference_data
+from main.forms import TimeSheetModelForm
+from main.models import Penalty, PenaltyType
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class ReferenceDataTestCase(TransactionTestCase):
+    # Runs outside a transaction so saves commit like they do in a request.
+
+    def setUp(self) -> None:
+        reference_data._local['version'] = None
+        reference_data._uncommitted.pending = False
+        self.penalty_type = PenaltyType.objects.create(name='Paid')
+
+    def test_cached_until_changed(self):
+        self.assertEqual(reference_data.penalty_types(), [self.penalty_type])
+        with self.assertNumQueries(0):
+            reference_data.penalty_types()
+        toil = PenaltyType.objects.create(name='Toil')
+        self.assertEqual(reference_data.penalty_types(), [self.penalty_type, toil])
+        toil.delete()
+        self.assertEqual(reference_data.penalty_types(), [self.penalty_type])
+
+    def test_change_in_another_process(self):
+        reference_data.penalty_types()
+        PenaltyType.objects.filter(pk=self.penalty_type.pk).update(name='Toil')
+        self.assertEqual(reference_data.penalty_types()[0].name, 'Paid')
+        reference_data.bump()
+        self.assertEqual(reference_data.penalty_types()[0].name, 'Toil')
+
+    def test_rolled_back_change_is_discarded(self):
+        with transaction.atomic():
+            toil = PenaltyType.objects.create(name='Toil')
+            self.assertIn(toil, reference_data.penalty_types())
+            transaction.set_rollback(True)
+        self.assertEqual(reference_data.penalty_types(), [self.penalty_type])
+
+    def test_uncommitted_change_per_thread(self):
+        seen = []
+        with transaction.atomic():
+            toil = PenaltyType.objects.create(name='Toil')
+            # Requests in other threads have their own connection and don't see the change.
+            thread = threading.Thread(target=lambda: seen.append(reference_data._uncommitted.pending))
+            thread.start()
+            thread.join()
+            self.assertTrue(reference_data._uncommitted.pending)
+            self.assertIn(toil, reference_data.penalty_types())
+        self.assertEqual(seen, [False])
+        self.assertIn(toil, reference_data.penalty_types())
+
+    def test_is_used(self):
+        self.assertFalse(self.penalty_type.is_used)
+        Penalty.objects.create(name='On Call', penalty_type=self.penalty_type)
+        self.assertTrue(self.penalty_type.is_used)
+
+
+class ReferenceDataChoiceFieldTestCase(TestCase):
+    def setUp(self) -> None:
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+
+    def test_choices_and_validation(self):
+        form = TimeSheetModelForm()
+        self.assertEqual([str(value) for value, _ in form.fields['penalty'].choices], ['', str(self.penalty.pk)])
+        form = TimeSheetModelForm(data={'start_date_time': '2022-01-01T10:00', '_duration': 60,
+                                        'penalty': self.penalty.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['penalty'], self.penalty)
+        form = TimeSheetModelForm(data={'start_date_time': '2022-01-01T10:00', '_duration': 60,
+                                        'penalty': self.penalty.pk + 1})
+        self.assertIn('penalty', form.errors)
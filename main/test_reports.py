@@ -0,0 +1,74 @@
+from datetime import date, datetime, timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from main.models import Employee, Penalty, Team, Timesheet, TimesheetClaim, CostCode
+from main.reports import PayPeriodReport
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class PayPeriodReportTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.team = Team.objects.create(name='Network')
+        self.manager = Employee.objects.create_user(username='ant')
+        self.team.add_manager(self.manager)
+        penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        # Monday, 3 hours, 2 at 1.5x then 1 at 2x
+        Timesheet(employee=self.manager, start_date_time=datetime(2022, 1, 3, 10), _duration=3 * 3600,
+                  penalty=penalty).save()
+        self.paid = TimesheetClaim(pay_date=date(2022, 1, 12))
+        self.paid.save()
+        Timesheet.objects.update(status=Timesheet.APPROVED)
+        self.paid.add_time_sheets()
+        self.open = TimesheetClaim(pay_date=date.today() + timedelta(days=7))
+        self.open.save()
+
+    def test_report(self):
+        report = PayPeriodReport([self.paid])
+        self.assertEqual(report.rows, [{'team': 'Network', 'hours': [2, 1, 0], 'total': 3}])
+        self.assertEqual([cost_code.pk for _, cost_code in report.columns],
+                         [CostCode.BASE, CostCode.OVERTIME, CostCode.PUBLIC_HOLIDAY])
+
+    def test_paid_periods_cached(self):
+        PayPeriodReport([self.paid, self.open])
+        # Only the open period is calculated again, then the team names are read.
+        with self.assertNumQueries(2):
+            PayPeriodReport([self.paid, self.open]).rows
+
+    def test_profile_save_keeps_cache(self):
+        PayPeriodReport([self.paid])
+        self.manager.first_name = 'Anthony'
+        self.manager.save()
+        Employee.objects.get(pk=self.manager.pk).save()
+        # The costs come from the cache, only the cost codes and team names are read.
+        with self.assertNumQueries(2):
+            PayPeriodReport([self.paid]).rows
+
+    def test_team_change_recalculates(self):
+        PayPeriodReport([self.paid])
+        servers = Team.objects.create(name='Servers')
+        self.team.remove_manager(self.manager)
+        servers.add_employee(self.manager)
+        self.assertEqual(PayPeriodReport([self.paid]).rows, [{'team': 'Servers', 'hours': [2, 1, 0], 'total': 3}])
+
+    def test_views(self):
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('pay-period-report'), {'start': '2022-01-01', 'end': '2022-01-31'})
+        self.assertEqual(response.context['report'].pay_periods, [self.paid])
+        response = self.client.get(reverse('pay-period-report-csv'), {'start': '2022-01-01', 'end': '2022-01-31'})
+        self.assertEqual(response.content.decode().splitlines(), [
+            'Team,2022-01-12 A,2022-01-12 B,2022-01-12 C,Total',
+            'Network,2.00,1.00,0.00,3.00',
+        ])
+
+    def test_managers_only(self):
+        employee = Employee.objects.create_user(username='bob')
+        self.client.force_login(employee)
+        self.assertEqual(self.client.get(reverse('pay-period-report')).status_code, 403)
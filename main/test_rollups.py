@@ -0,0 +1,61 @@
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from main.models import Employee, Penalty, Team, Timesheet, WeeklyRollup, week_start
+
+
+class WeeklyRollupTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.team = Team.objects.create(name='Network')
+        self.manager = Employee.objects.create_user(username='ant')
+        self.team.add_manager(self.manager)
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+
+    def add_timesheet(self, start, hours):
+        Timesheet(employee=self.manager, start_date_time=start, _duration=hours * 3600, penalty=self.penalty).save()
+
+    def rollups(self):
+        return list(WeeklyRollup.objects.order_by('week').values_list(
+            'week', 'team', 'penalty', 'worked_seconds', 'payout_seconds'))
+
+    def test_updated_with_timesheets(self):
+        # Sunday 10pm to Monday 2am, split over two weeks
+        self.add_timesheet(datetime(2022, 1, 9, 22), 4)
+        self.add_timesheet(datetime(2022, 1, 11, 10), 1)
+        self.assertEqual([(week, worked) for week, _, _, worked, _ in self.rollups()],
+                         [(date(2022, 1, 3), 2 * 3600), (date(2022, 1, 10), 3 * 3600)])
+        self.assertEqual({(team, penalty) for _, team, penalty, _, _ in self.rollups()},
+                         {(self.team.pk, self.penalty.pk)})
+
+    def test_backfill_matches(self):
+        self.add_timesheet(datetime(2022, 1, 9, 22), 4)
+        self.add_timesheet(datetime(2022, 2, 1, 10), 3)
+        rollups = self.rollups()
+        WeeklyRollup.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_rollups', stdout=out)
+        self.assertIn('Created 3 weekly rollups.', out.getvalue())
+        self.assertEqual(self.rollups(), rollups)
+
+    def test_trend(self):
+        this_week = week_start(date.today())
+        self.add_timesheet(datetime.combine(this_week, datetime.min.time()) + timedelta(hours=10), 3)
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('team-overtime-trend', kwargs={'team_id': self.team.pk}))
+        trend = response.json()
+        self.assertEqual((len(trend['weeks']), trend['weeks'][-1]), (52, this_week.isoformat()))
+        series, = trend['series']
+        self.assertEqual((series['penalty'], series['worked_hours'][-1], sum(series['worked_hours'])),
+                         ('On Call', 3, 3))
+
+    def test_trend_managers_only(self):
+        employee = Employee.objects.create_user(username='bob')
+        self.client.force_login(employee)
+        response = self.client.get(reverse('team-overtime-trend', kwargs={'team_id': self.team.pk}))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,64 @@
+from datetime import date, datetime, time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from main.models import Employee, Event, Penalty, Roster, RosterMember, Timesheet, TimesheetRow, WeeklyRollup
+
+
+class RosterTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        self.members = [Employee.objects.create_user(username=name) for name in ('ant', 'bob', 'cat')]
+        # Weeknights from 6pm for 2 hours, a new member each week, starting Monday 3 January 2022.
+        self.roster = Roster.objects.create(name='Network', penalty=self.penalty, weekdays='01234',
+                                            start_time=time(18), _duration=2 * 3600, starts_on=date(2022, 1, 3))
+        for position, employee in enumerate(self.members):
+            RosterMember.objects.create(roster=self.roster, employee=employee, position=position)
+
+    def test_expand(self):
+        timesheets = self.roster.expand(date(2022, 1, 1), date(2022, 1, 31))
+        self.assertEqual(len(timesheets), 21)
+        self.assertEqual(timesheets[0].start_date_time, datetime(2022, 1, 3, 18))
+        self.assertEqual([timesheet.employee.username for timesheet in timesheets[::5]],
+                         ['ant', 'bob', 'cat', 'ant', 'bob'])
+        self.roster.rotation_weeks = 2
+        self.assertEqual([timesheet.employee.username for timesheet in
+                          self.roster.expand(date(2022, 1, 1), date(2022, 1, 31))[::5]],
+                         ['ant', 'ant', 'bob', 'bob', 'cat'])
+
+    def test_generate_matches_save(self):
+        saved = Timesheet(employee=self.members[0], start_date_time=datetime(2021, 12, 27, 18), _duration=2 * 3600,
+                          penalty=self.penalty)
+        saved.save()
+        self.roster.generate(date(2022, 1, 3), date(2022, 1, 3))
+        generated = Timesheet.objects.latest('pk')
+        for timesheet in (saved, generated):
+            timesheet.refresh_from_db()
+        self.assertEqual(generated.expiry_date_time - generated.start_date_time,
+                         saved.expiry_date_time - saved.start_date_time)
+        self.assertEqual([(row.worked_seconds, row.payout_seconds) for row in generated.rows],
+                         [(row.worked_seconds, row.payout_seconds) for row in saved.rows])
+        self.assertEqual(Event.objects.filter(model='timesheet', object_id=generated.pk).get().balance_change,
+                         {'Paid': 3 * 3600})
+        self.assertTrue(WeeklyRollup.objects.filter(employee=self.members[0], week=date(2022, 1, 3)).exists())
+
+    def test_queries_per_batch(self):
+        with CaptureQueriesContext(connection) as queries:
+            created, skipped = self.roster.generate(date(2022, 1, 1), date(2022, 12, 31))
+        self.assertEqual((len(created), len(skipped)), (260, 0))
+        self.assertEqual(TimesheetRow.objects.count(), 260)
+        self.assertLess(len(queries), 40)
+
+    def test_command_skips_existing(self):
+        out = StringIO()
+        call_command('generate_roster', '--start=2022-01-01', '--end=2022-01-31', stdout=out)
+        call_command('generate_roster', str(self.roster.pk), '--start=2022-01-01', '--end=2022-02-06', stdout=out)
+        self.assertIn('Network: created 21 timesheets, skipped 0 overlapping shifts.', out.getvalue())
+        self.assertIn('Network: created 4 timesheets, skipped 21 overlapping shifts.', out.getvalue())
+        self.assertEqual(Timesheet.objects.count(), 25)
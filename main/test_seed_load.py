@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from main.management.commands.seed_load import PENALTIES, Command
+from main.models import Employee, Team, Timesheet, TimesheetRow, TimesheetClaimRow, Claim, TimesheetClaim, Penalty
+
+
+class TestSeedLoad(TestCase):
+    def seed(self, prefix='seed', seed=1):
+        call_command('seed_load', '--end-date=2022-06-30', teams=2, employees=6, years=0.25,
+                     seed=seed, prefix=prefix, stdout=StringIO())
+
+    def test_creates_data(self):
+        self.seed()
+        self.assertEqual(Team.objects.count(), 2)
+        self.assertEqual(Employee.objects.count(), 6)
+        self.assertEqual(Employee.objects.filter(groups__name='Manager').count(), 2)
+        self.assertTrue(Team.objects.filter(manager__isnull=True).count() == 0)
+        self.assertTrue(TimesheetClaim.objects.exists())
+        self.assertTrue(Timesheet.objects.exists())
+        self.assertTrue(Claim.objects.exists())
+
+    def test_derived_rows_match_save(self):
+        self.seed()
+        for timesheet in Timesheet.objects.all()[:50]:
+            rows = [(row.date_worked, row.worked_seconds, row.payout_seconds)
+                    for row in TimesheetRow.objects.filter(timesheet=timesheet).order_by('pk')]
+            cost_rows = [(row.cost_code_id, row.seconds)
+                         for row in TimesheetClaimRow.objects.filter(time_sheet=timesheet).order_by('pk')]
+            self.assertEqual(rows, [(row.date_worked, row.worked_seconds, row.payout_seconds)
+                                    for row in timesheet.build_time_sheet_rows()])
+            self.assertEqual(cost_rows, [(row.cost_code_id, row.seconds)
+                                         for row in timesheet.build_time_sheet_cost_rows()])
+
+    def test_deterministic_by_seed(self):
+        self.seed(prefix='first')
+        self.seed(prefix='second')
+        first = list(Timesheet.objects.filter(employee__username__startswith='first')
+                     .order_by('pk').values_list('start_date_time', '_duration', 'penalty'))
+        second = list(Timesheet.objects.filter(employee__username__startswith='second')
+                      .order_by('pk').values_list('start_date_time', '_duration', 'penalty'))
+        self.assertEqual(first, second)
+
+    def test_reference_data_reused(self):
+        penalties = Command().create_reference_data()
+        self.assertEqual([penalty.penalty_type for penalty, _ in penalties],
+                         [type_name for _, type_name, _ in PENALTIES])
+        for penalty, _ in penalties:
+            penalty.full_clean()
+        self.assertEqual(Command().create_reference_data(), penalties)
+        self.assertEqual(Penalty.objects.count(), len(PENALTIES))
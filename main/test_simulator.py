@@ -0,0 +1,90 @@
+import random
+from datetime import date, datetime, timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.models import CostCode, Employee, Penalty, Team, Timesheet
+from main.simulator import History, Rules, Simulation
+
+
+class SimulatorTestCase(TestCase):
+    fixtures = ['auth_group.json', 'cost_code.json']
+
+    def setUp(self) -> None:
+        self.team = Team.objects.create(name='Network')
+        self.manager = Employee.objects.create_user(username='ant')
+        self.team.add_manager(self.manager)
+        self.employee = Employee.objects.create_user(username='bob')
+        self.penalty = Penalty.objects.create(name='On Call', penalty_type='Paid')
+        self.start = date.today() - timedelta(days=60)
+
+    def add_timesheet(self, start_date_time, seconds, employee=None):
+        timesheet = Timesheet(employee=employee or self.manager, start_date_time=start_date_time, _duration=seconds,
+                              penalty=self.penalty)
+        timesheet.save()
+        return timesheet
+
+    def test_matches_stored_rows(self):
+        generator = random.Random(4)
+        moment = datetime.combine(self.start, datetime.min.time())
+        for number in range(40):
+            moment += timedelta(minutes=generator.randrange(60, 48 * 60, 15))
+            # Up to 30 hours, so some timesheets span two or three days.
+            timesheet = self.add_timesheet(moment, generator.randrange(15, 30 * 60, 15) * 60,
+                                           self.employee if number % 3 else None)
+            moment = timesheet.end_date_time
+        history = History(self.start, date.today())
+        self.assertEqual(len(history), 40)
+        self.assertEqual(history.simulate(Rules()), history.stored())
+
+    def test_rule_changes(self):
+        # A Monday, 4 hours, then a Sunday, 1 hour.
+        self.add_timesheet(datetime(2022, 1, 3, 18), 4 * 3600)
+        self.add_timesheet(datetime(2022, 1, 9, 18), 3600)
+        simulation = Simulation(date(2022, 1, 1), date(2022, 1, 31),
+                                Rules(thresholds={self.penalty.pk: 3 * 3600}, sunday_multiplier=3),
+                                moment=datetime(2022, 1, 10))
+        costs = {row['name']: (row['current'], row['proposed'], row['delta']) for row in simulation.cost_codes}
+        base, overtime = [CostCode.objects.get(pk=pk).code for pk in (CostCode.BASE, CostCode.OVERTIME)]
+        self.assertEqual(costs[base], (2, 3, 1))
+        self.assertEqual(costs[overtime], (3, 2, -1))
+        team, = simulation.teams
+        self.assertEqual(team['name'], 'Network')
+        self.assertEqual((team['payout']['current'], team['payout']['proposed']), (8, 9))
+        self.assertEqual((team['claimable']['current'], team['claimable']['proposed']), (8, 9))
+
+        expired = Simulation(date(2022, 1, 1), date(2022, 1, 31),
+                             Rules(valid_days={self.penalty.pk: 1}), moment=datetime(2022, 1, 10))
+        self.assertEqual(expired.teams[0]['claimable']['proposed'], 2)
+
+    def test_never_writes(self):
+        self.add_timesheet(datetime.combine(self.start, datetime.min.time()) + timedelta(hours=20), 10 * 3600)
+        with CaptureQueriesContext(connection) as queries:
+            Simulation(self.start, date.today(), Rules(thresholds={self.penalty.pk: 0})).teams
+        self.assertFalse([query['sql'] for query in queries
+                          if query['sql'].lstrip().split()[0].upper() in ('INSERT', 'UPDATE', 'DELETE')])
+
+    def test_command(self):
+        self.add_timesheet(datetime(2022, 1, 3, 18), 4 * 3600)
+        out = StringIO()
+        call_command('simulate_rules', '--start=2022-01-01', '--end=2022-01-31',
+                     f'--threshold={self.penalty.pk}=10800', stdout=out)
+        self.assertIn('1 timesheets from 2022-01-01 to 2022-01-31', out.getvalue())
+        self.assertIn('Network: payout 6.00 -> 6.00 (+0.00)', out.getvalue())
+
+    def test_view(self):
+        self.add_timesheet(datetime.combine(self.start, datetime.min.time()), 3600)
+        self.client.force_login(self.manager)
+        response = self.client.get(reverse('rules-simulator'),
+                                   {'start': self.start, 'end': date.today(), 'weekday_multiplier': 2,
+                                    'sunday_multiplier': 2, 'public_holiday_multiplier': 2.5,
+                                    f'threshold_{self.penalty.pk}': 7200, f'valid_days_{self.penalty.pk}': 14})
+        payout = response.context['simulation'].teams[0]['payout']
+        self.assertEqual(payout['proposed'], 2 if self.start.weekday() != 6 else payout['current'])
+        self.client.force_login(self.employee)
+        self.assertEqual(self.client.get(reverse('rules-simulator')).status_code, 403)
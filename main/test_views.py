@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from django.test import TestCase
 from django.urls import reverse
@@ -332,7 +332,7 @@ class TestTimesheetCreateView(TestCase):
         self.test_team.add_manager(self.test_manager)
 
     def test_get_success_url(self):
-        start_date_time = datetime.today()
+        start_date_time = datetime.today() + timedelta(days=1)
         response = self.client.post(reverse('timesheet-create'),
                                     data={
                                         'start_date_time': start_date_time,
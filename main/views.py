@@ -1,19 +1,30 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
+from django.conf import settings
 from django.contrib.auth import login
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin, PermissionRequiredMixin
 from django.contrib.auth.views import LogoutView, LoginView
-from django.core.exceptions import ValidationError
-from django.http import Http404, HttpResponseRedirect
+from django.core.exceptions import ValidationError, PermissionDenied
+from django.db.models import Count, Sum
+from django.http import Http404, HttpResponseRedirect, HttpResponse, HttpResponseNotModified, JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
-from main import markdown_messages
-
-from django.views.generic import DetailView, CreateView, ListView, RedirectView, DeleteView, UpdateView
+from django.utils.cache import add_never_cache_headers, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.views import View
+from main import documents, employee_index, markdown_messages, reference_data
+from main.ledger import Ledger
+from main.reports import PayPeriodReport
+from main.simulator import Rules, Simulation
+from main.middleware import metrics
+
+from django.views.generic import DetailView, CreateView, ListView, RedirectView, DeleteView, UpdateView, \
+    TemplateView
 
 from main.forms import TimeSheetModelForm, PenaltyCreateModelForm, PenaltyTypeCreateModelForm, \
-    EmployeeUpdateModelForm, ClaimForm, LogInModelForm, RegisterModelForm, TeamCreateModelForm
-from main.models import Employee, Timesheet, Team, PenaltyType, Penalty, Claim, TimesheetClaim
+    EmployeeUpdateModelForm, ClaimForm, LogInModelForm, RegisterModelForm, TeamCreateModelForm, RulesSimulatorForm
+from main.models import Employee, Timesheet, Team, PenaltyType, Penalty, Claim, TimesheetClaim, WeeklyRollup, \
+    PayPeriodSnapshot, week_start
 
 
 class EmployeeDetailView(LoginRequiredMixin, DetailView):
@@ -40,6 +51,32 @@ class EmployeeUpdateView(PermissionRequiredMixin, LoginRequiredMixin, UpdateView
         return self.request.user == employee or self.request.user == employee.team.manager
 
 
+class EmployeeLedgerView(LoginRequiredMixin, UserPassesTestMixin, ListView):
+    """
+    Paginated ledger of an employee's accruals, claims and expiries for a penalty type with the running balance.
+    """
+    template_name = 'main/ledger.html'
+    paginate_by = 50
+
+    def test_func(self):
+        self.employee = Employee.objects.select_related('team').filter(slug=self.kwargs.get('slug')).first()
+        self.penalty_type = reference_data.get(PenaltyType, self.kwargs.get('penalty_type_id'))
+        if self.employee is None or self.penalty_type is None:
+            raise Http404()
+        user = self.request.user
+        return user == self.employee or user.is_superuser or \
+            (self.employee.team is not None and self.employee.team.manager_id == user.pk)
+
+    def get_queryset(self):
+        return Ledger(self.employee, self.penalty_type)
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        context = super().get_context_data(object_list=object_list, **kwargs)
+        context['employee'] = self.employee
+        context['penalty_type'] = self.penalty_type
+        return context
+
+
 class TimesheetCreateView(LoginRequiredMixin, CreateView):
     model = Timesheet
     form_class = TimeSheetModelForm
@@ -47,6 +84,11 @@ class TimesheetCreateView(LoginRequiredMixin, CreateView):
     def get_initial(self):
         return {'employee': self.request.user}
 
+    def get_form_kwargs(self):
+        form_kwargs = super().get_form_kwargs()
+        form_kwargs['employee'] = self.request.user
+        return form_kwargs
+
     def get_success_url(self):
         return reverse('home')
 
@@ -56,7 +98,7 @@ class TimesheetCreateView(LoginRequiredMixin, CreateView):
 
         seconds = self.object.duration.total_seconds()
         self.object._duration = round(seconds * 60)
-        self.object.save()
+        self.object.save(defer_rows=settings.JOB_QUEUE_TIMESHEET_ROWS)
         return HttpResponseRedirect(self.get_success_url())
 
 
@@ -101,7 +143,7 @@ class PenaltyCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
-        context['penalties'] = Penalty.objects.all()
+        context['penalties'] = reference_data.penalties()
         return context
 
 
@@ -121,7 +163,7 @@ class PenaltyTypeCreateView(LoginRequiredMixin, CreateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data()
-        context['penalty_types'] = PenaltyType.objects.all()
+        context['penalty_types'] = reference_data.penalty_types()
         return context
 
 
@@ -206,6 +248,9 @@ class TeamListView(LoginRequiredMixin, ListView):
     paginate_by = 5
     ordering = ['name']
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('manager').annotate(annotated_staff_count=Count('employee'))
+
 
 class TeamJoinStaffView(LoginRequiredMixin, RedirectView):
     def get(self, request, *args, **kwargs):
@@ -251,7 +296,8 @@ class TeamViewMembersListView(LoginRequiredMixin, ListView):
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data()
         context['team'] = Team.objects.get(pk=self.kwargs.get('team_id'))
-        context['penalty_types'] = PenaltyType.objects.all()
+        # Templates call it when they use it, so it is only loaded when needed.
+        context['penalty_types'] = reference_data.penalty_types
         return context
 
 
@@ -265,6 +311,7 @@ class ManagerTeamViewMembersListView(LoginRequiredMixin, ListView):
     def get_context_data(self, *, object_list=None, **kwargs):
         context = super().get_context_data()
         context['team'] = self.request.user.team
+        Employee.prefetch_duration_per_penalty(context['object_list'])
         return context
 
 
@@ -273,3 +320,220 @@ class TimesheetClaimListView(DetailView):
 
     def get_object(self, *args, **kwargs):
         return self.model.objects.last()
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        if self.object and self.object.frozen:
+            return redirect('pay-period-document', pk=self.object.pk, extension=PayPeriodSnapshot.HTML)
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.object:
+            context['timesheets'] = Timesheet.prefetch_rows(
+                self.object.timesheet_set.select_related('employee__team__manager'))
+        return context
+
+
+class PayPeriodDocumentView(LoginRequiredMixin, View):
+    """
+    The claim document of a pay period as HTML or CSV. Frozen pay periods are served as stored, compressed when the
+    client accepts gzip, and can be cached for a year since they never change. Open ones are rendered each time.
+    """
+
+    def get(self, request, *args, **kwargs):
+        extension = self.kwargs.get('extension')
+        if extension not in PayPeriodSnapshot.CONTENT_TYPES:
+            raise Http404()
+        snapshot = PayPeriodSnapshot.objects.filter(pay_period=self.kwargs.get('pk'), format=extension) \
+            .defer('content').first()
+        if snapshot is None:
+            pay_period = TimesheetClaim.objects.filter(pk=self.kwargs.get('pk')).first()
+            if pay_period is None:
+                raise Http404()
+            response = HttpResponse(documents.render(pay_period, extension),
+                                    content_type=PayPeriodSnapshot.CONTENT_TYPES[extension])
+            add_never_cache_headers(response)
+        else:
+            response = self.stored(snapshot)
+        if extension == PayPeriodSnapshot.CSV:
+            response['Content-Disposition'] = f'attachment; filename="pay-period-{self.kwargs.get("pk")}.csv"'
+        return response
+
+    def stored(self, snapshot: PayPeriodSnapshot) -> HttpResponse:
+        etag = f'"{snapshot.digest}"'
+        if etag in self.request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        elif 'gzip' in self.request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(bytes(snapshot.content), content_type=snapshot.content_type)
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(snapshot.text(), content_type=snapshot.content_type)
+        response['ETag'] = etag
+        # Private, the documents hold the hours of named employees.
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+        patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+
+class PayPeriodReportView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Hours per team, pay period and cost code for the pay periods paid between the start and end GET parameters,
+    the last year by default.
+    """
+    template_name = 'main/pay_period_report.html'
+
+    def test_func(self):
+        return self.request.user.is_manager or self.request.user.is_superuser
+
+    def date_parameter(self, name, default):
+        try:
+            return date.fromisoformat(self.request.GET.get(name, ''))
+        except ValueError:
+            return default
+
+    def get_report(self) -> PayPeriodReport:
+        self.start = self.date_parameter('start', date.today() - timedelta(days=365))
+        self.end = self.date_parameter('end', date.today() + timedelta(days=14))
+        return PayPeriodReport(TimesheetClaim.objects.filter(pay_date__gte=self.start, pay_date__lte=self.end)
+                               .order_by('pay_date'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['report'] = self.get_report()
+        context['start'] = self.start
+        context['end'] = self.end
+        return context
+
+
+class PayPeriodReportCsvView(PayPeriodReportView):
+    def get(self, request, *args, **kwargs):
+        report = self.get_report()
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="pay-period-report-{self.start}-{self.end}.csv"'
+        report.write_csv(response)
+        return response
+
+
+class RulesSimulatorView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Hours per cost code and team of the timesheets started between the start and end GET parameters, now and under
+    the penalty rules in the other GET parameters, the last year and the current rules by default. Nothing is saved.
+    """
+    template_name = 'main/rules_simulator.html'
+
+    def test_func(self):
+        return self.request.user.is_manager or self.request.user.is_superuser
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        initial = {'start': date.today() - timedelta(days=365), 'end': date.today()}
+        form = RulesSimulatorForm(self.request.GET or None, initial=initial)
+        if not form.is_bound:
+            context['simulation'] = Simulation(initial['start'], initial['end'], Rules())
+        elif form.is_valid():
+            context['simulation'] = Simulation(form.cleaned_data['start'], form.cleaned_data['end'],
+                                               Rules(**form.rules_arguments()))
+        context['form'] = form
+        return context
+
+
+class ApprovalQueueView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Pending timesheets and claims of the manager's team. Posting approves or rejects the selected ones, each model
+    with one set-based update, superusers can review every team.
+    """
+    template_name = 'main/approval_queue.html'
+
+    def test_func(self):
+        return self.request.user.is_manager or self.request.user.is_superuser
+
+    def reviewable(self, model):
+        queryset = model.objects.filter(status=model.PENDING).exclude(employee=self.request.user)
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(employee__team__manager=self.request.user)
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['timesheets'] = self.reviewable(Timesheet).select_related('employee', 'penalty') \
+            .order_by('employee__first_name', 'start_date_time')
+        context['claims'] = self.reviewable(Claim).select_related('employee', 'penalty_type') \
+            .order_by('employee__first_name', 'claim_date')
+        return context
+
+    def post(self, request, *args, **kwargs):
+        status = {'approve': Timesheet.APPROVED, 'reject': Timesheet.REJECTED}.get(request.POST.get('action'))
+        if status is None:
+            markdown_messages.error(request, 'Choose to approve or reject.')
+            return redirect('approval-queue')
+        timesheets = Timesheet.review(self.reviewable(Timesheet).filter(pk__in=request.POST.getlist('timesheet')),
+                                      status, request.user)
+        claims = Claim.review(self.reviewable(Claim).filter(pk__in=request.POST.getlist('claim')),
+                              status, request.user)
+        markdown_messages.success(request, f'{timesheets} timesheets and {claims} claims {status}.')
+        return redirect('approval-queue')
+
+
+class TeamOvertimeTrendView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Weekly worked and payout hours of a team for each penalty over the last year, read from WeeklyRollup.
+    """
+
+    def test_func(self):
+        return self.request.user.is_manager or self.request.user.is_superuser
+
+    def get(self, request, *args, **kwargs):
+        team = Team.objects.filter(pk=self.kwargs.get('team_id')).first()
+        if team is None:
+            raise Http404()
+        last_week = week_start(date.today())
+        weeks = [last_week - timedelta(weeks=count) for count in range(51, -1, -1)]
+        totals = WeeklyRollup.objects.filter(team=team, week__gte=weeks[0]) \
+            .values_list('week', 'penalty').annotate(worked=Sum('worked_seconds'), payout=Sum('payout_seconds'))
+        by_penalty = {}
+        for week, penalty, worked, payout in totals:
+            by_penalty.setdefault(penalty, {})[week] = (worked, payout)
+        series = [{'penalty': penalty.name,
+                   'worked_hours': [round(by_penalty[penalty.pk].get(week, (0, 0))[0] / 3600, 2) for week in weeks],
+                   'payout_hours': [round(by_penalty[penalty.pk].get(week, (0, 0))[1] / 3600, 2) for week in weeks]}
+                  for penalty in reference_data.penalties() if penalty.pk in by_penalty]
+        return JsonResponse({'team': team.name, 'weeks': [week.isoformat() for week in weeks], 'series': series})
+
+
+class EmployeeSearchView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
+    """
+    Employees whose username, first name, last name or slug start with each word of the q GET parameter, looked up
+    in main.employee_index rather than the database.
+    """
+    template_name = 'main/employee_search.html'
+
+    def test_func(self):
+        return self.request.user.is_manager or self.request.user.is_superuser
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.request.GET.get('q', '')
+        context['employees'] = employee_index.search(context['query'], limit=50)
+        return context
+
+
+class EmployeeAutocompleteView(EmployeeSearchView):
+    """
+    The first few employees matching the q GET parameter as JSON, for the search box as it is typed in.
+    """
+
+    def get(self, request, *args, **kwargs):
+        employees = employee_index.search(request.GET.get('q', ''))
+        return JsonResponse({'results': [{'username': employee['username'], 'name': employee['name'],
+                                          'url': reverse('employee-detail', kwargs={'slug': employee['slug']})}
+                                         for employee in employees]})
+
+
+class MetricsView(View):
+    def get(self, request, *args, **kwargs):
+        token = settings.METRICS_TOKEN
+        authorization = request.headers.get('Authorization', '')
+        if not (request.user.is_staff or token and constant_time_compare(authorization, f'Bearer {token}')):
+            raise PermissionDenied()
+        return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -43,11 +43,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'main.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'main.middleware.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -141,4 +143,55 @@ MESSAGE_TAGS = {
     message_constants.WARNING: 'warning',
     message_constants.ERROR: 'danger',
 
-}
\ No newline at end of file
+}
+
+
+# Request performance metrics, see main/middleware.py
+# Each process writes its histograms to this directory, the files of exited processes are folded into one.
+PERFORMANCE_METRICS_DIR = os.environ.get('PERFORMANCE_METRICS_DIR', BASE_DIR / 'metrics')
+PERFORMANCE_METRICS_FLUSH_SECONDS = 1
+# Bearer token a Prometheus scraper can use for /metrics, staff users can always view it.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Request profiling, see main/middleware.py and manage.py profiles
+PROFILING_DIR = os.environ.get('PROFILING_DIR', BASE_DIR / 'profiles')
+# Staff users can profile any request by sending this header.
+PROFILING_HEADER = 'X-Profile'
+# Share of all requests that are profiled, sampled requests are kept if they are slower than the threshold.
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_THRESHOLD_MS = 500
+PROFILING_MAX_FILES = 100
+
+# The file cache is shared by the gunicorn workers on a host, use memcached or redis when running on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / 'cache'),
+    }
+}
+
+# Cache holding the version token of the reference data, see main/reference_data.py.
+REFERENCE_DATA_CACHE = 'default'
+# Cache holding the version token of the employee search index, see main/employee_index.py.
+EMPLOYEE_INDEX_CACHE = 'default'
+
+# Pay period report, see main/reports.py. Paid periods are cached until an employee changes team, open ones for at most
+# this many seconds.
+REPORT_CACHE = 'default'
+REPORT_OPEN_PERIOD_TIMEOUT = 300
+
+# Expiry digests, see manage.py send_expiry_digests. The console backend prints emails instead of sending them.
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'timesheets@localhost')
+
+# Background jobs, see main/jobs.py and manage.py run_worker.
+# Failed jobs are retried after JOB_RETRY_DELAY seconds, doubling with each attempt.
+JOB_RETRY_DELAY = 30
+# Generate timesheet rows on the queue instead of in the request, needs a worker running.
+JOB_QUEUE_TIMESHEET_ROWS = os.environ.get('JOB_QUEUE_TIMESHEET_ROWS', '') == '1'
+# Store the rows of new timesheets packed in one column of the timesheet instead of TimesheetRow, see main.packing.
+PACK_TIMESHEET_ROWS = os.environ.get('PACK_TIMESHEET_ROWS', '') == '1'
+EXPORTS_DIR = os.environ.get('EXPORTS_DIR', BASE_DIR / 'exports')
+
+# Keeps the directories above and the file cache in a temporary directory during test runs.
+TEST_RUNNER = 'timesheets.test_runner.TestRunner'
@@ -0,0 +1,31 @@
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the tests with the metrics, profiles, exports and file cache in a temporary directory, so a test run leaves
+    the working tree as it was.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.directory = tempfile.TemporaryDirectory()
+        path = Path(self.directory.name)
+        caches = {alias: {**cache, 'LOCATION': path / 'cache' / alias}
+                  if cache['BACKEND'].endswith('FileBasedCache') else cache
+                  for alias, cache in settings.CACHES.items()}
+        self.temporary_settings = override_settings(PERFORMANCE_METRICS_DIR=path / 'metrics',
+                                                    PROFILING_DIR=path / 'profiles',
+                                                    EXPORTS_DIR=path / 'exports',
+                                                    CACHES=caches)
+        self.temporary_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.temporary_settings.disable()
+        self.directory.cleanup()
+        super().teardown_test_environment(**kwargs)
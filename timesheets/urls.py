@@ -5,11 +5,16 @@ from main.views import EmployeeDetailView, TimesheetCreateView, TimesheetDetailV
     RegisterEmployeeView, TeamCreateView, TeamListView, TeamJoinStaffView, TeamJoinManagerView, TeamViewMembersListView, \
     TeamLeaveStaffView, TeamLeaveManagerView, ManagerTeamViewMembersListView, TeamDeleteView, \
     PenaltyCreateView, PenaltyTypeCreateView, PenaltyDeleteView, PenaltyTypeDeleteView, \
-    EmployeeUpdateView, ClaimCreateView, HomeView, TimesheetClaimListView
+    EmployeeUpdateView, ClaimCreateView, HomeView, TimesheetClaimListView, MetricsView, \
+    PayPeriodReportView, PayPeriodReportCsvView, TeamOvertimeTrendView, ApprovalQueueView, \
+    EmployeeLedgerView, RulesSimulatorView, PayPeriodDocumentView, EmployeeSearchView, EmployeeAutocompleteView
 
 urlpatterns = [
     path('', HomeView.as_view(), name='home'),
+    path('employee-search', EmployeeSearchView.as_view(), name='employee-search'),
+    path('employee-autocomplete', EmployeeAutocompleteView.as_view(), name='employee-autocomplete'),
     path('employee/<slug:slug>', EmployeeDetailView.as_view(), name='employee-detail'),
+    path('employee/<slug:slug>/ledger/<int:penalty_type_id>', EmployeeLedgerView.as_view(), name='employee-ledger'),
     path('employee-update/<slug:slug>', EmployeeUpdateView.as_view(), name='employee-update'),
     path('logout', LogOffView.as_view(), name='logout'),
     path('login', LogInView.as_view(), name='login'),
@@ -29,8 +34,15 @@ urlpatterns = [
     path('team-join-manager/<int:team_id>', TeamJoinManagerView.as_view(), name='team-join-manager'),
     path('team-leave-manager/<int:team_id>', TeamLeaveManagerView.as_view(), name='team-leave-manager'),
     path('team-detail/<int:team_id>', TeamViewMembersListView.as_view(), name='team-view-members-list'),
+    path('team-overtime-trend/<int:team_id>', TeamOvertimeTrendView.as_view(), name='team-overtime-trend'),
     path('manager-team-member-list', ManagerTeamViewMembersListView.as_view(), name='manager-team-member-list'),
-    path('claim', TimesheetClaimListView.as_view(), name='timesheet-claim')
+    path('claim', TimesheetClaimListView.as_view(), name='timesheet-claim'),
+    path('claim/<int:pk>.<slug:extension>', PayPeriodDocumentView.as_view(), name='pay-period-document'),
+    path('approvals', ApprovalQueueView.as_view(), name='approval-queue'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    path('pay-period-report', PayPeriodReportView.as_view(), name='pay-period-report'),
+    path('pay-period-report.csv', PayPeriodReportCsvView.as_view(), name='pay-period-report-csv'),
+    path('rules-simulator', RulesSimulatorView.as_view(), name='rules-simulator'),
 ]
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)